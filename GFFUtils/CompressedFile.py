@@ -0,0 +1,428 @@
+#!/bin/env python
+#
+#     CompressedFile.py: classes for reading compressed GFF/GTF files
+#
+########################################################################
+#
+# CompressedFile.py
+#
+#########################################################################
+
+"""CompressedFile
+
+Functions and classes for transparently reading GFF and GTF data from
+files which have been compressed using gzip, BGZF (the blocked gzip
+format used by bgzip/tabix) or zstd, and for writing gzip or BGZF
+compressed output.
+
+The compression type is detected from the "magic bytes" at the start
+of the file rather than from the file extension.
+
+Functions
+---------
+
+ * detect_compression: determine the compression used for a file
+ * open_file: open a file for reading, decompressing transparently
+ * open_output_file: open a file for writing, optionally compressing
+
+Classes
+-------
+
+ * BGZFReader: file-like object which decompresses BGZF blocks in
+   parallel using a pool of threads
+ * BGZFWriter: file-like object which compresses data into BGZF
+   blocks in parallel using a pool of threads
+
+Usage examples
+--------------
+
+To read from a file which may or may not be compressed:
+
+>>> fp = open_file('my.gtf.gz')
+>>> data = fp.read(1024)
+>>> fp.close()
+
+To write BGZF compressed data:
+
+>>> fp = open_output_file('my.gff.gz',compression=BGZF)
+>>> fp.write(data)
+>>> fp.close()
+
+zstd support requires the 'zstandard' module to be installed.
+"""
+
+#######################################################################
+# Import modules that this module depends on
+#######################################################################
+
+import struct
+import zlib
+import gzip
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+#######################################################################
+# Constants/globals
+#######################################################################
+
+# Compression types
+GZIP = 'gzip'
+BGZF = 'bgzf'
+ZSTD = 'zstd'
+
+# Magic bytes
+GZIP_MAGIC = '\x1f\x8b'
+ZSTD_MAGIC = '\x28\xb5\x2f\xfd'
+
+# Number of BGZF blocks to decompress in each batch (per thread)
+BGZF_BLOCKS_PER_THREAD = 16
+
+# Maximum amount of data in a single BGZF block (as used by bgzip)
+BGZF_BLOCK_SIZE = 0xff00
+
+# Empty BGZF block which marks the end of the file
+BGZF_EOF = ("\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC"
+            "\x02\x00\x1b\x00\x03\x00\x00\x00\x00\x00\x00\x00\x00\x00")
+
+#######################################################################
+# Functions
+#######################################################################
+
+def detect_compression(filen):
+    """Determine the compression type of a file from its magic bytes
+
+    Arguments:
+      filen: name of the file to examine
+
+    Returns:
+      One of the module-level constants GZIP, BGZF or ZSTD, or None
+      if the file doesn't appear to be compressed.
+    """
+    fp = open(filen,'rb')
+    header = fp.read(16)
+    fp.close()
+    if header.startswith(ZSTD_MAGIC):
+        return ZSTD
+    if header.startswith(GZIP_MAGIC):
+        # BGZF is gzip with a 'BC' extra subfield
+        if len(header) == 16 and \
+           ord(header[3]) & 4 and \
+           header[12:14] == 'BC':
+            return BGZF
+        return GZIP
+    return None
+
+def open_file(filen,threads=None):
+    """Open a file for reading, decompressing it if necessary
+
+    Arguments:
+      filen: name of the file to open
+      threads: (optional) number of threads to use when
+        decompressing BGZF data (defaults to the number of
+        CPUs)
+
+    Returns:
+      File-like object supporting 'read' and 'close' which
+      returns the decompressed data.
+    """
+    compression = detect_compression(filen)
+    if compression is None:
+        return open(filen,'rU')
+    elif compression == BGZF:
+        return BGZFReader(filen,threads=threads)
+    elif compression == GZIP:
+        return gzip.open(filen,'rb')
+    elif compression == ZSTD:
+        if zstandard is None:
+            raise IOError("'%s' is zstd compressed: reading it requires "
+                          "the 'zstandard' module" % filen)
+        return zstandard.ZstdDecompressor().stream_reader(open(filen,'rb'))
+
+def open_output_file(filen,compression=None,threads=None):
+    """Open a file for writing, compressing the output if requested
+
+    Arguments:
+      filen: name of the file to write to
+      compression: (optional) either GZIP or BGZF to compress the
+        output (default is to write uncompressed data)
+      threads: (optional) number of threads to use when
+        compressing BGZF data (defaults to the number of CPUs)
+
+    Returns:
+      File-like object supporting 'write' and 'close'.
+    """
+    if compression is None:
+        return open(filen,'w')
+    elif compression == BGZF:
+        return BGZFWriter(filen,threads=threads)
+    elif compression == GZIP:
+        return gzip.open(filen,'wb')
+    raise ValueError("Unsupported compression for output: '%s'" % compression)
+
+def inflate_bgzf_block(block):
+    """Decompress the deflated data from a single BGZF block
+
+    Arguments:
+      block: tuple (data,isize) where 'data' is the raw deflated
+        data from the block (i.e. without the gzip header and
+        trailer) and 'isize' is the expected size of the inflated
+        data
+
+    Returns:
+      The inflated data.
+    """
+    data,isize = block
+    data = zlib.decompress(data,-15)
+    if len(data) != isize:
+        raise IOError("BGZF block size mismatch (expected %d bytes, got %d)"
+                      % (isize,len(data)))
+    return data
+
+def deflate_bgzf_block(data,level=6):
+    """Compress data into a single BGZF block
+
+    Arguments:
+      data: the data to compress (at most BGZF_BLOCK_SIZE bytes)
+      level: (optional) zlib compression level
+
+    Returns:
+      The complete BGZF block (header, deflated data and trailer).
+    """
+    c = zlib.compressobj(level,zlib.DEFLATED,-15)
+    cdata = c.compress(data) + c.flush()
+    # Block size (minus 1) includes the 18 byte header and
+    # 8 byte trailer
+    return ''.join(("\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00",
+                    struct.pack('<H',len(cdata)+25),
+                    cdata,
+                    struct.pack('<II',zlib.crc32(data) & 0xffffffff,len(data))))
+
+#######################################################################
+# Classes
+#######################################################################
+
+class BGZFReader:
+    """Read data from a BGZF file, decompressing blocks in parallel
+
+    BGZF files consist of a series of independent gzip members
+    ("blocks") of at most 64Kb, each of which records its own size
+    in the header. This makes it possible to read the compressed
+    blocks sequentially but inflate them concurrently on a pool of
+    threads (zlib releases the interpreter lock while inflating).
+
+    Batches of blocks are decompressed in the background so that
+    the next batch is being inflated while the data from the current
+    batch is being consumed.
+
+    Example:
+
+    >>> fp = BGZFReader('my.gff.gz')
+    >>> data = fp.read(1024)
+    >>> fp.close()
+    """
+
+    def __init__(self,filen=None,fp=None,threads=None):
+        """Create a new BGZFReader
+
+        Arguments:
+          filen: name of the BGZF file to read from
+          fp: file-like object to read BGZF data from
+          threads: (optional) number of threads to use to
+            decompress blocks (defaults to the number of CPUs)
+        """
+        if fp is not None:
+            self.__fp = fp
+            self.__close_fp = False
+        else:
+            self.__fp = open(filen,'rb')
+            self.__close_fp = True
+        if threads is None:
+            threads = multiprocessing.cpu_count()
+        self.__nblocks = max(threads,1)*BGZF_BLOCKS_PER_THREAD
+        self.__pool = ThreadPool(max(threads,1))
+        self.__buffer = ''
+        # Start decompressing the first batch
+        self.__pending = self.__next_batch()
+
+    def __read_block(self):
+        """Internal: read the deflated data for the next block
+
+        Returns a tuple (data,isize) where 'data' is the raw deflated
+        data and 'isize' the expected size of the inflated data, or
+        None if there are no more blocks.
+        """
+        header = self.__fp.read(12)
+        if not header:
+            return None
+        if len(header) < 12 or not header.startswith(GZIP_MAGIC):
+            raise IOError("Bad BGZF block header")
+        xlen = struct.unpack('<H',header[10:12])[0]
+        extra = self.__fp.read(xlen)
+        # Locate the 'BC' subfield holding the block size
+        bsize = None
+        i = 0
+        while i + 4 <= len(extra):
+            slen = struct.unpack('<H',extra[i+2:i+4])[0]
+            if extra[i:i+2] == 'BC':
+                bsize = struct.unpack('<H',extra[i+4:i+6])[0]
+                break
+            i += 4 + slen
+        if bsize is None:
+            raise IOError("Missing block size in BGZF block header")
+        data = self.__fp.read(bsize - xlen - 19)
+        trailer = self.__fp.read(8)
+        if len(trailer) < 8:
+            raise IOError("Truncated BGZF block")
+        isize = struct.unpack('<I',trailer[4:8])[0]
+        return (data,isize)
+
+    def __next_batch(self):
+        """Internal: start decompressing the next batch of blocks
+
+        Returns an AsyncResult for the list of inflated blocks, or
+        None if there are no more blocks.
+        """
+        blocks = []
+        while len(blocks) < self.__nblocks:
+            block = self.__read_block()
+            if block is None:
+                break
+            blocks.append(block)
+        if not blocks:
+            return None
+        return self.__pool.map_async(inflate_bgzf_block,blocks)
+
+    def __fill_buffer(self):
+        """Internal: append the next batch of inflated data to the buffer
+
+        Returns False if there is no more data.
+        """
+        if self.__pending is None:
+            return False
+        data = self.__pending.get()
+        self.__pending = self.__next_batch()
+        self.__buffer += ''.join(data)
+        return True
+
+    def read(self,size=-1):
+        """Read up to 'size' bytes of decompressed data
+
+        If 'size' is negative or omitted then all the remaining
+        data is returned.
+        """
+        if size is None or size < 0:
+            while self.__fill_buffer():
+                pass
+        else:
+            while len(self.__buffer) < size and self.__fill_buffer():
+                pass
+            if len(self.__buffer) > size:
+                data = self.__buffer[:size]
+                self.__buffer = self.__buffer[size:]
+                return data
+        data = self.__buffer
+        self.__buffer = ''
+        return data
+
+    def close(self):
+        """Close the file and shut down the thread pool
+        """
+        self.__pool.terminate()
+        if self.__close_fp:
+            self.__fp.close()
+
+class BGZFWriter:
+    """Write data to a BGZF file, compressing blocks in parallel
+
+    Data are split into blocks of at most BGZF_BLOCK_SIZE bytes and
+    each block is compressed as an independent gzip member, so that
+    the output can be read by BGZFReader, bgzip, tabix and standard
+    gzip tools. Batches of blocks are compressed concurrently on a
+    pool of threads (zlib releases the interpreter lock while
+    deflating).
+
+    The empty end-of-file marker block is written when the writer
+    is closed.
+
+    Example:
+
+    >>> fp = BGZFWriter('my.gff.gz')
+    >>> fp.write(data)
+    >>> fp.close()
+    """
+
+    def __init__(self,filen=None,fp=None,threads=None,level=6):
+        """Create a new BGZFWriter
+
+        Arguments:
+          filen: name of the BGZF file to write to
+          fp: file-like object to write BGZF data to
+          threads: (optional) number of threads to use to
+            compress blocks (defaults to the number of CPUs)
+          level: (optional) zlib compression level (default 6)
+        """
+        if fp is not None:
+            self.__fp = fp
+            self.__close_fp = False
+        else:
+            self.__fp = open(filen,'wb')
+            self.__close_fp = True
+        if threads is None:
+            threads = multiprocessing.cpu_count()
+        self.__level = level
+        self.__nblocks = max(threads,1)*BGZF_BLOCKS_PER_THREAD
+        self.__pool = ThreadPool(max(threads,1))
+        self.__buffer = []
+        self.__buffer_size = 0
+
+    def __write_blocks(self,flush=False):
+        """Internal: compress and write out buffered data
+
+        Only complete blocks are written unless 'flush' is True,
+        in which case all the buffered data is written.
+        """
+        data = ''.join(self.__buffer)
+        nfull = len(data)//BGZF_BLOCK_SIZE
+        if flush:
+            nblocks = nfull + (1 if len(data) % BGZF_BLOCK_SIZE else 0)
+        else:
+            nblocks = nfull
+        blocks = [data[i*BGZF_BLOCK_SIZE:(i+1)*BGZF_BLOCK_SIZE]
+                  for i in xrange(nblocks)]
+        data = data[nblocks*BGZF_BLOCK_SIZE:]
+        self.__buffer = [data] if data else []
+        self.__buffer_size = len(data)
+        if blocks:
+            level = self.__level
+            blocks = self.__pool.map(lambda block: deflate_bgzf_block(block,level),
+                                     blocks)
+            self.__fp.write(''.join(blocks))
+
+    def write(self,data):
+        """Write data to the file
+        """
+        self.__buffer.append(data)
+        self.__buffer_size += len(data)
+        if self.__buffer_size >= self.__nblocks*BGZF_BLOCK_SIZE:
+            self.__write_blocks()
+
+    def flush(self):
+        """Compress and write out all the buffered data
+        """
+        self.__write_blocks(flush=True)
+        self.__fp.flush()
+
+    def close(self):
+        """Write any remaining data, the EOF marker, and close the file
+        """
+        self.__write_blocks(flush=True)
+        self.__fp.write(BGZF_EOF)
+        self.__pool.terminate()
+        if self.__close_fp:
+            self.__fp.close()
+        else:
+            self.__fp.flush()
@@ -37,6 +37,11 @@ In this case the output from htseq-count will reproduce the 'Parent'
 attribute verbatim, e.g. AF2312,AB2812,abc-3. However
 GFF3_Annotation_Extractor will be unable to determine the parent genes
 in this case, and so will issue a warning and continue.
+
+(Features in the GFF with multiple parents are also reported with a
+warning; their parent gene is the first gene found by following the
+parents, with a further warning if the parents lead to different
+genes.)
 """
 
 #######################################################################
@@ -83,7 +88,7 @@ class GFFAnnotationLookup:
         """
         self.__feature_data_format = gff_data.format
         self.__lookup_id = {}
-        self.__lookup_parent = {}
+        self.__hierarchy = None
         print "Input file is '%s' format" % self.__feature_data_format
         if self.__feature_data_format == 'gff':
             self._load_from_gff(gff_data,id_attr=id_attr)
@@ -94,31 +99,24 @@ class GFFAnnotationLookup:
 
     def _load_from_gff(self,gff_data,id_attr=None):
         """Create the lookup tables from GFF input
+
+        Uses the hierarchy index of the GFFFile (which is kept
+        in the parse cache, if one is being used).
         """
         if id_attr is None:
             id_attr = 'ID'
-        parent_attr = 'Parent'
-        for line in gff_data:
-            if id_attr in line['attributes']:
-                # Check that the ID is unique
-                idx = line['attributes'][id_attr]
-                if idx in self.__lookup_id:
-                    logging.warning("Identifier '%s' is not unique: "
-                                    "feature '%s' already found" % (id_attr,idx))
-                # Store reference to data by ID
-                self.__lookup_id[idx] = line
-                if parent_attr in line['attributes']:
-                    # Store reference to parent by ID
-                    parent = line['attributes'][parent_attr]
-                    self.__lookup_parent[idx] = parent
-                    # Check for multiple parents
-                    if len(parent.split(',')) > 1:
-                        # Issue a warning but continue for now
-                        logging.warning("Multiple parents found on line %d: %s" % (line.lineno(),
-                                                                                   parent))
-            else:
-                logging.warning("No identifier attribute (%s) on line %d" % 
-                                (id_attr,line.lineno()))
+        self.__hierarchy = gff_data.hierarchy(id_attr=id_attr)
+        for idx in self.__hierarchy.duplicate_ids():
+            logging.warning("Identifier '%s' is not unique: "
+                            "feature '%s' already found" % (id_attr,idx))
+        for line in self.__hierarchy.multiple_parents():
+            if id_attr not in line['attributes']:
+                continue
+            logging.warning("Multiple parents found on line %d: %s" %
+                            (line.lineno(),line['attributes']['Parent']))
+        for line in self.__hierarchy.unidentified():
+            logging.warning("No identifier attribute (%s) on line %d" %
+                            (id_attr,line.lineno()))
 
     def _load_from_gtf(self,gtf_data,id_attr=None):
         """Create the lookup tables from GTF input
@@ -147,6 +145,8 @@ class GFFAnnotationLookup:
           Line of data where the value of the ID attribute matches the
           one supplied; raises KeyError exception if no match is found.
         """
+        if self.__hierarchy is not None:
+            return self.__hierarchy.record(idx)
         return self.__lookup_id[idx]
 
     def getParentID(self,idx):
@@ -159,7 +159,10 @@ class GFFAnnotationLookup:
           ID attribute value of the parent feature; raises KeyError
           exception if no Parent is found
         """
-        return self.__lookup_parent[idx]
+        if self.__hierarchy is None:
+            raise KeyError(idx)
+        attributes = self.getDataFromID(idx)['attributes']
+        return attributes[self.__hierarchy.parent_attr]
 
     def getAncestorGene(self,idx):
         """Return line of data for 'ancestor gene' of feature
@@ -172,18 +175,18 @@ class GFFAnnotationLookup:
           feature identified by the supplied ID attribute; returns None
           if no parent is found.
         """
-        # Follow parents until we find the "ancestor" gene
-        idx0 = idx
-        try:
-            while True:
-                idx0 = self.getParentID(idx0)
-        except KeyError,ex:
-            if idx0 != idx:
-                # Check that it's a gene
-                data = self.getDataFromID(idx0)
-                assert(data['feature'] == 'gene')
-                return data
-        return None
+        if self.__hierarchy is None:
+            return None
+        # Look up the root of the hierarchy above the feature
+        roots = self.__hierarchy.roots(idx)
+        if not roots or roots[0] is self.getDataFromID(idx):
+            return None
+        if len(roots) > 1:
+            logging.warning("Multiple ancestor genes found for '%s'" % idx)
+        # Check that it's a gene
+        data = roots[0]
+        assert(data['feature'] == 'gene')
+        return data
 
     def getAnnotation(self,idx):
         """Return annotation data for the supplied feature ID
@@ -523,6 +526,9 @@ def main():
     p.add_option('--htseq-count',action="store_true",dest="htseq_count",default=False,
                  help="htseq-count mode: input is one or more output FEATURE_COUNT files from "
                  "the htseq-count program")
+    p.add_option('--cache-dir',action="store",dest="cache_dir",default=None,
+                 help="directory to keep parsed copies of GFF/GTF files in, so that "
+                 "subsequent runs with the same GFF_FILE can skip reading it")
     options,arguments = p.parse_args()
 
     # Determine what mode to operate in
@@ -555,23 +561,34 @@ def main():
     # Feature type being considered
     feature_type = options.feature_type
 
+    # Input file name without any compression extension
+    gff_file_name = gff_file
+    for ext in ('.gz','.bgz','.zst'):
+        if gff_file_name.endswith(ext):
+            gff_file_name = gff_file_name[:-len(ext)]
+            break
+
     # Output file
     if options.out_file:
         out_file = options.out_file
     else:
-        out_file = os.path.splitext(os.path.basename(gff_file))[0] + "_annot.txt"
+        out_file = os.path.splitext(os.path.basename(gff_file_name))[0] + "_annot.txt"
 
     # Process GFF/GTF data
     print "Reading data from %s" % gff_file
-    if gff_file.endswith('.gtf'):
-        gff = GTFFile.GTFFile(gff_file)
+    if gff_file_name.endswith('.gtf'):
+        # Only 'gene' features are used for GTF lookups
+        gff = GTFFile.GTFFile(gff_file,intern_strings=True,features='gene',
+                              cache_dir=options.cache_dir)
     else:
-        gff = GFFFile.GFFFile(gff_file)
+        gff = GFFFile.GFFFile(gff_file,intern_strings=True,
+                              cache_dir=options.cache_dir)
     feature_format = gff.format.upper()
 
     # Build lookup
     print "Creating lookup for %s" % feature_format
     feature_lookup = GFFAnnotationLookup(gff,id_attr=options.id_attribute)
+    logging.debug(gff.intern_table.report())
 
     # Annotate input data
     if htseq_count_mode:
@@ -0,0 +1,331 @@
+#!/bin/env python
+#
+#     GFFArrow.py: Arrow/Parquet storage of GFF data
+#
+########################################################################
+#
+# GFFArrow.py
+#
+#########################################################################
+
+"""GFFArrow
+
+Functions for converting the annotation records from a GFF or GTF
+file to and from Apache Arrow tables, and for storing them on disk
+as Parquet or Arrow IPC files.
+
+A pre-converted annotation can be loaded without reparsing the text,
+and because the data are stored by column other programs can read
+just the columns that they need (for example using
+pyarrow.parquet.read_table(filen,columns=['seqname','start','end'])).
+
+Functions
+---------
+
+ * to_arrow: convert a GFFFile or GFFColumns to an Arrow table
+ * from_arrow: convert an Arrow table to GFFColumns
+ * write_parquet/read_parquet: store GFF data as a Parquet file
+ * write_ipc/read_ipc: store GFF data as an Arrow IPC file
+
+Schema
+------
+
+The tables have the following columns:
+
+ * seqname, source, feature, strand: dictionary-encoded strings
+ * start, end, lineno: int64
+ * score: float64 (null for '.' or non-numeric scores)
+ * frame: int8 (null for '.')
+ * attributes: the raw attribute strings
+ * score_text: non-numeric scores (null for all other records)
+
+Values of selected attributes can also be 'promoted' to their own
+string columns, named 'attr_' followed by the attribute name (e.g.
+'attr_gene_id'), which are null for records without the attribute.
+These columns are not used when the data are read back.
+
+The format and version of the original data are stored in the
+table metadata.
+
+Usage examples
+--------------
+
+Convert a GTF file to Parquet, promoting the gene IDs:
+
+>>> gtf = GTFFile('my.gtf')
+>>> write_parquet(gtf,'my.parquet',attributes=('gene_id',))
+
+and load it again:
+
+>>> gtf = read_parquet('my.parquet',gff_class=GTFFile)
+
+The same operations are available as the 'to_parquet', 'from_parquet',
+'to_arrow_ipc' and 'from_arrow_ipc' methods of GFFFile.
+
+This module requires NumPy and pyarrow 0.15.0 or later (0.16.0 is
+the last release of pyarrow which supports Python 2).
+"""
+
+#######################################################################
+# Import modules that this module depends on
+#######################################################################
+
+import GFFFile
+import GFFColumns
+from distutils.version import LooseVersion
+try:
+    import numpy
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+#######################################################################
+# Constants/globals
+#######################################################################
+
+# Columns which hold the GFF data
+ARROW_COLUMNS = ('seqname',
+                 'source',
+                 'feature',
+                 'start',
+                 'end',
+                 'score',
+                 'strand',
+                 'frame',
+                 'attributes',
+                 'lineno',
+                 'score_text')
+
+# Prefix for the names of columns with promoted attributes
+PROMOTED_PREFIX = 'attr_'
+
+# Keys for the table metadata
+FORMAT_METADATA_KEY = 'gff_format'
+VERSION_METADATA_KEY = 'gff_version'
+
+# Strand values in the order used for the dictionary encoding
+_STRANDS = ('.','+','-','?')
+
+# Oldest version of pyarrow which is supported
+MIN_PYARROW_VERSION = '0.15.0'
+
+#######################################################################
+# Functions
+#######################################################################
+
+def to_arrow(gff_data,attributes=None):
+    """Convert GFF data to an Arrow table
+
+    Arguments:
+      gff_data: populated GFFFile (or GTFFile) or GFFColumns
+        instance
+      attributes: (optional) list of attribute names to promote
+        to their own columns (GFFFile input only)
+    """
+    _check_pyarrow()
+    if isinstance(gff_data,GFFColumns.GFFColumns):
+        cols = gff_data
+        if attributes:
+            raise ValueError("Promoting attributes requires a GFFFile")
+    else:
+        cols = GFFColumns.GFFColumns.from_gff(gff_data)
+    # Strand codes are mapped onto positions in _STRANDS
+    strand_index = numpy.zeros(5,dtype=numpy.int32)
+    for i,strand in enumerate(_STRANDS):
+        strand_index[GFFColumns.STRAND_CODES[strand]+1] = i
+    # Non-numeric scores
+    score_text = [cols.score_text.get(i) for i in xrange(len(cols))] \
+                  if cols.score_text else [None]*len(cols)
+    arrays = [_dictionary_array(cols.seqname),
+              _dictionary_array(cols.source),
+              _dictionary_array(cols.feature),
+              pyarrow.array(cols.start,type=pyarrow.int64()),
+              pyarrow.array(cols.end,type=pyarrow.int64()),
+              pyarrow.array(cols.score,type=pyarrow.float64(),
+                            mask=numpy.isnan(cols.score)),
+              pyarrow.DictionaryArray.from_arrays(
+                  strand_index[cols.strand.astype(numpy.int32)+1],
+                  pyarrow.array(list(_STRANDS),type=pyarrow.string())),
+              pyarrow.array(cols.frame,type=pyarrow.int8(),
+                            mask=(cols.frame < 0)),
+              pyarrow.array(cols.attributes.tolist(),type=pyarrow.string()),
+              pyarrow.array(cols.lineno,type=pyarrow.int64()),
+              pyarrow.array(score_text,type=pyarrow.string())]
+    names = list(ARROW_COLUMNS)
+    # Promoted attributes
+    for key in (attributes or ()):
+        values = []
+        for line in gff_data:
+            value = line['attributes'][key] if key in line['attributes'] \
+                    else None
+            values.append(value)
+        arrays.append(pyarrow.array(values,type=pyarrow.string()))
+        names.append(PROMOTED_PREFIX + key)
+    table = pyarrow.Table.from_arrays(arrays,names=names)
+    metadata = { FORMAT_METADATA_KEY: str(cols.format), }
+    if cols.version is not None:
+        metadata[VERSION_METADATA_KEY] = str(cols.version)
+    return table.replace_schema_metadata(metadata)
+
+def from_arrow(table):
+    """Convert an Arrow table to a GFFColumns instance
+
+    Arguments:
+      table: Arrow table with the columns written by 'to_arrow'
+    """
+    _check_pyarrow()
+    metadata = table.schema.metadata or {}
+    format = metadata.get(FORMAT_METADATA_KEY,'gff')
+    version = metadata.get(VERSION_METADATA_KEY)
+    lineno = _to_numpy(table.column('lineno')).astype(numpy.int64)
+    score_text = {}
+    for i,value in enumerate(table.column('score_text').to_pylist()):
+        if value is not None:
+            score_text[i] = value
+    frame = _to_numpy(table.column('frame')).astype(numpy.float64)
+    strand = _to_categorical(table.column('strand'))
+    strand_codes = numpy.array([GFFColumns.STRAND_CODES.get(s,0)
+                                for s in strand.categories],
+                               dtype=numpy.int8)
+    return GFFColumns.GFFColumns(
+        seqname=_to_categorical(table.column('seqname')),
+        source=_to_categorical(table.column('source')),
+        feature=_to_categorical(table.column('feature')),
+        start=_to_numpy(table.column('start')).astype(numpy.int64),
+        end=_to_numpy(table.column('end')).astype(numpy.int64),
+        score=_to_numpy(table.column('score')).astype(numpy.float64),
+        strand=strand_codes[strand.codes] if len(strand_codes) else
+        numpy.zeros(len(strand),dtype=numpy.int8),
+        frame=numpy.where(numpy.isnan(frame),-1,frame).astype(numpy.int8),
+        attributes=numpy.array(table.column('attributes').to_pylist(),
+                               dtype=object),
+        lineno=lineno,
+        score_text=score_text,
+        format=format,
+        version=version)
+
+def write_parquet(gff_data,filen,attributes=None,compression='snappy'):
+    """Write GFF data to a Parquet file
+
+    Arguments:
+      gff_data: populated GFFFile (or GTFFile) or GFFColumns
+        instance
+      filen: name of the file to write to
+      attributes: (optional) list of attribute names to promote
+        to their own columns
+      compression: (optional) compression codec to use (default
+        'snappy')
+    """
+    _check_pyarrow()
+    pyarrow.parquet.write_table(to_arrow(gff_data,attributes=attributes),
+                                filen,compression=compression)
+
+def read_parquet(filen,gff_class=GFFFile.GFFFile):
+    """Read GFF data from a Parquet file
+
+    Only the columns needed to reconstruct the records are read.
+
+    Arguments:
+      filen: name of the Parquet file
+      gff_class: (optional) GFFFile-like class to populate
+        (e.g. GTFFile)
+    """
+    _check_pyarrow()
+    table = pyarrow.parquet.read_table(filen,columns=list(ARROW_COLUMNS))
+    return from_arrow(table).to_gff(gff_class=gff_class)
+
+def write_ipc(gff_data,filen,attributes=None):
+    """Write GFF data to an Arrow IPC ('Feather' version 2) file
+
+    Arguments:
+      gff_data: populated GFFFile (or GTFFile) or GFFColumns
+        instance
+      filen: name of the file to write to
+      attributes: (optional) list of attribute names to promote
+        to their own columns
+    """
+    table = to_arrow(gff_data,attributes=attributes)
+    sink = pyarrow.OSFile(filen,'wb')
+    try:
+        writer = pyarrow.ipc.RecordBatchFileWriter(sink,table.schema)
+        writer.write_table(table)
+        writer.close()
+    finally:
+        sink.close()
+
+def read_ipc(filen,gff_class=GFFFile.GFFFile):
+    """Read GFF data from an Arrow IPC file
+
+    The file is memory-mapped, so only the columns needed to
+    reconstruct the records are read from disk.
+
+    Arguments:
+      filen: name of the Arrow IPC file
+      gff_class: (optional) GFFFile-like class to populate
+        (e.g. GTFFile)
+    """
+    _check_pyarrow()
+    source = pyarrow.memory_map(filen,'r')
+    try:
+        table = pyarrow.ipc.open_file(source).read_all()
+        return from_arrow(table).to_gff(gff_class=gff_class)
+    finally:
+        source.close()
+
+def _check_pyarrow():
+    """Internal: raise ImportError if pyarrow isn't usable
+    """
+    if pyarrow is None:
+        raise ImportError("GFFArrow requires pyarrow")
+    if LooseVersion(pyarrow.__version__) < LooseVersion(MIN_PYARROW_VERSION):
+        raise ImportError("GFFArrow requires pyarrow %s or later (found %s)"
+                          % (MIN_PYARROW_VERSION,pyarrow.__version__))
+
+def _dictionary_array(categorical):
+    """Internal: convert GFFCategorical to Arrow dictionary array
+    """
+    return pyarrow.DictionaryArray.from_arrays(
+        categorical.codes,
+        pyarrow.array(categorical.categories,type=pyarrow.string()))
+
+def _to_categorical(column):
+    """Internal: convert Arrow column to GFFCategorical
+
+    Each chunk of a dictionary-encoded column can have its own
+    dictionary, so the codes are remapped onto a single list of
+    categories; columns which aren't dictionary-encoded are
+    encoded from their values.
+    """
+    if not isinstance(column.type,pyarrow.DictionaryType):
+        return GFFColumns.GFFCategorical(column.to_pylist())
+    categories = []
+    index = {}
+    codes = []
+    for chunk in column.chunks:
+        dictionary = chunk.dictionary.to_pylist()
+        remap = numpy.empty(len(dictionary),dtype=numpy.int32)
+        for i,value in enumerate(dictionary):
+            try:
+                remap[i] = index[value]
+            except KeyError:
+                remap[i] = index[value] = len(categories)
+                categories.append(value)
+        codes.append(remap[_to_numpy(chunk.indices).astype(numpy.int64)])
+    if codes:
+        codes = numpy.concatenate(codes)
+    else:
+        codes = numpy.empty(0,dtype=numpy.int32)
+    return GFFColumns.GFFCategorical(codes=codes,categories=categories)
+
+def _to_numpy(column):
+    """Internal: convert Arrow array or column to NumPy array
+
+    Null values in floating point columns become NaN.
+    """
+    chunks = getattr(column,'chunks',[column])
+    if not chunks:
+        return numpy.empty(0)
+    return numpy.concatenate([chunk.to_numpy(zero_copy_only=False)
+                              for chunk in chunks])
@@ -0,0 +1,325 @@
+#!/bin/env python
+#
+#     GFFCache.py: on-disk cache of parsed GFF data
+#
+########################################################################
+#
+# GFFCache.py
+#
+#########################################################################
+
+"""GFFCache
+
+Classes and functions for keeping binary snapshots of parsed GFF (or
+GTF) data in a cache directory, so that programs which repeatedly
+load the same annotation file can skip reparsing it.
+
+Each entry in the cache is identified by a key which is derived from
+the absolute path, size and modification time of the source file
+(and optionally a hash of its contents), plus any options which
+affect the parsed data (e.g. the record class and line filters).
+Changing the file therefore produces a different key, and the stale
+entry is eventually removed.
+
+The total size of the cache is limited: when a new entry is stored
+the least recently used entries are removed until the total size is
+within the limit.
+
+Classes
+-------
+
+ * GFFCache: store and retrieve snapshots in a cache directory
+
+Functions
+---------
+
+ * mtime_ns: return modification time from stat results in nanoseconds
+ * subkey: return key for data derived from a cache entry
+ * content_hash: return SHA1 digest of the contents of a file
+
+Usage examples
+--------------
+
+Normally the cache is used via the 'cache_dir' argument of GFFFile
+(or GTFFile):
+
+>>> gff = GFFFile('my.gff',cache_dir='/tmp/gff_cache')
+
+The first time this is run the file is parsed and a snapshot is
+written to the cache; subsequently the snapshot is loaded instead.
+
+To use a cache directly:
+
+>>> cache = GFFCache('/tmp/gff_cache')
+>>> key = cache.key('my.gff')
+>>> data = cache.load(key)
+>>> if data is None:
+...    data = expensive_operation('my.gff')
+...    cache.store(key,data)
+
+Data are stored using the 'marshal' module, so only basic types
+(strings, numbers, tuples, lists, dictionaries and None) can be
+cached.
+"""
+
+#######################################################################
+# Import modules that this module depends on
+#######################################################################
+
+import os
+import marshal
+import hashlib
+import tempfile
+import logging
+
+#######################################################################
+# Constants/globals
+#######################################################################
+
+# Extension for cache entry files
+CACHE_EXTENSION = '.gfc'
+
+# Version of the cache entry format
+CACHE_VERSION = 3
+
+# Default maximum total size of a cache directory (1Gb)
+DEFAULT_CACHE_SIZE = 1024*1024*1024
+
+# Size of blocks read when hashing file contents (4Mb)
+HASH_BLOCK_SIZE = 4*1024*1024
+
+#######################################################################
+# Classes
+#######################################################################
+
+class GFFCache:
+    """Class for storing and retrieving snapshots in a cache directory
+
+    The cache directory is created if it doesn't already exist.
+    Each entry is stored in its own file, and the modification time
+    of the file is updated whenever the entry is loaded so that it
+    can be used to determine which entries were least recently used.
+    """
+    def __init__(self,cache_dir,max_size=None):
+        """Create a new GFFCache
+
+        Arguments:
+          cache_dir: path to the cache directory
+          max_size: (optional) maximum total size in bytes of the
+            entries in the cache (default 1Gb)
+        """
+        if max_size is None:
+            max_size = DEFAULT_CACHE_SIZE
+        self.__cache_dir = os.path.abspath(cache_dir)
+        self.__max_size = max_size
+        if not os.path.isdir(self.__cache_dir):
+            try:
+                os.makedirs(self.__cache_dir)
+            except OSError:
+                # Could have been created by another process
+                if not os.path.isdir(self.__cache_dir):
+                    raise
+
+    @property
+    def cache_dir(self):
+        """Return the path to the cache directory
+        """
+        return self.__cache_dir
+
+    @property
+    def max_size(self):
+        """Return the maximum total size of the cache
+        """
+        return self.__max_size
+
+    def key(self,filen,options=(),hash_contents=False):
+        """Return the cache key for a file
+
+        Arguments:
+          filen: name of the source file
+          options: (optional) tuple of values describing other
+            options which affect the cached data (must have a
+            stable repr)
+          hash_contents: if True then also include a hash of the
+            contents of the file in the key (default is to only
+            use the size and modification time)
+        """
+        filen = os.path.abspath(filen)
+        st = os.stat(filen)
+        if hash_contents:
+            digest = content_hash(filen)
+        else:
+            digest = None
+        data = repr((CACHE_VERSION,filen,st.st_size,mtime_ns(st),digest,
+                     tuple(options)))
+        return hashlib.sha1(data).hexdigest()
+
+    def path(self,key):
+        """Return the path of the file for a cache entry
+
+        Arguments:
+          key: cache key (e.g. from the 'key' method)
+        """
+        return os.path.join(self.__cache_dir,key+CACHE_EXTENSION)
+
+    def __contains__(self,key):
+        return os.path.exists(self.path(key))
+
+    def load(self,key):
+        """Return the data stored for a key
+
+        Returns None if there is no entry for the key or if it
+        can't be read.
+
+        Arguments:
+          key: cache key (e.g. from the 'key' method)
+        """
+        path = self.path(key)
+        try:
+            fp = open(path,'rb')
+            try:
+                version,data = marshal.load(fp)
+            finally:
+                fp.close()
+        except (IOError,EOFError,ValueError,TypeError):
+            return None
+        if version != CACHE_VERSION:
+            return None
+        # Mark as recently used
+        try:
+            os.utime(path,None)
+        except OSError:
+            pass
+        return data
+
+    def store(self,key,data):
+        """Store data in the cache
+
+        The data are written to a temporary file which is then
+        renamed, so that other processes never see a partial
+        entry. Least recently used entries are then removed to
+        keep the cache within its maximum size.
+
+        Arguments:
+          key: cache key (e.g. from the 'key' method)
+          data: data to store (must be marshallable)
+        """
+        fd,tmp_file = tempfile.mkstemp(suffix='.tmp',dir=self.__cache_dir)
+        try:
+            fp = os.fdopen(fd,'wb')
+            try:
+                marshal.dump((CACHE_VERSION,data),fp,2)
+            finally:
+                fp.close()
+            os.rename(tmp_file,self.path(key))
+        except Exception:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+        self.evict(keep=(key,))
+
+    def remove(self,key):
+        """Remove the entry for a key (if present)
+
+        Arguments:
+          key: cache key (e.g. from the 'key' method)
+        """
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def entries(self):
+        """Return list of the entries in the cache
+
+        Returns a list of (key,size,last_used) tuples, ordered
+        from least to most recently used.
+        """
+        entries = []
+        for name in os.listdir(self.__cache_dir):
+            if not name.endswith(CACHE_EXTENSION):
+                continue
+            try:
+                st = os.stat(os.path.join(self.__cache_dir,name))
+            except OSError:
+                continue
+            entries.append((name[:-len(CACHE_EXTENSION)],
+                            st.st_size,st.st_mtime))
+        entries.sort(key=lambda entry: entry[2])
+        return entries
+
+    def size(self):
+        """Return the total size of the entries in the cache
+        """
+        return sum([entry[1] for entry in self.entries()])
+
+    def evict(self,keep=()):
+        """Remove least recently used entries until within maximum size
+
+        Arguments:
+          keep: (optional) list of keys which shouldn't be
+            removed
+        """
+        entries = self.entries()
+        total = sum([entry[1] for entry in entries])
+        for key,size,last_used in entries:
+            if total <= self.__max_size:
+                break
+            if key in keep:
+                continue
+            logging.debug("Removing %s from GFF cache" % key)
+            self.remove(key)
+            total -= size
+
+    def clear(self):
+        """Remove all entries from the cache
+        """
+        for key,size,last_used in self.entries():
+            self.remove(key)
+
+#######################################################################
+# Functions
+#######################################################################
+
+def mtime_ns(st):
+    """Return modification time from stat results in nanoseconds
+
+    The time is returned as an integer (the floating point value
+    doesn't survive being repr'ed and reset via os.utime exactly).
+
+    Arguments:
+      st: result of os.stat
+    """
+    mtime = getattr(st,'st_mtime_ns',None)
+    if mtime is None:
+        mtime = int(round(st.st_mtime*1e9))
+    return mtime
+
+def subkey(key,*options):
+    """Return a key for data derived from another cache entry
+
+    Arguments:
+      key: cache key of the original entry
+      options: values identifying the derived data (must have
+        a stable repr)
+    """
+    return hashlib.sha1(repr((key,)+options)).hexdigest()
+
+def content_hash(filen,block_size=HASH_BLOCK_SIZE):
+    """Return SHA1 digest of the contents of a file
+
+    Arguments:
+      filen: name of the file
+      block_size: (optional) size of the blocks of data to read
+    """
+    sha1 = hashlib.sha1()
+    fp = open(filen,'rb')
+    try:
+        while True:
+            block = fp.read(block_size)
+            if not block:
+                break
+            sha1.update(block)
+    finally:
+        fp.close()
+    return sha1.hexdigest()
@@ -0,0 +1,602 @@
+#!/bin/env python
+#
+#     GFFColumns.py: columnar in-memory representation of GFF data
+#
+########################################################################
+#
+# GFFColumns.py
+#
+#########################################################################
+
+"""GFFColumns
+
+Classes for holding the annotation records from a GFF or GTF file as a
+set of NumPy arrays (one per column) rather than as a list of
+GFFDataLine objects, so that whole-file operations (filtering on
+feature type or coordinates, sorting, computing lengths etc) can be
+performed as vectorised array operations instead of interpreted loops
+over every record.
+
+Classes
+-------
+
+ * GFFColumns: columnar representation of GFF annotation records
+ * GFFCategorical: dictionary-encoded column of strings
+
+Columns are stored as follows:
+
+ * seqname, source, feature: GFFCategorical (int32 codes plus a
+   list of the distinct values)
+ * start, end: int64
+ * score: float64, with NaN for missing ('.') values
+ * strand: int8 codes (see STRAND_CODES)
+ * frame: int8, with -1 for missing ('.') values
+ * attributes: object array with the raw attribute strings
+ * lineno: int64 line numbers from the original file (0 for
+   records without a line number)
+
+Usage examples
+--------------
+
+Convert the data from a GFFFile:
+
+>>> gff = GFFFile('my.gff')
+>>> cols = GFFColumns.from_gff(gff)
+
+Or read directly from a file:
+
+>>> cols = GFFColumns.from_file('my.gff')
+
+Select the genes overlapping a region and sort them:
+
+>>> mask = cols.mask_feature('gene') & \\
+...        cols.mask_seqname('chr5') & \\
+...        cols.mask_overlaps(1000000,1200000)
+>>> genes = cols.filter(mask).sort()
+
+Convert back to GFFDataLine objects:
+
+>>> for line in genes.to_records():
+>>>    print line['attributes']['ID']
+
+This module requires NumPy.
+"""
+
+#######################################################################
+# Import modules that this module depends on
+#######################################################################
+
+import GFFFile
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#######################################################################
+# Constants/globals
+#######################################################################
+
+# Codes used to store strand values
+STRAND_CODES = { '.': 0,
+                 '+': 1,
+                 '-': -1,
+                 '?': 2, }
+STRAND_VALUES = dict([(code,strand) for strand,code in STRAND_CODES.items()])
+
+#######################################################################
+# Classes
+#######################################################################
+
+class GFFCategorical:
+    """Dictionary-encoded column of string values
+
+    Stores a column of strings as an array of integer codes, plus
+    a list of the distinct values ('categories') that the codes
+    refer to. This is compact for columns with few distinct values
+    (e.g. seqname, source and feature) and allows comparisons to
+    be performed on the integer codes.
+
+    The value for row i can be obtained using categorical[i].
+    """
+    def __init__(self,values=None,codes=None,categories=None):
+        """Create a new GFFCategorical
+
+        Arguments:
+          values: iterable of strings to encode
+          codes: (optional) array of existing codes (used with
+            'categories' instead of 'values')
+          categories: (optional) list of distinct values that
+            'codes' refer to
+        """
+        if values is not None:
+            categories = []
+            index = {}
+            codes = []
+            for value in values:
+                try:
+                    codes.append(index[value])
+                except KeyError:
+                    index[value] = len(categories)
+                    codes.append(len(categories))
+                    categories.append(value)
+            codes = numpy.array(codes,dtype=numpy.int32)
+        self.codes = codes
+        self.categories = categories
+        self.__index = dict([(value,i) for i,value in enumerate(categories)])
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self,i):
+        return self.categories[self.codes[i]]
+
+    def code(self,value):
+        """Return the integer code for a value (or -1 if not present)
+        """
+        return self.__index.get(value,-1)
+
+    def mask(self,*values):
+        """Return a boolean array which is True for rows matching any value
+        """
+        codes = [self.code(value) for value in values]
+        if len(codes) == 1:
+            return self.codes == codes[0]
+        return numpy.in1d(self.codes,codes)
+
+    def ranks(self):
+        """Return an array giving the sort position of each row's value
+        """
+        order = sorted(range(len(self.categories)),
+                       key=lambda i: self.categories[i])
+        rank = numpy.empty(len(self.categories),dtype=numpy.int32)
+        rank[order] = numpy.arange(len(order),dtype=numpy.int32)
+        return rank[self.codes]
+
+    def take(self,indices):
+        """Return a new GFFCategorical with a subset of rows
+
+        Arguments:
+          indices: boolean mask or array of row indices
+        """
+        return GFFCategorical(codes=self.codes[indices],
+                              categories=self.categories)
+
+    def values(self):
+        """Return a list of the decoded values for all rows
+        """
+        categories = self.categories
+        return [categories[i] for i in self.codes]
+
+class GFFColumns:
+    """Columnar representation of GFF annotation records
+
+    Holds the annotation records of a GFF/GTF file as one array per
+    column (see the module documentation for details of how each
+    column is stored), and provides vectorised operations to
+    generate masks, filter, sort and convert back to GFFDataLine
+    objects.
+
+    Instances are normally created using one of the 'from_gff',
+    'from_records', 'from_lines' or 'from_file' methods.
+
+    Note that scores which are not numbers or '.' are kept in their
+    original form; numeric scores are written out in a normalised
+    form (e.g. '0.50' becomes '0.5').
+    """
+    def __init__(self,seqname,source,feature,start,end,score,strand,frame,
+                 attributes,lineno,score_text=None,format='gff',version=None):
+        """Create a new GFFColumns instance from existing columns
+
+        Arguments:
+          seqname, source, feature: GFFCategorical columns
+          start, end, lineno: int64 arrays
+          score: float64 array
+          strand, frame: int8 arrays
+          attributes: object array of attribute strings
+          score_text: (optional) dictionary mapping row indices to
+            scores which are not numeric
+          format: (optional) format of the original data
+          version: (optional) version of the original data
+        """
+        if numpy is None:
+            raise ImportError("GFFColumns requires NumPy")
+        self.seqname = seqname
+        self.source = source
+        self.feature = feature
+        self.start = start
+        self.end = end
+        self.score = score
+        self.strand = strand
+        self.frame = frame
+        self.attributes = attributes
+        self.lineno = lineno
+        if score_text is None:
+            score_text = {}
+        self.score_text = score_text
+        self.format = format
+        self.version = version
+
+    @classmethod
+    def from_lines(cls,lines,linenos=None,format='gff',version=None):
+        """Create a new GFFColumns instance from annotation lines
+
+        Arguments:
+          lines: list of annotation lines (strings) from a GFF
+          linenos: (optional) list of line numbers corresponding
+            to each line (defaults to 1,2,3...); None is stored
+            as 0
+          format: (optional) format of the data (e.g. 'gff')
+          version: (optional) version of the data (e.g. '3')
+        """
+        if numpy is None:
+            raise ImportError("GFFColumns requires NumPy")
+        rows = []
+        for line in lines:
+            fields = line.rstrip('\n').split('\t',8)
+            if len(fields) < 9:
+                fields.extend(['']*(9-len(fields)))
+            rows.append(fields)
+        nrows = len(rows)
+        if rows:
+            columns = zip(*rows)
+        else:
+            columns = [()]*9
+        if linenos is None:
+            linenos = xrange(1,nrows+1)
+        # Scores: keep any non-numeric values as text
+        scores = numpy.empty(nrows,dtype=numpy.float64)
+        score_text = {}
+        for i,value in enumerate(columns[5]):
+            try:
+                scores[i] = float(value)
+            except ValueError:
+                scores[i] = numpy.nan
+                if value != '.':
+                    score_text[i] = value
+        # Frames
+        frames = numpy.fromiter((int(x) if x in ('0','1','2') else -1
+                                 for x in columns[7]),numpy.int8,nrows)
+        # Line numbers
+        linenos = numpy.fromiter((n or 0 for n in linenos),numpy.int64,nrows)
+        return cls(seqname=GFFCategorical(columns[0]),
+                   source=GFFCategorical(columns[1]),
+                   feature=GFFCategorical(columns[2]),
+                   start=numpy.fromiter((int(x) for x in columns[3]),
+                                        numpy.int64,nrows),
+                   end=numpy.fromiter((int(x) for x in columns[4]),
+                                      numpy.int64,nrows),
+                   score=scores,
+                   strand=numpy.fromiter((STRAND_CODES.get(x,0)
+                                          for x in columns[6]),
+                                         numpy.int8,nrows),
+                   frame=frames,
+                   attributes=numpy.array(columns[8],dtype=object),
+                   lineno=linenos,
+                   score_text=score_text,
+                   format=format,
+                   version=version)
+
+    @classmethod
+    def from_records(cls,records,format='gff',version=None):
+        """Create a new GFFColumns instance from GFFDataLine objects
+
+        Only records of type ANNOTATION (or with no type) are
+        included. Records without a line number (e.g. ones which
+        were inserted after the file was read) get 0.
+
+        Arguments:
+          records: iterable of GFFDataLine-like objects
+          format: (optional) format of the data (e.g. 'gff')
+          version: (optional) version of the data (e.g. '3')
+        """
+        lines = []
+        linenos = []
+        for record in records:
+            if record.type in (GFFFile.ANNOTATION,None):
+                lines.append(str(record))
+                linenos.append(record.lineno())
+        return cls.from_lines(lines,linenos,format=format,version=version)
+
+    @classmethod
+    def from_gff(cls,gff_data):
+        """Create a new GFFColumns instance from a GFFFile
+
+        Arguments:
+          gff_data: populated GFFFile or GTFFile instance
+        """
+        return cls.from_records(gff_data,format=gff_data.format,
+                                version=gff_data.version)
+
+    @classmethod
+    def from_file(cls,gff_file,format='gff'):
+        """Create a new GFFColumns instance by reading a GFF file
+
+        Arguments:
+          gff_file: name of the GFF/GTF file to read
+          format: (optional) format of the file (e.g. 'gtf')
+        """
+        lines = []
+        linenos = []
+        version = None
+        for line in GFFFile.GFFIterator(gff_file,
+                                        gffdataline=GFFFile.CompactGFFDataLine):
+            if line.type == GFFFile.ANNOTATION:
+                lines.append(str(line))
+                linenos.append(line.lineno())
+            elif line.type == GFFFile.PRAGMA:
+                pragma = str(line)[2:].split()
+                if pragma and pragma[0] == 'gff-version':
+                    version = pragma[1]
+        return cls.from_lines(lines,linenos,format=format,version=version)
+
+    def __len__(self):
+        return len(self.start)
+
+    def mask_seqname(self,*seqnames):
+        """Return boolean array which is True for matching seqnames
+        """
+        return self.seqname.mask(*seqnames)
+
+    def mask_source(self,*sources):
+        """Return boolean array which is True for matching sources
+        """
+        return self.source.mask(*sources)
+
+    def mask_feature(self,*features):
+        """Return boolean array which is True for matching features
+        """
+        return self.feature.mask(*features)
+
+    def mask_strand(self,strand):
+        """Return boolean array which is True for matching strand
+        """
+        return self.strand == STRAND_CODES[strand]
+
+    def mask_overlaps(self,start,end):
+        """Return boolean array which is True for records overlapping region
+
+        Arguments:
+          start: start coordinate of the region (inclusive)
+          end: end coordinate of the region (inclusive)
+        """
+        return (self.start <= end) & (self.end >= start)
+
+    def mask_within(self,start,end):
+        """Return boolean array which is True for records inside region
+
+        Arguments:
+          start: start coordinate of the region (inclusive)
+          end: end coordinate of the region (inclusive)
+        """
+        return (self.start >= start) & (self.end <= end)
+
+    def lengths(self):
+        """Return array with the length of each record
+        """
+        return self.end - self.start + 1
+
+    def take(self,indices):
+        """Return a new GFFColumns instance with a subset of rows
+
+        Arguments:
+          indices: boolean mask or array of row indices (which
+            can be used to reorder the rows)
+        """
+        score_text = {}
+        if self.score_text:
+            # Map the non-numeric scores onto the new row indices
+            rows = numpy.arange(len(self))[indices]
+            for i,row in enumerate(rows.tolist()):
+                if row in self.score_text:
+                    score_text[i] = self.score_text[row]
+        return GFFColumns(seqname=self.seqname.take(indices),
+                          source=self.source.take(indices),
+                          feature=self.feature.take(indices),
+                          start=self.start[indices],
+                          end=self.end[indices],
+                          score=self.score[indices],
+                          strand=self.strand[indices],
+                          frame=self.frame[indices],
+                          attributes=self.attributes[indices],
+                          lineno=self.lineno[indices],
+                          score_text=score_text,
+                          format=self.format,
+                          version=self.version)
+
+    def filter(self,mask):
+        """Return a new GFFColumns instance with rows where mask is True
+
+        Arguments:
+          mask: boolean array (e.g. from one of the 'mask_...'
+            methods)
+        """
+        return self.take(numpy.asarray(mask,dtype=bool))
+
+    def sort(self,*keys):
+        """Return a new GFFColumns instance with the rows sorted
+
+        Rows are sorted by 'seqname', 'start' and 'end' by default.
+        Categorical columns are sorted by value (not by code).
+
+        Arguments:
+          keys: (optional) names of the columns to sort on, in
+            order of priority
+        """
+        if not keys:
+            keys = ('seqname','start','end')
+        sort_keys = []
+        for key in keys:
+            column = getattr(self,key)
+            if isinstance(column,GFFCategorical):
+                column = column.ranks()
+            sort_keys.append(column)
+        # lexsort uses the last key as the primary key
+        sort_keys.reverse()
+        return self.take(numpy.lexsort(sort_keys))
+
+    def to_lines(self):
+        """Return a list of the records as tab-delimited strings
+        """
+        lines = []
+        seqname = self.seqname.values()
+        source = self.source.values()
+        feature = self.feature.values()
+        for i in xrange(len(self)):
+            if i in self.score_text:
+                score = self.score_text[i]
+            else:
+                score = format_score(self.score[i])
+            frame = self.frame[i]
+            lines.append('\t'.join((seqname[i],
+                                    source[i],
+                                    feature[i],
+                                    str(self.start[i]),
+                                    str(self.end[i]),
+                                    score,
+                                    STRAND_VALUES[int(self.strand[i])],
+                                    str(frame) if frame >= 0 else '.',
+                                    self.attributes[i])))
+        return lines
+
+    def to_fields(self,converted=False):
+        """Return a list of tuples of the column values for each record
+
+        By default the tuples are in the form used by the
+        '_from_fields' method of CompactGFFDataLine (i.e. strings,
+        except for the integer 'start' and 'end' values).
+
+        If 'converted' is True then they're in the form used by
+        GFFDataLine instead: numeric values are converted to int
+        or float (as when a line is split into a GFFDataLine), and
+        the text of the record is appended to each tuple.
+
+        Arguments:
+          converted: (optional) if True then return converted
+            values plus the text of each record
+        """
+        if converted:
+            convert = convert_value
+        else:
+            convert = lambda x: x
+        seqname = self.__decoded(self.seqname,convert)
+        source = self.__decoded(self.source,convert)
+        feature = self.__decoded(self.feature,convert)
+        score_text = self.score_text
+        scores = []
+        for i,score in enumerate(self.score.tolist()):
+            if i in score_text:
+                score = score_text[i]
+            elif score != score:
+                score = '.'
+            elif converted:
+                if score == int(score):
+                    score = int(score)
+            else:
+                score = format_score(score)
+            scores.append(score)
+        if converted:
+            frames = [frame if frame >= 0 else '.'
+                      for frame in self.frame.tolist()]
+        else:
+            frames = [str(frame) if frame >= 0 else '.'
+                      for frame in self.frame.tolist()]
+        strands = [STRAND_VALUES[strand] for strand in self.strand.tolist()]
+        fields = zip(seqname,
+                     source,
+                     feature,
+                     self.start.tolist(),
+                     self.end.tolist(),
+                     scores,
+                     strands,
+                     frames,
+                     self.attributes.tolist())
+        if converted:
+            fields = [values + (line,)
+                      for values,line in zip(fields,self.to_lines())]
+        return fields
+
+    def __decoded(self,categorical,convert):
+        """Internal: return list of converted values for a GFFCategorical
+
+        The conversion is only applied once for each category.
+        """
+        categories = [convert(value) for value in categorical.categories]
+        return [categories[i] for i in categorical.codes.tolist()]
+
+    def to_records(self,gffdataline=GFFFile.GFFDataLine):
+        """Return a list of the records as GFFDataLine objects
+
+        Records of GFFDataLine and CompactGFFDataLine classes (and
+        their subclasses) are created directly from the column
+        values, without splitting and converting the text of each
+        record; other classes are created from the text.
+
+        Records with a line number of 0 are given None.
+
+        Arguments:
+          gffdataline: (optional) GFFDataLine-like class to
+            instantiate for each record
+        """
+        linenos = [n or None for n in self.lineno.tolist()]
+        if issubclass(gffdataline,GFFFile.GFFDataLine):
+            fields = self.to_fields(converted=True)
+        elif issubclass(gffdataline,GFFFile.CompactGFFDataLine):
+            fields = self.to_fields()
+        else:
+            return [gffdataline(line=line,lineno=lineno,
+                                gff_line_type=GFFFile.ANNOTATION)
+                    for line,lineno in zip(self.to_lines(),linenos)]
+        from_fields = gffdataline._from_fields
+        return [from_fields(values,lineno=lineno,
+                            gff_line_type=GFFFile.ANNOTATION)
+                for values,lineno in zip(fields,linenos)]
+
+    def to_gff(self,gff_class=GFFFile.GFFFile):
+        """Return the records as a populated GFFFile
+
+        Arguments:
+          gff_class: (optional) GFFFile-like class to populate
+            (e.g. GTFFile)
+        """
+        gff = gff_class(None)
+        gff._version = self.version
+        for record in self.to_records(gffdataline=gff._gffdataline):
+            gff.append(tabdataline=record)
+        return gff
+
+#######################################################################
+# Functions
+#######################################################################
+
+def format_score(score):
+    """Return string representation of a numeric score
+
+    NaN values are converted to '.', and integer values are
+    written without a decimal point.
+
+    Arguments:
+      score: floating point value
+    """
+    if score != score:
+        return '.'
+    if score == int(score):
+        return str(int(score))
+    return repr(float(score))
+
+def convert_value(value):
+    """Convert a string to an int or float where possible
+
+    This is the conversion applied to each column when a line is
+    split into a GFFDataLine; strings which aren't numeric are
+    returned unchanged.
+
+    Arguments:
+      value: string to convert
+    """
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
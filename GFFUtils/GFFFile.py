@@ -22,6 +22,14 @@ There are a number of GFF-specific classes:
 
  * GFFIterator: line-by-line iteration through a GFF
  * GFFFile: read data from GFF into memory so it can be easily interrogated
+ * GFFWriter: write GFF records to a file in batches
+ * GFFDataLine: get data from a single line from a GFF file
+ * CompactGFFDataLine: memory-efficient alternative to GFFDataLine
+ * MappedGFFDataLine: read-only record referencing a memory-mapped file
+ * GFFProjection: specify the columns and attributes to extract
+ * GFFLineFilter: select annotation lines before they are parsed
+ * GFFInternTable: share repeated strings between records
+ * GFFAttributeIndex: look up records by the value of an attribute
  * GFFAttributes: read data from GFF attributes field to make it easier to
    handle
  * GFFID: handle data stored in 'ID' attribute
@@ -44,6 +52,12 @@ feature type:
 >>> for line in gff:
 >>>    print line['feature']
 
+To find the lines overlapping a region (using an interval index
+which is built the first time it is needed):
+
+>>> for line in gff.overlaps('chr5',1000000,1200000,feature='gene'):
+>>>    print line['attributes']['ID']
+
 (To iterate over all lines in the GFF without caching in memory,
 printing feature types for annotation records:
 
@@ -54,8 +68,8 @@ printing feature types for annotation records:
 )
 
 The 'attributes' data of each annotation record are automatically converted
-to a GFFAttributes object, which allows the values of named attributes to be
-referenced directly. For example, if the attributes string is:
+to a GFFAttributes object (the first time that they are accessed), which
+allows the values of named attributes to be referenced directly. For example, if the attributes string is:
 
 "ID=1690892742066571889;SGD=YEL026W;Gene=Sbay_5.43;Parent=Sbay_5.43"
 
@@ -86,10 +100,21 @@ try:
     from TabFile import TabFile,TabDataLine
 except ImportError:
     from bcftbx.TabFile import TabFile,TabDataLine
-import logging
-import copy
+import os
+import sys
+import mmap
+import marshal
 import urllib
+import logging
+import weakref
+import threading
+import Queue
+import multiprocessing
 from collections import Iterator
+import CompressedFile
+import GFFCache
+import GFFIntervals
+import GFFHierarchy
 
 #######################################################################
 # Constants/globals
@@ -115,6 +140,237 @@ COMMENT = 1
 # "Annotation" lines are tab-delimited fields containing annotation data 
 ANNOTATION = 2
 
+# Columns with low-cardinality values which are interned
+INTERNED_COLUMNS = ('seqname','source','feature')
+INTERNED_COLUMN_INDICES = tuple([GFF_COLUMNS.index(key)
+                                 for key in INTERNED_COLUMNS])
+
+# Attributes with values which are interned (i.e. those whose values
+# are shared by many records, unlike e.g. 'ID' and 'Name'); keys are
+# always interned
+INTERNED_ATTRIBUTES = ('Parent',
+                       'gene_id',
+                       'transcript_id',
+                       'gene_name',
+                       'gene_type',
+                       'gene_biotype',
+                       'gene_status',
+                       'transcript_type',
+                       'transcript_biotype',
+                       'transcript_status',
+                       'level',
+                       'tag',
+                       'biotype')
+
+# Lookup of column positions by name or index
+_COLUMN_INDEX = dict([(name,i) for i,name in enumerate(GFF_COLUMNS)] +
+                     [(i,i) for i in range(len(GFF_COLUMNS))])
+START_COLUMN = _COLUMN_INDEX['start']
+END_COLUMN = _COLUMN_INDEX['end']
+ATTRIBUTES_COLUMN = _COLUMN_INDEX['attributes']
+
+# Default size of blocks read by GFFIterator (4Mb)
+DEFAULT_BUFFER_SIZE = 4*1024*1024
+
+# Number of shards per worker process when parsing in parallel
+SHARDS_PER_PROCESS = 4
+
+# Default number of records buffered by GFFWriter between writes
+DEFAULT_WRITE_BATCH_SIZE = 10000
+
+# Placeholder for deleted keys in OrderedDictionary
+_DELETED_KEY = object()
+
+# Characters which are never percent-encoded (as for urllib.quote)
+_ALWAYS_SAFE_CHARS = ('ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+                      'abcdefghijklmnopqrstuvwxyz'
+                      '0123456789' '_.-')
+
+# Additional characters which are not encoded in attribute values
+# (commas are also allowed in values of multivalued attributes)
+ATTRIBUTE_SAFE_CHARS = " :^*$@!+?|"
+MULTIVALUED_SAFE_CHARS = " ,:^*$@!+?|"
+
+# Lookup of percent codes (e.g. '3B' or '3b') to characters
+_PERCENT_DECODE = dict([(a+b,chr(int(a+b,16)))
+                        for a in '0123456789abcdefABCDEF'
+                        for b in '0123456789abcdefABCDEF'])
+
+# Cache of percent-encoding lookups for each set of safe characters
+_PERCENT_ENCODE = {}
+
+#######################################################################
+# Functions
+#######################################################################
+
+def percent_decode(value):
+    """Decode percent-encoded characters in a string
+
+    Produces the same output as urllib.unquote (i.e. '%XX' codes
+    are replaced by the corresponding characters and invalid codes
+    are left as they are), but values without any '%' characters
+    are returned immediately.
+
+    Arguments:
+      value: string to decode
+
+    Returns:
+      Decoded string.
+    """
+    if '%' not in value:
+        return value
+    bits = value.split('%')
+    decoded = [bits[0]]
+    for bit in bits[1:]:
+        try:
+            decoded.append(_PERCENT_DECODE[bit[:2]])
+            decoded.append(bit[2:])
+        except KeyError:
+            decoded.append('%')
+            decoded.append(bit)
+    return ''.join(decoded)
+
+def percent_encode(value,safe=ATTRIBUTE_SAFE_CHARS):
+    """Percent-encode special characters in a string
+
+    Produces the same output as urllib.quote, but checks in a
+    single pass whether any characters need encoding (returning
+    the value immediately if not) and otherwise uses a
+    precomputed lookup for every character.
+
+    Arguments:
+      value: string to encode
+      safe: (optional) characters which should not be encoded
+        in addition to letters, digits and '_.-'
+
+    Returns:
+      Encoded string.
+    """
+    if not isinstance(value,str):
+        # e.g. unicode values
+        return urllib.quote(value,safe=safe)
+    try:
+        safe_chars,lookup = _PERCENT_ENCODE[safe]
+    except KeyError:
+        safe_chars = _ALWAYS_SAFE_CHARS + safe
+        lookup = dict([(chr(i),'%%%02X' % i) for i in range(256)])
+        lookup.update([(c,c) for c in safe_chars])
+        _PERCENT_ENCODE[safe] = (safe_chars,lookup)
+    if not value.translate(None,safe_chars):
+        # Nothing to encode
+        return value
+    return ''.join(map(lookup.__getitem__,value))
+
+def split_file(filen,nshards,start=0):
+    """Split a file into byte ranges which begin and end on line boundaries
+
+    Arguments:
+      filen: name of the (uncompressed) file to split
+      nshards: number of ranges to split the file into (fewer
+        ranges are returned for small files)
+      start: (optional) offset to start from (default 0)
+
+    Returns:
+      List of tuples (start,end) with the byte offsets of each
+      range; each range begins at the start of a line and ends
+      just after a newline (or at the end of the file).
+    """
+    size = os.path.getsize(filen)
+    offsets = [start]
+    fp = open(filen,'rb')
+    for i in xrange(1,nshards):
+        pos = start + (size - start)*i//nshards
+        if pos <= offsets[-1]:
+            continue
+        # Move to the start of the next line
+        fp.seek(pos-1)
+        fp.readline()
+        pos = fp.tell()
+        if pos >= size:
+            break
+        if pos > offsets[-1]:
+            offsets.append(pos)
+    fp.close()
+    offsets.append(size)
+    return [(offsets[i],offsets[i+1]) for i in xrange(len(offsets)-1)
+            if offsets[i] < offsets[i+1]]
+
+def _read_ahead(fp,buffer_size,blocks,stop,owner):
+    """Internal: read blocks of data from a file in a background thread
+
+    Reads blocks of data from 'fp' and puts them onto the 'blocks'
+    queue (waiting while the queue is full), finishing with an
+    empty string at the end of the file. If an exception is raised
+    then it is put onto the queue instead.
+
+    The thread finishes early if the 'stop' event is set, or if the
+    object referenced by the 'owner' weakref no longer exists.
+
+    Arguments:
+      fp: file-like object to read from
+      buffer_size: size of the blocks to read
+      blocks: Queue to put the blocks onto
+      stop: threading.Event used to stop reading
+      owner: weakref to the object consuming the blocks
+    """
+    while not stop.is_set():
+        try:
+            block = fp.read(buffer_size)
+        except Exception,ex:
+            block = ex
+        while True:
+            try:
+                blocks.put(block,timeout=0.1)
+                break
+            except Queue.Full:
+                if stop.is_set() or owner() is None:
+                    return
+        if not block or isinstance(block,Exception):
+            return
+
+def _parse_shard(args):
+    """Internal: parse one shard of a GFF file in a worker process
+
+    Arguments:
+      args: tuple (gff_file,start,end,gffdataline,projection,
+        line_filter) where 'start' and 'end' are the byte range
+        of the shard and annotation records are converted using
+        the 'gffdataline' class (which must provide '_fields')
+
+    Returns:
+      Tuple (nlines,data) where 'nlines' is the number of lines
+      in the shard and 'data' is a marshalled list of tuples
+      (type,lineno,item); the line numbers are relative to the
+      start of the shard and 'item' is either the line (for
+      pragmas and comments) or the tuple of fields (see e.g.
+      CompactGFFDataLine._fields).
+    """
+    gff_file,start,end,gffdataline,projection,line_filter = args
+    fp = open(gff_file,'rb')
+    fp.seek(start)
+    data = fp.read(end-start)
+    fp.close()
+    if '\r' in data:
+        data = data.replace('\r\n','\n')
+    lines = data.split('\n')
+    if lines[-1] == '':
+        lines.pop()
+    records = []
+    lineno = 0
+    for line in lines:
+        lineno += 1
+        if line[:1] != '#':
+            # Annotation line
+            if line_filter is not None and not line_filter.match(line):
+                continue
+            record = gffdataline(line=line,projection=projection)
+            records.append((ANNOTATION,lineno,record._fields()))
+        elif line[1:2] == '#':
+            records.append((PRAGMA,lineno,line))
+        else:
+            records.append((COMMENT,lineno,line))
+    return (len(lines),marshal.dumps(records,2))
+
 #######################################################################
 # Class definitions
 #######################################################################
@@ -126,15 +382,158 @@ class GFFDataLine(TabDataLine):
     attributes column into a GFFAttributes object. This allows GFF
     attributes to be accessed directly using the syntax
     gff_line['attributes']['Parent'].
+
+    The conversion is done lazily: the raw attribute string is kept
+    until the first time that gff_line['attributes'] is accessed, so
+    that records where only the other columns are examined never pay
+    the cost of parsing the attributes.
+
+    The original line is also kept, and records which haven't been
+    modified (i.e. no column has been set and the attributes haven't
+    been changed) are written back out using the original text
+    rather than being reassembled from the individual columns.
+
+    If a GFFInternTable is supplied then the values in the seqname,
+    source and feature columns (and the attribute keys and the values
+    of the attributes in INTERNED_ATTRIBUTES, once parsed) are
+    replaced by shared copies from the table.
+
+    If a GFFProjection is supplied then only the attributes that it
+    names are decoded (all columns are still converted by the
+    underlying TabDataLine).
     """
     def __init__(self,line=None,column_names=GFF_COLUMNS,lineno=None,delimiter='\t',
-                 gff_line_type=None):
+                 gff_line_type=None,intern_table=None,projection=None):
         TabDataLine.__init__(self,line=line,column_names=column_names,
                              lineno=lineno,delimiter=delimiter)
-        # Convert attributes to GFFAttributes object
-        self['attributes'] = GFFAttributes(self['attributes'])
+        # Original line (discarded once the line is modified; True
+        # if it's the same as the joined column values)
+        if line is not None:
+            line = line.rstrip('\n')
+        self.__line = line
+        self.__attributes = None
+        # Column names (for converting column indices)
+        self.__columns = column_names
         # Metadata
         self.__type = gff_line_type
+        self.__projection = projection
+        # Share repeated strings
+        self.__intern_table = intern_table
+        if intern_table is not None:
+            for key in INTERNED_COLUMNS:
+                TabDataLine.__setitem__(self,key,
+                                        intern_table.intern(TabDataLine.__getitem__(self,key)))
+
+    def __getitem__(self,key):
+        if isinstance(key,(int,long)):
+            # Normalise column index to column name
+            key = self.__columns[key]
+        value = TabDataLine.__getitem__(self,key)
+        if key == 'attributes' and isinstance(value,basestring):
+            if self.__line is True:
+                # Recover original line before the raw data is lost
+                self.__line = TabDataLine.__repr__(self)
+            # Convert raw attribute data on first access
+            args = {}
+            if self.__intern_table is not None:
+                args['intern'] = self.__intern_table.intern
+            if self.__projection is not None and \
+               self.__projection.attributes is not None:
+                args['keys'] = self.__projection.attributes
+            value = self._parse_attributes(value,**args)
+            TabDataLine.__setitem__(self,key,value)
+            self.__attributes = value
+        return value
+
+    def __setitem__(self,key,value):
+        self.__line = None
+        TabDataLine.__setitem__(self,key,value)
+
+    def __repr__(self):
+        if self.modified() or self.__line is True:
+            return TabDataLine.__repr__(self)
+        return self.__line
+
+    def append(self,*values):
+        self.__line = None
+        TabDataLine.append(self,*values)
+
+    def _parse_attributes(self,attribute_data,intern=None,keys=None):
+        """Internal: convert raw attribute string to attributes object
+
+        Subclasses can override this to return a different type of
+        object for the attribute data.
+
+        Arguments:
+          attribute_data: the raw string from the attributes column
+          intern: (optional) function to apply to attribute keys and
+            values to obtain shared copies
+          keys: (optional) if supplied then only decode the
+            attributes with these names
+        """
+        return GFFAttributes(attribute_data,intern=intern,keys=keys)
+
+    def modified(self):
+        """Check whether the line has changed since it was read
+
+        Returns True if the line wasn't created from a line of
+        text, if any column has been set, or if the attributes
+        have been modified; False otherwise.
+        """
+        if self.__line is None:
+            return True
+        return self.__attributes is not None and self.__attributes.modified()
+
+    def _fields(self):
+        """Internal: return tuple of the stored column values
+
+        The converted column values are followed by None if the
+        line has been modified, True if the original line can be
+        recovered by joining the values, or otherwise the original
+        line itself (e.g. if it contained a score such as '1.000').
+        Used together with '_from_fields' to store and move records
+        without having to split and convert the line again.
+        """
+        fields = [TabDataLine.__getitem__(self,key)
+                  for key in GFF_COLUMNS[:len(self)]]
+        if len(fields) > ATTRIBUTES_COLUMN and \
+           not isinstance(fields[ATTRIBUTES_COLUMN],basestring):
+            fields[ATTRIBUTES_COLUMN] = str(fields[ATTRIBUTES_COLUMN])
+        if self.modified():
+            fields.append(None)
+        elif self.__line is True or \
+             '\t'.join([str(x) for x in fields]) == self.__line:
+            fields.append(True)
+        else:
+            fields.append(self.__line)
+        return tuple(fields)
+
+    @classmethod
+    def _from_fields(cls,fields,lineno=None,gff_line_type=None,
+                     intern_table=None,projection=None):
+        """Internal: create a new instance from stored column values
+
+        Arguments:
+          fields: tuple of column values (as returned by '_fields')
+          lineno: (optional) line number
+          gff_line_type: (optional) type of the line
+          intern_table: (optional) GFFInternTable to use
+          projection: (optional) GFFProjection used to extract
+            the fields
+        """
+        self = cls(lineno=lineno,gff_line_type=gff_line_type,
+                   projection=projection)
+        # Set the column data in one go (setting each column
+        # individually costs more than the rest of the method)
+        values = list(fields[:-1])
+        if intern_table is not None:
+            for i in INTERNED_COLUMN_INDICES:
+                if i < len(values):
+                    values[i] = intern_table.intern(values[i])
+        self.data = values
+        self.__line = fields[-1]
+        self.__intern_table = intern_table
+        return self
 
     @property
     def type(self):
@@ -145,6 +544,352 @@ class GFFDataLine(TabDataLine):
         """
         return self.__type
 
+class CompactGFFDataLine(object):
+    """Memory-efficient data line for GFF files
+
+    Lightweight alternative to GFFDataLine which stores the nine GFF
+    columns in fixed slots (using __slots__) rather than using the
+    general-purpose TabDataLine machinery, which substantially reduces
+    the memory required for each record when a large GFF is loaded
+    into a GFFFile.
+
+    Data are accessed using the same syntax as for GFFDataLine, for
+    example line['start'] or line['attributes']['Parent']. The 'start'
+    and 'end' columns are converted to integers, all other columns are
+    stored as strings; as with GFFDataLine the attributes are only
+    converted to a GFFAttributes object when they are first accessed.
+
+    Use via the 'gffdataline' argument of GFFIterator and GFFFile e.g.
+
+    >>> gff = GFFFile('my.gff',gffdataline=CompactGFFDataLine)
+
+    If a GFFProjection is supplied then only the columns that it
+    names are extracted (the others are returned as empty strings),
+    and only the named attributes are decoded.
+    """
+    __slots__ = GFF_COLUMNS + ('_lineno','_type','_intern_table','_projection')
+
+    def __init__(self,line=None,column_names=GFF_COLUMNS,lineno=None,delimiter='\t',
+                 gff_line_type=None,intern_table=None,projection=None):
+        # Split into (at most) nine columns, with None for
+        # columns that are missing
+        if line is None:
+            fields = []
+        elif projection is None:
+            fields = line.rstrip('\n').split(delimiter,8)
+        else:
+            fields = projection.extract(line.rstrip('\n').split(delimiter,
+                                                                projection.nsplit))
+        if len(fields) < 9:
+            fields.extend([None]*(9-len(fields)))
+        (self.seqname,
+         self.source,
+         self.feature,
+         self.start,
+         self.end,
+         self.score,
+         self.strand,
+         self.frame,
+         self.attributes) = fields
+        # Convert coordinates to integers
+        if self.start is not None:
+            try:
+                self.start = int(self.start)
+            except ValueError:
+                pass
+        if self.end is not None:
+            try:
+                self.end = int(self.end)
+            except ValueError:
+                pass
+        # Metadata
+        self._lineno = lineno
+        self._type = gff_line_type
+        self._projection = projection
+        # Share repeated strings
+        self._intern_table = intern_table
+        if intern_table is not None:
+            self.seqname = intern_table.intern(self.seqname)
+            self.source = intern_table.intern(self.source)
+            self.feature = intern_table.intern(self.feature)
+
+    def __getitem__(self,key):
+        if isinstance(key,(int,long)):
+            key = GFF_COLUMNS[key]
+        elif key not in GFF_COLUMNS:
+            raise KeyError, "column '%s' not found" % key
+        value = getattr(self,key)
+        if key == 'attributes' and (value is None or isinstance(value,basestring)):
+            # Convert raw attribute data on first access
+            args = {}
+            if self._intern_table is not None:
+                args['intern'] = self._intern_table.intern
+            if self._projection is not None and \
+               self._projection.attributes is not None:
+                args['keys'] = self._projection.attributes
+            value = self._parse_attributes(value,**args)
+            self.attributes = value
+        elif value is None:
+            value = ''
+        return value
+
+    def __setitem__(self,key,value):
+        if isinstance(key,(int,long)):
+            key = GFF_COLUMNS[key]
+        elif key not in GFF_COLUMNS:
+            raise KeyError, "column '%s' not found" % key
+        setattr(self,key,value)
+
+    def __len__(self):
+        return len(GFF_COLUMNS)
+
+    def __repr__(self):
+        fields = [getattr(self,name) for name in GFF_COLUMNS]
+        while fields and fields[-1] is None:
+            fields.pop()
+        return '\t'.join([str(x) if x is not None else '' for x in fields])
+
+    def _parse_attributes(self,attribute_data,intern=None,keys=None):
+        """Internal: convert raw attribute string to attributes object
+
+        Subclasses can override this to return a different type of
+        object for the attribute data.
+
+        Arguments:
+          attribute_data: the raw string from the attributes column
+          intern: (optional) function to apply to attribute keys and
+            values to obtain shared copies
+          keys: (optional) if supplied then only decode the
+            attributes with these names
+        """
+        return GFFAttributes(attribute_data,intern=intern,keys=keys)
+
+    def _fields(self):
+        """Internal: return tuple of the stored column values
+
+        Used together with '_from_fields' to move records between
+        processes without pickling each object.
+        """
+        return (self.seqname,
+                self.source,
+                self.feature,
+                self.start,
+                self.end,
+                self.score,
+                self.strand,
+                self.frame,
+                self.attributes)
+
+    @classmethod
+    def _from_fields(cls,fields,lineno=None,gff_line_type=None,
+                     intern_table=None,projection=None):
+        """Internal: create a new instance from stored column values
+
+        Arguments:
+          fields: tuple of column values (as returned by '_fields')
+          lineno: (optional) line number
+          gff_line_type: (optional) type of the line
+          intern_table: (optional) GFFInternTable to use
+          projection: (optional) GFFProjection used to extract
+            the fields
+        """
+        self = cls.__new__(cls)
+        (self.seqname,
+         self.source,
+         self.feature,
+         self.start,
+         self.end,
+         self.score,
+         self.strand,
+         self.frame,
+         self.attributes) = fields
+        self._lineno = lineno
+        self._type = gff_line_type
+        self._projection = projection
+        self._intern_table = intern_table
+        if intern_table is not None:
+            self.seqname = intern_table.intern(self.seqname)
+            self.source = intern_table.intern(self.source)
+            self.feature = intern_table.intern(self.feature)
+        return self
+
+    def keys(self):
+        """Return the column names
+        """
+        return list(GFF_COLUMNS)
+
+    def lineno(self):
+        """Return the line number associated with the line
+        """
+        return self._lineno
+
+    @property
+    def type(self):
+        """'Type' (pragma, comment, annotation)  associated with the GFF data line
+
+        'type' is either None, or one of the module-level constants PRAGMA, COMMENT,
+        ANNOTATION, indicating the type of data held by the line.
+        """
+        return self._type
+
+class MappedGFFDataLine(object):
+    """Read-only data line referencing a region of a shared buffer
+
+    Lightweight record produced by GFFIterator in 'mapped' mode: rather
+    than holding its own copy of the line, the record stores the
+    buffer (typically a memory-mapped file) together with the offsets
+    of the start and end of the line. The positions of the column
+    delimiters are only located when a column is requested, and only
+    the requested column is sliced out of the buffer, so no string is
+    created for the whole line unless the record is converted using
+    str().
+
+    Data are accessed using the same syntax as for GFFDataLine, e.g.
+    line['feature'] or line['attributes']['Parent']; the 'start' and
+    'end' columns are returned as integers. Columns which are missing
+    from the line are returned as None.
+
+    Note that records keep a reference to the buffer, so they are
+    best used when streaming through a file rather than being loaded
+    into a GFFFile.
+
+    If a GFFProjection is supplied then delimiters are only located
+    as far as the last column it names (so later columns are
+    returned as None), and only the named attributes are decoded.
+    """
+    __slots__ = ('_buffer','_start','_end','_tabs','_lineno','_type',
+                 '_attributes','_projection')
+
+    def __init__(self,buffer,start=0,end=None,lineno=None,gff_line_type=None,
+                 projection=None):
+        """Create a new MappedGFFDataLine
+
+        Arguments:
+          buffer: string or mmap object holding the line
+          start: offset of the start of the line in the buffer
+          end: offset of the end of the line (excluding the
+            newline); defaults to the end of the buffer
+          lineno: line number of the line in the file
+          gff_line_type: type of the line (ANNOTATION etc)
+          projection: (optional) GFFProjection specifying the
+            columns and attributes to extract
+        """
+        if end is None:
+            end = len(buffer)
+        self._buffer = buffer
+        self._start = start
+        self._end = end
+        self._tabs = None
+        self._lineno = lineno
+        self._type = gff_line_type
+        self._attributes = None
+        self._projection = projection
+
+    def __locate_delimiters(self):
+        """Internal: locate the column delimiters in the line
+
+        Stores and returns a list of the offsets of the delimiter
+        preceding each column (starting with the offset before the
+        start of the line), followed by the offset of the end of
+        the line.
+        """
+        buf = self._buffer
+        end = self._end
+        pos = self._start - 1
+        tabs = [pos]
+        if self._projection is None:
+            ndelimiters = len(GFF_COLUMNS) - 1
+        else:
+            ndelimiters = self._projection.nsplit
+        for i in xrange(ndelimiters):
+            pos = buf.find('\t',pos+1,end)
+            if pos < 0:
+                # No more delimiters: column runs to end of line
+                tabs.append(end)
+                break
+            tabs.append(pos)
+        else:
+            if ndelimiters == len(GFF_COLUMNS)-1:
+                # Final column runs to end of line
+                tabs.append(end)
+        self._tabs = tabs
+        return tabs
+
+    def __getitem__(self,key):
+        try:
+            i = _COLUMN_INDEX[key]
+        except (KeyError,TypeError):
+            raise KeyError, "column '%s' not found" % key
+        if i == ATTRIBUTES_COLUMN and self._attributes is not None:
+            return self._attributes
+        tabs = self._tabs
+        if tabs is None:
+            tabs = self.__locate_delimiters()
+        if i+1 < len(tabs):
+            value = self._buffer[tabs[i]+1:tabs[i+1]]
+        else:
+            # Missing column
+            value = None
+        if i == START_COLUMN or i == END_COLUMN:
+            try:
+                value = int(value)
+            except (TypeError,ValueError):
+                pass
+        elif i == ATTRIBUTES_COLUMN:
+            # Convert raw attribute data on first access
+            if self._projection is not None and \
+               self._projection.attributes is not None:
+                value = self._parse_attributes(value,
+                                               keys=self._projection.attributes)
+            else:
+                value = self._parse_attributes(value)
+            self._attributes = value
+        return value
+
+    def __len__(self):
+        tabs = self._tabs
+        if tabs is None:
+            tabs = self.__locate_delimiters()
+        return len(tabs) - 1
+
+    def __repr__(self):
+        if self._attributes is None or not self._attributes.modified():
+            return self._buffer[self._start:self._end]
+        # Attributes have been modified
+        values = [self[i] for i in range(len(GFF_COLUMNS)-1)]
+        values.append(self._attributes)
+        return '\t'.join([str(x) for x in values if x is not None])
+
+    def _parse_attributes(self,attribute_data,keys=None):
+        """Internal: convert raw attribute string to attributes object
+
+        Subclasses can override this to return a different type of
+        object for the attribute data.
+
+        Arguments:
+          attribute_data: the raw string from the attributes column
+          keys: (optional) if supplied then only decode the
+            attributes with these names
+        """
+        return GFFAttributes(attribute_data,keys=keys)
+
+    def keys(self):
+        """Return the column names
+        """
+        return list(GFF_COLUMNS)
+
+    def lineno(self):
+        """Return the line number associated with the line
+        """
+        return self._lineno
+
+    @property
+    def type(self):
+        """Return the 'type' of the GFFDataLine
+
+        """
+        return self._type
+
 class GFFFile(TabFile):
     """Class for handling GFF files in-memory
 
@@ -156,18 +901,78 @@ class GFFFile(TabFile):
 
     See http://www.sanger.ac.uk/resources/software/gff/spec.html
     for the GFF specification.
+
+    If neither 'gff_file' nor 'fp' is supplied then an empty
+    GFFFile is created.
+
+    If 'intern_strings' is True then repeated strings in the
+    seqname, source and feature columns and in the attribute data
+    are shared between data lines via a GFFInternTable (accessible
+    via the 'intern_table' property), which can substantially reduce
+    the memory used by large files.
+
+    The 'features', 'seqnames', 'strand' and 'contains' arguments can
+    be used to only load a subset of the annotation lines,
+    'processes' to parse the file using multiple processes, and
+    'read_ahead' to read the file using a background thread (see the
+    GFFIterator class).
+
+    If 'cache_dir' is given then a snapshot of the parsed data is
+    saved in that directory (see the GFFCache module), and loaded
+    instead of reparsing the file the next time the same file is
+    read with the same options. Snapshots are identified by the
+    path, size and modification time of the file (plus a hash of
+    its contents if 'cache_hash' is True), and the least recently
+    used snapshots are removed once the total size of the cache
+    exceeds 'cache_size' bytes.
     """
-    def __init__(self,gff_file,fp=None,gffdataline=GFFDataLine,format='gff'):
+    def __init__(self,gff_file,fp=None,gffdataline=GFFDataLine,format='gff',
+                 intern_strings=False,features=None,seqnames=None,strand=None,
+                 contains=None,processes=None,read_ahead=None,cache_dir=None,
+                 cache_hash=False,cache_size=None):
         # Storage for format info
         self._format = format
         self._version = None
+        # Class used for data lines
+        self._gffdataline = gffdataline
+        # Table for sharing repeated strings
+        if intern_strings:
+            self._intern_table = GFFInternTable()
+        else:
+            self._intern_table = None
+        # Indexes built on demand (e.g. interval index)
+        self._indexes = {}
+        # Cache and key for the parsed data (if loaded via a cache)
+        self._cache_entry = None
+        # Attribute value indexes (kept up to date)
+        self._attribute_indexes = {}
         # Initialise empty TabFile
         TabFile.__init__(self,None,fp=None,
                          tab_data_line=GFFDataLine,
                          column_names=GFF_COLUMNS)
+        if gff_file is None and fp is None:
+            return
+        # Load snapshot from the cache
+        cache = None
+        if cache_dir is not None and fp is None:
+            cache = GFFCache.GFFCache(cache_dir,max_size=cache_size)
+            cache_key = cache.key(gff_file,
+                                  options=(format,
+                                           gffdataline.__module__,
+                                           gffdataline.__name__,
+                                           features,seqnames,strand,contains),
+                                  hash_contents=cache_hash)
+            if self._restore_snapshot(cache.load(cache_key)):
+                self._cache_entry = (cache,cache_key)
+                return
         # Populate by iterating over GFF file
         for line in GFFIterator(gff_file=gff_file,fp=fp,
-                                gffdataline=gffdataline):
+                                gffdataline=gffdataline,
+                                intern_table=self._intern_table,
+                                features=features,seqnames=seqnames,
+                                strand=strand,contains=contains,
+                                processes=processes,
+                                read_ahead=read_ahead):
            if line.type == ANNOTATION:
                 # Append to TabFile
                 self.append(tabdataline=line)
@@ -176,18 +981,380 @@ class GFFFile(TabFile):
                pragma = str(line)[2:].split()
                if pragma[0] == 'gff-version':
                    self._version = pragma[1]
+        # Save snapshot to the cache
+        if cache is not None:
+            cache.store(cache_key,self._snapshot())
+            self._cache_entry = (cache,cache_key)
+
+    def _snapshot(self):
+        """Internal: return the parsed data as marshallable snapshot
+
+        Records are stored as tuples of their (already converted)
+        fields, so that they don't have to be parsed again when the
+        snapshot is restored; records of classes which don't provide
+        '_fields' are stored as the original lines.
+        """
+        if getattr(self._gffdataline,'_from_fields',None) is not None:
+            records = [(line.lineno(),line._fields()) for line in self]
+        else:
+            records = [(line.lineno(),str(line)) for line in self]
+        return { 'version': self._version,
+                 'records': records }
+
+    def _restore_snapshot(self,snapshot):
+        """Internal: populate from a snapshot created by '_snapshot'
+
+        Returns True if the data were restored, False if there was
+        no snapshot.
+
+        Arguments:
+          snapshot: snapshot data (or None)
+        """
+        if snapshot is None:
+            return False
+        gffdataline = self._gffdataline
+        extra_args = {}
+        if self._intern_table is not None:
+            extra_args['intern_table'] = self._intern_table
+        self._version = snapshot['version']
+        from_fields = getattr(gffdataline,'_from_fields',None)
+        for lineno,item in snapshot['records']:
+            if from_fields is not None:
+                line = from_fields(item,lineno=lineno,
+                                   gff_line_type=ANNOTATION,**extra_args)
+            else:
+                line = gffdataline(line=item,lineno=lineno,
+                                   gff_line_type=ANNOTATION,**extra_args)
+            self.append(tabdataline=line)
+        return True
+
+    def append(self,*args,**kws):
+        if self._indexes or self._cache_entry is not None:
+            self._discard_indexes()
+        line = TabFile.append(self,*args,**kws)
+        if self._attribute_indexes:
+            if line is None:
+                line = self[-1]
+            for index in self._attribute_indexes.values():
+                index.add(line)
+        return line
+
+    def insert(self,i,*args,**kws):
+        if self._indexes or self._cache_entry is not None:
+            self._discard_indexes()
+        line = TabFile.insert(self,i,*args,**kws)
+        if self._attribute_indexes:
+            if line is None:
+                line = self[i]
+            for index in self._attribute_indexes.values():
+                index.add(line)
+        return line
+
+    def insert_many(self,insertions):
+        """Insert several data lines in a single pass
+
+        Equivalent to inserting each line in turn, but the existing
+        lines are only moved once (rather than once per inserted
+        line).
+
+        Arguments:
+          insertions: list of (i,line) pairs, where 'i' is the
+            position in the current data of the line which 'line'
+            is inserted before (or the length of the data to add it
+            at the end); lines with the same position are inserted
+            in the order that they're listed
+
+        Returns:
+          List of the inserted lines.
+        """
+        if self._indexes or self._cache_entry is not None:
+            self._discard_indexes()
+        insertions = sorted(insertions,key=lambda x: x[0])
+        n = len(self)
+        for i,line in insertions:
+            if i < 0 or i > n:
+                raise IndexError, "insert position %d out of range" % i
+        # Rebuild the data with the new lines merged in
+        records = list(self)
+        TabFile.__delitem__(self,slice(0,n))
+        k = 0
+        for j,record in enumerate(records):
+            while k < len(insertions) and insertions[k][0] == j:
+                TabFile.append(self,tabdataline=insertions[k][1])
+                k += 1
+            TabFile.append(self,tabdataline=record)
+        for i,line in insertions[k:]:
+            TabFile.append(self,tabdataline=line)
+        inserted = [line for i,line in insertions]
+        for index in self._attribute_indexes.values():
+            for line in inserted:
+                index.add(line)
+        return inserted
+
+    def delete_many(self,records_or_linenos):
+        """Delete several data lines in a single pass
+
+        Each data line is located by its line number (as for the
+        'indexByLineNumber' method, so if several lines have the
+        same line number then the first remaining one is deleted).
+        Line numbers which aren't found are ignored.
+
+        Arguments:
+          records_or_linenos: list of data lines and/or line
+            numbers to delete
+
+        Returns:
+          List of the deleted lines, in the same order as the
+          corresponding items in 'records_or_linenos'.
+        """
+        linenos = []
+        for item in records_or_linenos:
+            if isinstance(item,(int,long)):
+                linenos.append(item)
+            else:
+                linenos.append(item.lineno())
+        if not linenos:
+            return []
+        # Locate the lines with the requested line numbers
+        wanted = set(linenos)
+        positions = {}
+        for j,line in enumerate(self):
+            lineno = line.lineno()
+            if lineno in wanted:
+                try:
+                    positions[lineno].append(j)
+                except KeyError:
+                    positions[lineno] = [j]
+        deleted = []
+        deleted_positions = set()
+        for lineno in linenos:
+            try:
+                j = positions[lineno].pop(0)
+            except (KeyError,IndexError):
+                continue
+            deleted.append(self[j])
+            deleted_positions.add(j)
+        if not deleted:
+            return deleted
+        if self._indexes or self._cache_entry is not None:
+            self._discard_indexes()
+        for index in self._attribute_indexes.values():
+            for line in deleted:
+                index.remove(line)
+        # Rebuild the data without the deleted lines
+        records = list(self)
+        TabFile.__delitem__(self,slice(0,len(records)))
+        for j,record in enumerate(records):
+            if j not in deleted_positions:
+                TabFile.append(self,tabdataline=record)
+        return deleted
+
+    def __delitem__(self,key):
+        if self._indexes or self._cache_entry is not None:
+            self._discard_indexes()
+        if self._attribute_indexes:
+            if isinstance(key,slice):
+                removed = self[key]
+            else:
+                removed = [self[key]]
+            for index in self._attribute_indexes.values():
+                for line in removed:
+                    index.remove(line)
+        TabFile.__delitem__(self,key)
+
+    def index_attribute(self,key):
+        """Return a GFFAttributeIndex for an attribute
+
+        The index is built the first time it is requested for the
+        attribute, and is then kept up to date as records are
+        appended, inserted and deleted (but not if the attribute
+        values of existing records are changed).
+
+        Arguments:
+          key: name of the attribute (e.g. 'SGD')
+        """
+        try:
+            return self._attribute_indexes[key]
+        except KeyError:
+            index = GFFAttributeIndex(key,self)
+            self._attribute_indexes[key] = index
+            return index
+
+    def find(self,key,value):
+        """Return the records where an attribute has a value
+
+        Uses (and if necessary builds) the index for the attribute
+        (see 'index_attribute').
+
+        Arguments:
+          key: name of the attribute (e.g. 'SGD')
+          value: value to look up
+        """
+        return self.index_attribute(key).find(value)
+
+    def _discard_indexes(self):
+        """Internal: discard indexes after records are added or removed
+
+        The link to the cache entry is also dropped, since
+        indexes stored in the cache no longer match the data.
+        """
+        self._indexes = {}
+        self._cache_entry = None
+
+    def _unmodified(self):
+        """Internal: check whether the records are as they were loaded
+
+        Returns False if any record has been modified, or if the
+        records can't report changes (i.e. don't provide a
+        'modified' method); True otherwise.
+        """
+        if getattr(self._gffdataline,'modified',None) is None:
+            return False
+        for line in self:
+            if line.modified():
+                return False
+        return True
+
+    def interval_index(self,rebuild=False):
+        """Return a GFFIntervalIndex for the records
+
+        The index is built the first time it is needed, and is
+        rebuilt after records are added or removed. Changes to
+        the coordinates of existing records are not detected, so
+        'rebuild' should be set after modifying them.
+
+        Arguments:
+          rebuild: if True then always rebuild the index
+        """
+        if 'intervals' not in self._indexes or rebuild:
+            self._indexes['intervals'] = GFFIntervals.GFFIntervalIndex(self)
+        return self._indexes['intervals']
+
+    def hierarchy(self,id_attr='ID',parent_attr='Parent',rebuild=False):
+        """Return a GFFHierarchy for the records
+
+        The index of the ID/Parent relationships is built the first
+        time it is needed, and is rebuilt after records are added
+        or removed. If the data were loaded using a parse cache
+        then the index is also stored in (and subsequently loaded
+        from) the cache, provided that none of the records have
+        been modified since they were loaded.
 
-    def write(self,filen):
+        Arguments:
+          id_attr: name of the ID attribute (default 'ID')
+          parent_attr: name of the parent attribute (default
+            'Parent')
+          rebuild: if True then always rebuild the index
+        """
+        key = ('hierarchy',id_attr,parent_attr)
+        if key in self._indexes and not rebuild:
+            return self._indexes[key]
+        snapshot = None
+        use_cache = self._cache_entry is not None and self._unmodified()
+        if use_cache:
+            cache,cache_key = self._cache_entry
+            cache_key = GFFCache.subkey(cache_key,*key)
+            if not rebuild:
+                snapshot = cache.load(cache_key)
+        hierarchy = GFFHierarchy.GFFHierarchy(self,id_attr=id_attr,
+                                              parent_attr=parent_attr,
+                                              snapshot=snapshot)
+        if use_cache and snapshot is None:
+            cache.store(cache_key,hierarchy.snapshot())
+        self._indexes[key] = hierarchy
+        return hierarchy
+
+    def overlaps(self,seqname,start,end,strand=None,feature=None):
+        """Return the records which overlap a region
+
+        See GFFIntervals.GFFIntervalIndex.overlaps.
+
+        Arguments:
+          seqname: name of the sequence (e.g. 'chr5')
+          start: start position of the region (inclusive)
+          end: end position of the region (inclusive)
+          strand: (optional) only return records on this strand
+          feature: (optional) only return records of this feature
+            type
+        """
+        return self.interval_index().overlaps(seqname,start,end,
+                                              strand=strand,
+                                              feature=feature)
+
+    def nearest(self,seqname,start,end=None,strand=None,feature=None):
+        """Return the record nearest to a position or region
+
+        See GFFIntervals.GFFIntervalIndex.nearest.
+
+        Arguments:
+          seqname: name of the sequence (e.g. 'chr5')
+          start: position, or start position of the region
+          end: (optional) end position of the region
+          strand: (optional) only consider records on this strand
+          feature: (optional) only consider records of this feature
+            type
+        """
+        return self.interval_index().nearest(seqname,start,end=end,
+                                             strand=strand,
+                                             feature=feature)
+
+    def write(self,filen,compression=None):
         """Write the GFF data to an output GFF
 
         Arguments:
           filen: name of file to write to
+          compression: (optional) either CompressedFile.GZIP or
+            CompressedFile.BGZF to compress the output
+        """
+        writer = GFFWriter(filen,format=self.format,compression=compression)
+        writer.write_records(self)
+        writer.close()
+
+    def to_parquet(self,filen,attributes=None):
+        """Write the GFF data to a Parquet file
+
+        See the GFFArrow module for details (requires pyarrow).
+
+        Arguments:
+          filen: name of file to write to
+          attributes: (optional) list of attribute names to store
+            in their own columns
+        """
+        import GFFArrow
+        GFFArrow.write_parquet(self,filen,attributes=attributes)
+
+    @classmethod
+    def from_parquet(cls,filen):
+        """Create a new instance from a Parquet file
+
+        Arguments:
+          filen: name of a file written by 'to_parquet'
+        """
+        import GFFArrow
+        return GFFArrow.read_parquet(filen,gff_class=cls)
+
+    def to_arrow_ipc(self,filen,attributes=None):
+        """Write the GFF data to an Arrow IPC file
+
+        See the GFFArrow module for details (requires pyarrow).
+
+        Arguments:
+          filen: name of file to write to
+          attributes: (optional) list of attribute names to store
+            in their own columns
         """
-        fp = open(filen,'w')
-        if self.format == 'gff':
-            fp.write("##gff-version 3\n")
-        TabFile.write(self,fp=fp)
-        fp.close()
+        import GFFArrow
+        GFFArrow.write_ipc(self,filen,attributes=attributes)
+
+    @classmethod
+    def from_arrow_ipc(cls,filen):
+        """Create a new instance from an Arrow IPC file
+
+        Arguments:
+          filen: name of a file written by 'to_arrow_ipc'
+        """
+        import GFFArrow
+        return GFFArrow.read_ipc(filen,gff_class=cls)
 
     @property
     def format(self):
@@ -196,6 +1363,12 @@ class GFFFile(TabFile):
         """
         return self._format
 
+    @property
+    def intern_table(self):
+        """Return the GFFInternTable (or None if not interning)
+        """
+        return self._intern_table
+
     @property
     def version(self):
         """Return the version e.g. '3'
@@ -203,6 +1376,113 @@ class GFFFile(TabFile):
         """
         return self._version
 
+class GFFWriter:
+    """Class for writing GFF data to a file
+
+    Writes records (e.g. the GFFDataLines from a GFFIterator or a
+    GFFFile) to a file as they are supplied, so that GFF data can be
+    processed and written out without holding the whole file in
+    memory.
+
+    For GFF output a '##gff-version' header is written first. Pragma
+    and comment records are written out unchanged, except that a
+    '##gff-version' pragma which would duplicate the header is
+    skipped. Records are converted to text and buffered, and each
+    batch is sent to the file in a single write.
+
+    The output can optionally be gzip or BGZF compressed (see the
+    CompressedFile module).
+
+    Example:
+
+    >>> writer = GFFWriter('genes.gff.gz',compression=CompressedFile.BGZF)
+    >>> for line in GFFIterator('my.gff'):
+    >>>    if line.type != ANNOTATION or line['feature'] == 'gene':
+    >>>       writer.write(line)
+    >>> writer.close()
+    """
+    def __init__(self,gff_file=None,fp=None,format='gff',version='3',
+                 compression=None,threads=None,
+                 batch_size=DEFAULT_WRITE_BATCH_SIZE):
+        """Create a new GFFWriter
+
+        Arguments:
+          gff_file: name of the file to write to
+          fp: (optional) file-like object to write to instead (in
+            which case 'compression' is ignored)
+          format: (optional) either 'gff' (default) or 'gtf'; the
+            version header is only written for GFF output
+          version: (optional) version written in the header (default
+            '3'); set to None to suppress the header
+          compression: (optional) either CompressedFile.GZIP or
+            CompressedFile.BGZF to compress the output
+          threads: (optional) number of threads to use for BGZF
+            compression (defaults to the number of CPUs)
+          batch_size: (optional) number of records to buffer before
+            writing them to the file
+        """
+        if fp is None:
+            self.__fp = CompressedFile.open_output_file(gff_file,
+                                                        compression=compression,
+                                                        threads=threads)
+            self.__close_fp = True
+        else:
+            self.__fp = fp
+            self.__close_fp = False
+        self.__batch = []
+        self.__batch_size = max(batch_size,1)
+        self.__nrecords = 0
+        # Write the header
+        self.__header = (format == 'gff' and version is not None)
+        if self.__header:
+            self.__fp.write("##gff-version %s\n" % version)
+
+    def __len__(self):
+        return self.__nrecords
+
+    def write(self,record):
+        """Write a single record
+
+        Arguments:
+          record: GFFDataLine-like object (or any object which
+            converts to a line of GFF data using 'str')
+        """
+        line = str(record)
+        if self.__header and line[:13] == '##gff-version' and \
+           getattr(record,'type',PRAGMA) == PRAGMA:
+            # Don't duplicate the header
+            return
+        self.__batch.append(line)
+        self.__nrecords += 1
+        if len(self.__batch) >= self.__batch_size:
+            self.flush()
+
+    def write_records(self,records):
+        """Write all the records from an iterable
+
+        Arguments:
+          records: iterable of GFFDataLine-like objects (e.g. a
+            GFFIterator or GFFFile)
+        """
+        write = self.write
+        for record in records:
+            write(record)
+
+    def flush(self):
+        """Write out any buffered records
+        """
+        if self.__batch:
+            self.__batch.append('')
+            self.__fp.write('\n'.join(self.__batch))
+            self.__batch = []
+
+    def close(self):
+        """Write out any buffered records and close the file
+        """
+        self.flush()
+        if self.__close_fp:
+            self.__fp.close()
+
 class OrderedDictionary:
     """Augumented dictionary which keeps keys in order
 
@@ -219,45 +1499,79 @@ class OrderedDictionary:
 
     The 'keys()' method returns the OrderedDictionary's keys in
     the correct order.
+
+    Lookups, additions and deletions are all hash-based and so
+    take constant time regardless of the number of keys (deleted
+    keys are marked in the ordered list and the list is compacted
+    once more than half of it is unused). Inserting a key at a
+    specific position using the 'insert()' method is linear in
+    the number of keys.
     """
     def __init__(self):
         self.__keys = []
         self.__dict = {}
+        # Positions of keys in the ordered list (only built once
+        # keys start being deleted) and number of deleted slots
+        self.__index = None
+        self.__ndeleted = 0
 
     def __getitem__(self,key):
-        if key not in self.__keys:
-            raise KeyError
         return self.__dict[key]
 
     def __setitem__(self,key,value):
-        if key not in self.__keys:
+        if key not in self.__dict:
+            if self.__index is not None:
+                self.__index[key] = len(self.__keys)
             self.__keys.append(key)
         self.__dict[key] = value
 
     def __delitem__(self,key):
-        try:
-            i = self.__keys.index(key)
-            del(self.__keys[i])
-            del(self.__dict[key])
-        except ValueError:
-            raise KeyError
+        del(self.__dict[key])
+        if self.__index is None:
+            self.__index = dict([(k,i) for i,k in enumerate(self.__keys)])
+        self.__keys[self.__index.pop(key)] = _DELETED_KEY
+        self.__ndeleted += 1
+        if self.__ndeleted > len(self.__dict):
+            self.__compact()
+
+    def __compact(self):
+        """Internal: remove the slots for deleted keys from the key list
+        """
+        self.__keys = [k for k in self.__keys if k is not _DELETED_KEY]
+        self.__index = None
+        self.__ndeleted = 0
 
     def __len__(self):
-        return len(self.__keys)
+        return len(self.__dict)
 
     def __contains__(self,key):
-        return key in self.__keys
+        return key in self.__dict
 
     def __iter__(self):
-        return iter(self.__keys)
+        if self.__ndeleted:
+            self.__compact()
+        return (k for k in self.__keys if k is not _DELETED_KEY)
 
     def keys(self):
-        return copy.copy(self.__keys)
+        if self.__ndeleted:
+            self.__compact()
+        return list(self.__keys)
+
+    def items(self):
+        """Return list of (key,value) pairs in key order
+        """
+        if self.__ndeleted:
+            self.__compact()
+        d = self.__dict
+        return [(k,d[k]) for k in self.__keys]
 
     def insert(self,i,key,value):
-        if key not in self.__keys:
+        if key not in self.__dict:
+            if self.__ndeleted:
+                self.__compact()
             self.__keys.insert(i,key)
             self.__dict[key] = value
+            self.__index = None
         else:
             raise KeyError, "Key '%s' already exists" % key
 
@@ -287,9 +1601,20 @@ class GFFAttributes(OrderedDictionary):
     items with single values or 'key=value' pairs as
     appropriate). Values which contain special characters
     will be escaped appropriately using URL percent encoding
-    (i.e. the reverse of the decoding process).
+    (i.e. the reverse of the decoding process). If the attributes
+    haven't been modified since they were read (see the 'modified'
+    method) then the original string is returned unchanged.
+
+    Optionally a function can be supplied via the 'intern' argument,
+    which is applied to each key (and to the values of the attributes
+    listed in INTERNED_ATTRIBUTES) e.g. the 'intern' method of a
+    GFFInternTable, to allow repeated strings to be shared.
+
+    If a list of names is supplied via the 'keys' argument then only
+    those attributes are decoded and stored; all other items
+    (including values without keys) are skipped.
     """
-    def __init__(self,attribute_data=None):
+    def __init__(self,attribute_data=None,intern=None,keys=None):
         OrderedDictionary.__init__(self)
         self.__nokeys = []
         # Special attributes which can have multiple values
@@ -302,8 +1627,31 @@ class GFFAttributes(OrderedDictionary):
         self.__encode_values = True
         # Flag indicating whether data came with trailing semicolon
         self.__trailing_semicolon = False
+        # Original data, and flag indicating if items have changed
+        self.__attribute_data = attribute_data
+        self.__modified = False
+        # Names of the decoded attributes (None if all were decoded)
+        self.__projected_keys = keys
         # Extract individual data items
-        if attribute_data:
+        if attribute_data and keys is not None:
+            # Locate the requested items directly
+            items = []
+            for key in keys:
+                item = self.__find_item(attribute_data,key)
+                if item is not None:
+                    items.append(item)
+            items.sort()
+            for pos,key,value in items:
+                # Percent-decode value
+                value = percent_decode(value)
+                # Share repeated strings
+                if intern is not None:
+                    key = intern(key)
+                    if key in INTERNED_ATTRIBUTES:
+                        value = intern(value)
+                OrderedDictionary.__setitem__(self,key,value)
+            self.__trailing_semicolon = attribute_data.endswith(';')
+        elif attribute_data:
             for item in attribute_data.split(';'):
                 if not item:
                     continue
@@ -316,19 +1664,79 @@ class GFFAttributes(OrderedDictionary):
                     key = ''
                     value = item.strip()
                 # Percent-decode value
-                value = urllib.unquote(value)
+                value = percent_decode(value)
+                # Share repeated strings
+                if intern is not None:
+                    key = intern(key)
+                    if key in INTERNED_ATTRIBUTES:
+                        value = intern(value)
                 # Store data
                 if key == '':
                     # No key: store in a list
                     self.__nokeys.append(value)
                 else:
                     # Store key-value pair
-                    self[key] = value
+                    OrderedDictionary.__setitem__(self,key,value)
             self.__trailing_semicolon = attribute_data.endswith(';')
+        # Copy of the 'nokeys' items to detect changes
+        self.__original_nokeys = tuple(self.__nokeys)
+
+    def __setitem__(self,key,value):
+        self.__modified = True
+        OrderedDictionary.__setitem__(self,key,value)
+
+    def __delitem__(self,key):
+        OrderedDictionary.__delitem__(self,key)
+        self.__modified = True
+
+    def insert(self,i,key,value):
+        OrderedDictionary.insert(self,i,key,value)
+        self.__modified = True
+
+    def __find_item(self,attribute_data,key):
+        """Internal: locate the last 'key=value' item for a key
+
+        Returns a tuple (offset,key,value) with the offset of
+        the key in the attribute data and the (undecoded) value,
+        or None if there is no item for the key.
+        """
+        end = len(attribute_data)
+        while True:
+            pos = attribute_data.rfind(key,0,end)
+            if pos < 0:
+                return None
+            end = pos + len(key) - 1
+            # Check that the key is a complete item name
+            i = pos - 1
+            while i >= 0 and attribute_data[i] in ' \t':
+                i -= 1
+            if i >= 0 and attribute_data[i] != ';':
+                continue
+            j = pos + len(key)
+            while j < len(attribute_data) and attribute_data[j] in ' \t':
+                j += 1
+            if j == len(attribute_data) or attribute_data[j] != '=':
+                continue
+            k = attribute_data.find(';',j)
+            if k < 0:
+                k = len(attribute_data)
+            return (pos,key,attribute_data[j+1:k].strip())
 
     def nokeys(self):
         return self.__nokeys
 
+    def modified(self):
+        """Check whether the attributes have changed since they were read
+
+        Returns True if any items have been set, inserted or deleted,
+        if the list of 'nokeys' values has been changed, or if the
+        encoding of values has been turned off (in which case the
+        output will differ from the original data); False otherwise.
+        """
+        return self.__modified or \
+            not self.__encode_values or \
+            tuple(self.__nokeys) != self.__original_nokeys
+
     def encode(self,new_setting=None):
         """Query or set the value of the 'encoding' flag
 
@@ -382,20 +1790,66 @@ class GFFAttributes(OrderedDictionary):
           value: the string to be encoded
         """
         if key in self.__multivalued_attributes:
-            return urllib.quote(value,safe=" ,:^*$@!+?|")
+            return percent_encode(value,safe=MULTIVALUED_SAFE_CHARS)
         else:
-            return urllib.quote(self[key],safe=" :^*$@!+?|")
+            return percent_encode(value,safe=ATTRIBUTE_SAFE_CHARS)
+
+    def __merge_unprojected(self,items):
+        """Internal: merge items with those which weren't decoded
+
+        When only some attributes were decoded (i.e. 'keys' was
+        supplied) the remaining items are taken from the original
+        data, so that they're not lost when the attributes are
+        modified.
+
+        Arguments:
+          items: list of (key,item) tuples for the stored attributes
+
+        Returns:
+          List of items in their original order, with new items at
+          the end.
+        """
+        formatted = dict(items)
+        managed = set(self.__projected_keys)
+        managed.update(formatted.keys())
+        merged = []
+        done = set()
+        for item in self.__attribute_data.split(';'):
+            if '=' in item:
+                key = item[:item.index('=')].strip()
+            else:
+                key = ''
+            if key not in managed:
+                # Not decoded: keep original item
+                merged.append(item)
+            elif key in formatted and key not in done:
+                merged.append(formatted[key])
+                done.add(key)
+        if merged and merged[-1] == '':
+            # Remove empty item for trailing semicolon
+            merged.pop()
+        for key,item in items:
+            if key not in done:
+                merged.append(item)
+        return merged
 
     def __repr__(self):
+        if self.__attribute_data is not None and not self.modified():
+            # Unchanged so return the original data
+            return self.__attribute_data
         items = []
         if self.__encode_values:
             # Percent encode the attributes
-            for key in self.keys():
-                items.append("%s=%s" % (key,self.__escape_value(key,self[key])))
+            for key,value in self.items():
+                items.append((key,"%s=%s" % (key,self.__escape_value(key,value))))
         else:
             # Don't encode the attributes
-            for key in self.keys():
-                items.append("%s=%s" % (key,self[key]))
+            for key,value in self.items():
+                items.append((key,"%s=%s" % (key,value)))
+        if self.__projected_keys is not None and self.__attribute_data:
+            items = self.__merge_unprojected(items)
+        else:
+            items = [item for key,item in items]
         # Add nokeys items
         for item in self.__nokeys:
             items.append(item)
@@ -452,6 +1906,423 @@ class GFFID:
         else:
             return "%s:%s:%d" % (self.code,self.name,self.index)
 
+class GFFProjection:
+    """Class specifying the columns and attributes to extract
+
+    A GFFProjection names a subset of the GFF columns and of the
+    attributes, so that records only need to convert the data which
+    will actually be used, e.g.
+
+    >>> projection = GFFProjection(columns=('seqname','start'),
+    ...                            attributes=('gene_name',))
+
+    Requesting attributes implies that the 'attributes' column is
+    also extracted.
+
+    Typically the projection is created by GFFIterator (via its
+    'columns' and 'attributes' arguments) and then passed to each
+    record which is created.
+    """
+    def __init__(self,columns=None,attributes=None):
+        """Create a new GFFProjection
+
+        Arguments:
+          columns: (optional) list of the names of the columns
+            to extract (default is to extract all columns)
+          attributes: (optional) list of the names of the
+            attributes to decode (default is to decode all
+            attributes)
+        """
+        if columns is None:
+            columns = GFF_COLUMNS
+        indices = set()
+        for name in columns:
+            try:
+                indices.add(_COLUMN_INDEX[name])
+            except KeyError:
+                raise KeyError, "column '%s' not found" % name
+        if attributes is not None:
+            indices.add(ATTRIBUTES_COLUMN)
+            attributes = frozenset(attributes)
+        self.indices = sorted(indices)
+        self.columns = tuple([GFF_COLUMNS[i] for i in self.indices])
+        self.attributes = attributes
+        # Number of splits needed to reach the last column
+        if self.indices:
+            self.nsplit = min(self.indices[-1]+1,len(GFF_COLUMNS)-1)
+        else:
+            self.nsplit = 0
+
+    def extract(self,fields):
+        """Return the projected values from a list of fields
+
+        Arguments:
+          fields: list of values from splitting a line into
+            (up to) 'nsplit'+1 fields
+
+        Returns:
+          List of nine values with None for columns which
+          aren't part of the projection.
+        """
+        values = [None]*len(GFF_COLUMNS)
+        nfields = len(fields)
+        for i in self.indices:
+            if i < nfields:
+                values[i] = fields[i]
+        return values
+
+class GFFLineFilter:
+    """Class for selecting GFF annotation lines before parsing
+
+    A GFFLineFilter tests the raw text of an annotation line against
+    a set of criteria, so that lines which aren't wanted can be
+    rejected before any record object is created. Only the
+    delimiters needed to locate the columns being tested are
+    searched for, e.g.
+
+    >>> line_filter = GFFLineFilter(features=('gene',),strand='+')
+    >>> line_filter.match(line)
+    True
+
+    Lines must satisfy all the criteria which have been specified in
+    order to match.
+
+    Typically the filter is created by GFFIterator (via its
+    'features', 'seqnames', 'strand' and 'contains' arguments).
+    """
+    def __init__(self,features=None,seqnames=None,strand=None,contains=None):
+        """Create a new GFFLineFilter
+
+        Arguments:
+          features: (optional) feature type, or list of feature
+            types, that lines must have
+          seqnames: (optional) sequence name, or list of sequence
+            names, that lines must have
+          strand: (optional) strand ('+' or '-') that lines must
+            be on
+          contains: (optional) literal string, or list of strings,
+            that must all appear in the line (e.g. an attribute
+            and value such as 'gene_type "protein_coding"')
+        """
+        if isinstance(features,basestring):
+            features = (features,)
+        if isinstance(seqnames,basestring):
+            seqnames = (seqnames,)
+        if isinstance(contains,basestring):
+            contains = (contains,)
+        self.features = frozenset(features) if features is not None else None
+        self.seqnames = frozenset(seqnames) if seqnames is not None else None
+        self.strand = strand
+        self.contains = tuple(contains) if contains is not None else ()
+        # Delimited feature types, for quickly rejecting lines
+        if self.features is not None:
+            self.__feature_tokens = tuple(['\t%s\t' % feature
+                                           for feature in self.features])
+        # Number of delimiters which need to be located
+        if strand is not None:
+            self.__ndelimiters = _COLUMN_INDEX['strand'] + 1
+        elif self.features is not None:
+            self.__ndelimiters = _COLUMN_INDEX['feature'] + 1
+        elif self.seqnames is not None:
+            self.__ndelimiters = _COLUMN_INDEX['seqname'] + 1
+        else:
+            self.__ndelimiters = 0
+
+    def match(self,buf,start=0,end=None):
+        """Check whether a line matches the filter criteria
+
+        Arguments:
+          buf: string (or mmap object) holding the line
+          start: (optional) offset of the start of the line
+          end: (optional) offset of the end of the line (excluding
+            any newline; defaults to the end of the buffer)
+
+        Returns:
+          True if the line satisfies all the criteria, False
+          otherwise.
+        """
+        if end is None:
+            end = len(buf)
+        if self.features is not None:
+            # Reject lines where no feature type appears at all
+            for token in self.__feature_tokens:
+                if buf.find(token,start,end) >= 0:
+                    break
+            else:
+                return False
+        if self.__ndelimiters:
+            # Locate the columns which are needed
+            tabs = []
+            pos = start - 1
+            for i in xrange(self.__ndelimiters):
+                pos = buf.find('\t',pos+1,end)
+                if pos < 0:
+                    return False
+                tabs.append(pos)
+            if self.features is not None and \
+               buf[tabs[1]+1:tabs[2]] not in self.features:
+                return False
+            if self.seqnames is not None and \
+               buf[start:tabs[0]] not in self.seqnames:
+                return False
+            if self.strand is not None and \
+               buf[tabs[5]+1:tabs[6]] != self.strand:
+                return False
+        for s in self.contains:
+            if buf.find(s,start,end) < 0:
+                return False
+        return True
+
+class GFFInternTable:
+    """Class for sharing repeated strings between GFF records
+
+    Columns such as seqname, source and feature (and the attribute
+    keys and some attribute values) take only a small number of distinct
+    values in a typical GFF file, but each data line normally holds
+    its own copy of each string. The GFFInternTable keeps a single
+    copy of each distinct string, which is returned in place of any
+    equal string passed to the 'intern' method, e.g.
+
+    >>> table = GFFInternTable()
+    >>> seqname = table.intern(seqname)
+
+    The table also records how many lookups were made and an
+    estimate of the memory saved, which can be reported via the
+    'report' method.
+    """
+    def __init__(self):
+        self.__strings = {}
+        self.__lookups = 0
+        self.__shared = 0
+        self.__bytes_saved = 0
+
+    def intern(self,s):
+        """Return the shared copy of a string
+
+        Non-string values (e.g. None) are returned unchanged.
+
+        Arguments:
+          s: string to look up
+
+        Returns:
+          String equal to 's' which is shared between all
+          callers.
+        """
+        if not isinstance(s,basestring):
+            return s
+        self.__lookups += 1
+        try:
+            shared = self.__strings[s]
+        except KeyError:
+            self.__strings[s] = s
+            return s
+        if shared is not s:
+            self.__shared += 1
+            self.__bytes_saved += sys.getsizeof(s)
+        return shared
+
+    def __len__(self):
+        return len(self.__strings)
+
+    def __contains__(self,s):
+        return s in self.__strings
+
+    @property
+    def lookups(self):
+        """Return the total number of strings looked up
+        """
+        return self.__lookups
+
+    @property
+    def shared(self):
+        """Return the number of duplicate strings replaced
+        """
+        return self.__shared
+
+    @property
+    def bytes_saved(self):
+        """Return estimate of bytes saved by sharing strings
+        """
+        return self.__bytes_saved
+
+    @property
+    def overhead(self):
+        """Return estimate of bytes used by the table itself
+        """
+        return sys.getsizeof(self.__strings) + \
+            sum([sys.getsizeof(s) for s in self.__strings])
+
+    def report(self):
+        """Return a summary of the interning as a string
+        """
+        return "Interned strings: %d lookups, %d distinct, %d duplicates " \
+            "shared (saved ~%d bytes, table uses ~%d bytes)" % \
+            (self.__lookups,len(self.__strings),self.__shared,
+             self.__bytes_saved,self.overhead)
+
+class GFFAttributeIndex:
+    """Class indexing records by the value of an attribute
+
+    Maps each value of a named attribute (e.g. 'SGD') to the list of
+    records with that value, so that the records can be looked up
+    without scanning all the data. Values are kept in the order
+    that they were first seen, and records in the order that they
+    were indexed.
+
+    Normally obtained via the 'index_attribute' method of GFFFile,
+    which keeps the index up to date as records are appended,
+    inserted and deleted:
+
+    >>> index = gff.index_attribute('SGD')
+    >>> for record in index.find('YEL0W01'):
+    >>>    print record.lineno()
+
+    Records which are added to the index are only examined when
+    the index is next queried (so that records can be added and
+    then have their attributes filled in). Changes to the value
+    of the attribute in records which are already indexed are not
+    detected.
+    """
+    def __init__(self,key,records=()):
+        """Create a new GFFAttributeIndex
+
+        Arguments:
+          key: name of the attribute to index
+          records: (optional) iterable of GFFDataLine-like
+            objects to index
+        """
+        self.__key = key
+        self.__records = OrderedDictionary()
+        # Indexed value for each record (by identity)
+        self.__values = {}
+        # Records added since the last query
+        self.__pending = []
+        for record in records:
+            self.__index(record)
+
+    def __index(self,record):
+        """Internal: add a record to the index
+        """
+        attributes = record['attributes']
+        if self.__key not in attributes:
+            return
+        value = attributes[self.__key]
+        try:
+            self.__records[value].append(record)
+        except KeyError:
+            self.__records[value] = [record]
+        self.__values[id(record)] = value
+
+    def __flush(self):
+        """Internal: index the records added since the last query
+        """
+        if self.__pending:
+            pending = self.__pending
+            self.__pending = []
+            for record in pending:
+                self.__index(record)
+
+    @property
+    def key(self):
+        """Return the name of the indexed attribute
+        """
+        return self.__key
+
+    def __len__(self):
+        self.__flush()
+        return len(self.__records)
+
+    def __contains__(self,value):
+        self.__flush()
+        return value in self.__records
+
+    def add(self,record):
+        """Add a record to the index
+
+        Arguments:
+          record: GFFDataLine-like object
+        """
+        self.__pending.append(record)
+
+    def remove(self,record):
+        """Remove a record from the index
+
+        Records which aren't in the index are ignored.
+
+        Arguments:
+          record: GFFDataLine-like object
+        """
+        for i,pending in enumerate(self.__pending):
+            if pending is record:
+                del(self.__pending[i])
+                return
+        try:
+            value = self.__values.pop(id(record))
+        except KeyError:
+            return
+        records = self.__records[value]
+        for i,indexed in enumerate(records):
+            if indexed is record:
+                del(records[i])
+                break
+        if not records:
+            del(self.__records[value])
+
+    def find(self,value):
+        """Return list of the records with a value
+
+        Arguments:
+          value: attribute value to look up
+        """
+        self.__flush()
+        try:
+            return list(self.__records[value])
+        except KeyError:
+            return []
+
+    def count(self,value):
+        """Return the number of records with a value
+
+        Arguments:
+          value: attribute value to look up
+        """
+        self.__flush()
+        try:
+            return len(self.__records[value])
+        except KeyError:
+            return 0
+
+    def values(self):
+        """Return list of the indexed values
+        """
+        self.__flush()
+        return self.__records.keys()
+
+    def counts(self):
+        """Return dictionary mapping values to numbers of records
+        """
+        self.__flush()
+        return dict([(value,len(records))
+                     for value,records in self.__records.items()])
+
+    def duplicates(self,min_count=2):
+        """Return the values which occur on more than one record
+
+        Returns an OrderedDictionary where the keys are the
+        duplicated values, for lists of the records with each
+        value.
+
+        Arguments:
+          min_count: (optional) minimum number of records for
+            a value to be included (default 2)
+        """
+        self.__flush()
+        duplicates = OrderedDictionary()
+        for value,records in self.__records.items():
+            if len(records) >= min_count:
+                duplicates[value] = list(records)
+        return duplicates
+
 class GFFIterator(Iterator):
     """GFFIterator
 
@@ -461,45 +2332,451 @@ class GFFIterator(Iterator):
     Example looping over all reads
     >>> for record in GFFIterator(gff_file):
     >>>    print record
+
+    Data are read from the file in large blocks (of 'buffer_size'
+    bytes), which are split into lines in bulk and then handed on
+    to be converted into records one at a time.
+
+    Files compressed with gzip, BGZF or zstd are decompressed
+    transparently (see the CompressedFile module).
+
+    If a GFFInternTable is supplied then it is passed to each
+    annotation record, so that repeated strings are shared.
+
+    If 'mapped' is True then the iterator runs in 'scanner' mode:
+    an uncompressed input file is memory-mapped and each record is
+    returned as a MappedGFFDataLine which references the line's
+    position in the mapped file (so no string is created for each
+    line, and only the columns which are accessed are copied). For
+    compressed files or file-like objects the records instead
+    reference the blocks of data read from the file.
+
+    The iterator can be moved to the record starting at a specific
+    byte offset in the file using the 'seek' method (see also the
+    GFFIndex module, which can be used to look up the offsets).
+
+    The 'columns' and 'attributes' arguments can be used to restrict
+    the data which are extracted from each annotation record (see
+    the GFFProjection class), e.g.
+
+    >>> for record in GFFIterator(gff_file,columns=('seqname','start'),
+    ...                           attributes=('Name',)):
+
+    Other columns and attributes are then not converted (and should
+    not be relied upon).
+
+    The 'features', 'seqnames', 'strand' and 'contains' arguments
+    can be used to select annotation lines, which are tested before
+    any record is created (see the GFFLineFilter class), e.g.
+
+    >>> for record in GFFIterator(gff_file,features=('gene',)):
+
+    Pragma and comment lines are always returned; line numbers still
+    refer to the position of each line in the file.
+
+    If 'processes' is greater than one then an uncompressed input
+    file is split into shards of complete lines (see 'split_file')
+    which are parsed in parallel by a pool of worker processes; the
+    records are still returned in the original order with the
+    correct line numbers. The records are passed back from the
+    workers as marshalled tuples of fields, so that the main process
+    doesn't have to convert the lines again; this requires a record
+    class which provides '_fields' and '_from_fields' (e.g.
+    GFFDataLine and CompactGFFDataLine), and for other classes a
+    warning is logged and a single process is used. This option is
+    ignored for compressed files, file-like objects and in 'mapped'
+    mode.
+
+    If 'read_ahead' is set then blocks of data are read from the
+    file (and decompressed) by a background thread, which keeps up
+    to 'read_ahead' blocks queued ahead of the parser, so that the
+    parsing doesn't have to wait for each read to complete (which is
+    useful for slow or network-mounted filesystems). The records are
+    returned in the same order as without read-ahead. This option
+    is ignored in 'mapped' and parallel modes.
     """
 
-    def __init__(self,gff_file=None,fp=None,gffdataline=GFFDataLine):
+    def __init__(self,gff_file=None,fp=None,gffdataline=None,
+                 buffer_size=DEFAULT_BUFFER_SIZE,threads=None,
+                 intern_table=None,mapped=False,columns=None,
+                 attributes=None,features=None,seqnames=None,
+                 strand=None,contains=None,processes=None,
+                 read_ahead=None):
         """Create a new GFFIterator
 
         Arguments:
            gff_file: name of the GFF file to iterate through
            fp: file-like object to read GFF data from
            gffdataline: GFFDataLine-like class to instantiate
-             and return for each record in the GFF
+             and return for each record in the GFF (defaults to
+             GFFDataLine, or MappedGFFDataLine if 'mapped' is True,
+             or CompactGFFDataLine if 'columns' or 'attributes'
+             are specified)
+           buffer_size: size in bytes of the blocks of data to
+             read from the file (default 4Mb)
+           threads: number of threads to use when decompressing
+             BGZF-compressed files (default is the number of CPUs)
+           intern_table: (optional) GFFInternTable to use to
+             share repeated strings between records
+           mapped: if True then memory-map the input and return
+             MappedGFFDataLine-like records (default is False)
+           columns: (optional) list of the names of the columns
+             to extract from each annotation record
+           attributes: (optional) list of the names of the
+             attributes to decode for each annotation record
+           features: (optional) only return annotation records
+             with this feature type (or one of these types)
+           seqnames: (optional) only return annotation records
+             with this sequence name (or one of these names)
+           strand: (optional) only return annotation records on
+             this strand
+           contains: (optional) only return annotation records
+             where the line contains this string (or all of these
+             strings)
+           processes: (optional) number of worker processes to
+             use to parse an uncompressed file in parallel (only
+             for record classes providing '_from_fields')
+           read_ahead: (optional) maximum number of blocks of data
+             to read ahead of the parser using a background thread
+             (default is to read blocks only when they are needed)
         """
+        if columns is not None or attributes is not None:
+            self.__projection = GFFProjection(columns=columns,
+                                              attributes=attributes)
+        else:
+            self.__projection = None
+        if features is not None or seqnames is not None or \
+           strand is not None or contains is not None:
+            self.__line_filter = GFFLineFilter(features=features,
+                                               seqnames=seqnames,
+                                               strand=strand,
+                                               contains=contains)
+        else:
+            self.__line_filter = None
+        if gffdataline is None:
+            if mapped:
+                gffdataline = MappedGFFDataLine
+            elif self.__projection is not None:
+                gffdataline = CompactGFFDataLine
+            else:
+                gffdataline = GFFDataLine
+        if processes is not None and processes > 1 and \
+           getattr(gffdataline,'_from_fields',None) is None:
+            logging.warning("%s records can't be parsed in parallel, "
+                            "using a single process" % gffdataline.__name__)
+            processes = None
+        self.__gff_file = gff_file
+        self.__threads = threads
+        self.__mmap = None
+        self.__processes = None
         if fp is not None:
             self.__fp = fp
             self.__close_fp = False
+        elif mapped and CompressedFile.detect_compression(gff_file) is None:
+            self.__fp = open(gff_file,'rb')
+            self.__close_fp = True
+            try:
+                self.__mmap = mmap.mmap(self.__fp.fileno(),0,
+                                        access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files can't be mapped
+                pass
+        elif processes is not None and processes > 1 and not mapped and \
+             CompressedFile.detect_compression(gff_file) is None:
+            # Shards are read directly by the worker processes
+            self.__fp = None
+            self.__close_fp = False
+            self.__processes = processes
         else:
-            self.__fp = open(gff_file,'rU')
+            self.__fp = CompressedFile.open_file(gff_file,threads=threads)
             self.__close_fp = True
         self.__gffdataline = gffdataline
+        self.__buffer_size = buffer_size
+        self.__intern_table = intern_table
+        self.__mapped = mapped
+        # Background reading
+        if read_ahead:
+            self.__read_ahead = max(int(read_ahead),1)
+        else:
+            self.__read_ahead = None
+        self.__blocks = None
+        self.__stop_reading = None
+        self.__reader = None
+        # Position to start reading from
+        self.__offset = 0
         self.__lineno = 0
+        # Incomplete line at the end of the last block read
+        self.__partial = ''
+        self.__eof = False
+        # Generator producing the records
+        self.__start_records()
+
+    def __start_records(self):
+        """Internal: set up the generator producing the records
+        """
+        if self.__mapped:
+            self.__records = self.__iter_mapped_records()
+        elif self.__processes is not None:
+            self.__records = self.__iter_parallel_records()
+        else:
+            self.__records = self.__iter_records()
+
+    def seek(self,offset,lineno=1):
+        """Move to the record starting at a byte offset in the file
+
+        The next record returned will be the one starting at
+        'offset' bytes from the start of the (uncompressed) file.
+
+        Arguments:
+          offset: byte offset of the start of a line in the file
+          lineno: line number of the line at 'offset' (used to
+            set the line numbers of the records which follow)
+        """
+        if self.__mmap is None and self.__processes is None:
+            if self.__close_fp and getattr(self.__fp,'closed',False):
+                # Reopen file which has been read to the end
+                self.__fp = CompressedFile.open_file(self.__gff_file,
+                                                     threads=self.__threads)
+            self.__stop_read_ahead()
+            try:
+                self.__fp.seek(offset)
+            except (AttributeError,IOError):
+                raise IOError, "Unable to seek in GFF data"
+        self.__offset = offset
+        self.__lineno = lineno - 1
+        self.__partial = ''
+        self.__eof = False
+        self.__start_records()
+
+    def __start_read_ahead(self):
+        """Internal: start reading blocks in a background thread
+        """
+        self.__blocks = Queue.Queue(self.__read_ahead)
+        self.__stop_reading = threading.Event()
+        self.__reader = threading.Thread(target=_read_ahead,
+                                         args=(self.__fp,self.__buffer_size,
+                                               self.__blocks,
+                                               self.__stop_reading,
+                                               weakref.ref(self)))
+        self.__reader.daemon = True
+        self.__reader.start()
+
+    def __stop_read_ahead(self):
+        """Internal: stop the background thread and discard its data
+        """
+        if self.__blocks is None:
+            return
+        self.__stop_reading.set()
+        while self.__reader.is_alive():
+            try:
+                self.__blocks.get(timeout=0.1)
+            except Queue.Empty:
+                pass
+        self.__blocks = None
+        self.__stop_reading = None
+        self.__reader = None
+
+    def __read_block(self):
+        """Internal: return the next block of data from the file
+        """
+        if self.__read_ahead is None:
+            return self.__fp.read(self.__buffer_size)
+        if self.__blocks is None:
+            self.__start_read_ahead()
+        block = self.__blocks.get()
+        if not block or isinstance(block,Exception):
+            # Background thread has finished
+            self.__blocks = None
+            self.__stop_reading = None
+            self.__reader = None
+            if block:
+                raise block
+        return block
+
+    def __read_batch(self):
+        """Internal: read the next block of lines from the file
+
+        Returns a list of the complete lines (without trailing
+        newlines) in the next block of data, or an empty list once
+        the end of the file has been reached.
+        """
+        while not self.__eof:
+            block = self.__read_block()
+            if not block:
+                # Reached EOF: return any unterminated last line
+                self.__eof = True
+                if self.__close_fp: self.__fp.close()
+                if self.__partial:
+                    lines = [self.__partial]
+                    self.__partial = ''
+                    return lines
+                break
+            block = self.__partial + block
+            if '\r' in block:
+                # Data from compressed files doesn't get
+                # universal newline handling
+                block = block.replace('\r\n','\n')
+            lines = block.split('\n')
+            self.__partial = lines.pop()
+            if lines:
+                return lines
+        return []
+
+    def __iter_records(self):
+        """Internal: generator yielding records from the GFF file
+
+        Reads the file in batches of lines and converts each line
+        to a GFFDataLine-like object.
+        """
+        gffdataline = self.__gffdataline
+        # Additional arguments for annotation records
+        extra_args = {}
+        if self.__intern_table is not None:
+            extra_args['intern_table'] = self.__intern_table
+        if self.__projection is not None:
+            extra_args['projection'] = self.__projection
+        line_filter = self.__line_filter
+        lineno = self.__lineno
+        lines = self.__read_batch()
+        while lines:
+            for line in lines:
+                lineno += 1
+                # Set type for line
+                if line[:1] != '#':
+                    # Annotation line
+                    if line_filter is not None and \
+                       not line_filter.match(line):
+                        continue
+                    type_ = ANNOTATION
+                elif line[1:2] == '#':
+                    # Pragma
+                    type_ = PRAGMA
+                else:
+                    # Comment line
+                    type_ = COMMENT
+                # Convert to GFFDataLine
+                if extra_args and type_ == ANNOTATION:
+                    yield gffdataline(line=line,lineno=lineno,gff_line_type=type_,
+                                      **extra_args)
+                else:
+                    yield gffdataline(line=line,lineno=lineno,gff_line_type=type_)
+            lines = self.__read_batch()
+
+    def __iter_parallel_records(self):
+        """Internal: generator yielding records parsed in parallel
+
+        Splits the file into shards which are parsed by a pool of
+        worker processes, and converts the results into records in
+        the original order.
+        """
+        gffdataline = self.__gffdataline
+        # Additional arguments for annotation records
+        extra_args = {}
+        if self.__intern_table is not None:
+            extra_args['intern_table'] = self.__intern_table
+        if self.__projection is not None:
+            extra_args['projection'] = self.__projection
+        # Records are transferred as tuples of fields
+        from_fields = gffdataline._from_fields
+        shards = split_file(self.__gff_file,
+                            self.__processes*SHARDS_PER_PROCESS,
+                            start=self.__offset)
+        args = [(self.__gff_file,start,end,gffdataline,
+                 self.__projection,self.__line_filter)
+                for start,end in shards]
+        lineno = self.__lineno
+        pool = multiprocessing.Pool(self.__processes)
+        try:
+            for nlines,data in pool.imap(_parse_shard,args):
+                for type_,i,item in marshal.loads(data):
+                    if type_ != ANNOTATION:
+                        yield gffdataline(line=item,lineno=lineno+i,
+                                          gff_line_type=type_)
+                    else:
+                        yield from_fields(item,lineno=lineno+i,
+                                          gff_line_type=type_,**extra_args)
+                lineno += nlines
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def __mapped_blocks(self):
+        """Internal: generator yielding buffers to scan in mapped mode
+
+        Yields tuples of (buffer,start,end) where 'buffer' is either
+        the memory-mapped file or a block of data read from the file,
+        'start' is the offset to start scanning from and 'end' is the
+        offset of the end of the last complete line in the buffer.
+        """
+        if self.__mmap is not None:
+            # Entire file is available
+            if self.__close_fp: self.__fp.close()
+            yield (self.__mmap,self.__offset,len(self.__mmap))
+            return
+        partial = ''
+        while True:
+            block = self.__fp.read(self.__buffer_size)
+            if not block:
+                # Reached EOF: scan any unterminated last line
+                if self.__close_fp: self.__fp.close()
+                if partial:
+                    yield (partial,0,len(partial))
+                return
+            block = partial + block
+            end = block.rfind('\n') + 1
+            partial = block[end:]
+            if end:
+                yield (block,0,end)
+
+    def __iter_mapped_records(self):
+        """Internal: generator yielding records in mapped mode
+
+        Scans each buffer for line endings and creates a
+        MappedGFFDataLine-like object for each line, referencing
+        its position in the buffer.
+        """
+        gffdataline = self.__gffdataline
+        projection = self.__projection
+        line_filter = self.__line_filter
+        lineno = self.__lineno
+        for buf,pos,stop in self.__mapped_blocks():
+            crlf = (buf.find('\r',pos,stop) >= 0)
+            while pos < stop:
+                end = buf.find('\n',pos,stop)
+                if end < 0:
+                    end = stop
+                next_pos = end + 1
+                if crlf and end > pos and buf[end-1] == '\r':
+                    end -= 1
+                lineno += 1
+                # Set type for line
+                head = buf[pos:pos+2]
+                if head[:1] != '#':
+                    # Annotation line
+                    if line_filter is not None and \
+                       not line_filter.match(buf,pos,end):
+                        pos = next_pos
+                        continue
+                    type_ = ANNOTATION
+                elif head[1:2] == '#':
+                    # Pragma
+                    type_ = PRAGMA
+                else:
+                    # Comment line
+                    type_ = COMMENT
+                if projection is not None and type_ == ANNOTATION:
+                    yield gffdataline(buf,start=pos,end=end,lineno=lineno,
+                                      gff_line_type=type_,projection=projection)
+                else:
+                    yield gffdataline(buf,start=pos,end=end,lineno=lineno,
+                                      gff_line_type=type_)
+                pos = next_pos
+
+    def __iter__(self):
+        return self.__records
 
     def next(self):
         """Return next record from GFF file as a GFFDataLine object
         """
-        line = self.__fp.readline()
-        self.__lineno += 1
-        if line != '':
-            # Set type for line
-            if line.startswith("##"):
-                # Pragma
-                type_ = PRAGMA
-            elif line.startswith("#"):
-                # Comment line
-                type_ = COMMENT
-            else:
-                # Annotation line
-                type_ = ANNOTATION
-            # Convert to GFFDataLine
-            return self.__gffdataline(line=line,lineno=self.__lineno,gff_line_type=type_)
-        else:
-            # Reached EOF
-            if self.__close_fp: self.__fp.close()
-            raise StopIteration
+        return self.__records.next()
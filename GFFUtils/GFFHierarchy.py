@@ -0,0 +1,373 @@
+#!/bin/env python
+#
+#     GFFHierarchy.py: index of the ID/Parent relationships in GFF data
+#
+########################################################################
+#
+# GFFHierarchy.py
+#
+#########################################################################
+
+"""GFFHierarchy
+
+Classes for navigating the feature hierarchy defined by the 'ID' and
+'Parent' attributes of GFF3 records (e.g. gene -> mRNA -> exon),
+without scanning the whole file to find the relatives of a record.
+
+Classes
+-------
+
+ * GFFHierarchy: index of records by ID, parent and root
+
+The index maps each ID to its record, each parent ID to the records
+which name it as a parent, and each ID to the 'root' records at the
+top of the hierarchy above it. 'Parent' attributes can contain
+several comma-separated IDs, in which case the record has several
+parents (and possibly several roots).
+
+Cycles in the hierarchy (e.g. a record which is its own ancestor)
+are detected when the index is built; they are reported by the
+'cycles' method and are ignored when looking for ancestors and
+roots.
+
+The index can be converted to and from a snapshot (a dictionary of
+basic types which can be stored using 'marshal'), which is used by
+GFFFile to keep the index in its parse cache (see the GFFCache
+module).
+
+Usage examples
+--------------
+
+Normally the index is obtained from a GFFFile:
+
+>>> gff = GFFFile('my.gff')
+>>> hierarchy = gff.hierarchy()
+>>> gene = hierarchy.root('DDB0216437')
+>>> for record in hierarchy.descendants(gene):
+>>>    print record['feature']
+
+Queries accept either an ID or a record (records without an ID are
+located via their 'Parent' attribute).
+"""
+
+#######################################################################
+# Import modules that this module depends on
+#######################################################################
+
+import logging
+
+#######################################################################
+# Classes
+#######################################################################
+
+class GFFHierarchy:
+    """Index of the ID/Parent hierarchy of a set of GFF records
+
+    Where several records have the same ID (e.g. the lines of a
+    multi-line CDS feature) the last is used as the record for
+    that ID; the IDs which occur more than once are listed by
+    the 'duplicate_ids' method.
+    """
+    def __init__(self,records=(),id_attr='ID',parent_attr='Parent',
+                 snapshot=None):
+        """Create a new GFFHierarchy
+
+        Arguments:
+          records: list of GFFDataLine-like objects
+          id_attr: name of the ID attribute (default 'ID')
+          parent_attr: name of the parent attribute (default
+            'Parent')
+          snapshot: (optional) snapshot from the 'snapshot'
+            method for the same list of records, which is used
+            instead of examining the records
+        """
+        self.__records = list(records)
+        self.__id_attr = id_attr
+        self.__parent_attr = parent_attr
+        if snapshot is not None:
+            self.__ids = snapshot['ids']
+            self.__parents = snapshot['parents']
+            self.__children = snapshot['children']
+            self.__roots = snapshot['roots']
+            self.__cycles = snapshot['cycles']
+            self.__duplicates = snapshot['duplicates']
+            self.__unidentified = snapshot['unidentified']
+        else:
+            self.__build()
+
+    def __build(self):
+        """Internal: index the records
+        """
+        id_attr = self.__id_attr
+        parent_attr = self.__parent_attr
+        # Record positions for each ID, parents for each record
+        ids = {}
+        duplicates = []
+        unidentified = []
+        parents = {}
+        children = {}
+        for i,record in enumerate(self.__records):
+            attributes = record['attributes']
+            if id_attr in attributes:
+                idx = attributes[id_attr]
+                if idx in ids:
+                    duplicates.append(idx)
+                ids[idx] = i
+            else:
+                unidentified.append(i)
+            if parent_attr in attributes:
+                parent_ids = attributes[parent_attr].split(',')
+                parents[i] = parent_ids
+                for parent in parent_ids:
+                    try:
+                        children[parent].append(i)
+                    except KeyError:
+                        children[parent] = [i]
+        self.__ids = ids
+        self.__parents = parents
+        self.__children = children
+        self.__duplicates = duplicates
+        self.__unidentified = unidentified
+        # Find roots of each ID (and any cycles) using a depth-first
+        # search without recursion
+        roots = {}
+        cycles = []
+        in_progress = set()
+        for start in ids:
+            if start in roots:
+                continue
+            stack = [(start,iter(self.__parent_ids(start)))]
+            in_progress.add(start)
+            while stack:
+                idx,pending = stack[-1]
+                for parent in pending:
+                    if parent in roots or parent not in ids:
+                        continue
+                    if parent in in_progress:
+                        # Back edge: record the cycle
+                        cycle = [x[0] for x in stack]
+                        cycle = cycle[cycle.index(parent):]
+                        logging.warning("Cycle in %s hierarchy: %s" %
+                                        (parent_attr,' -> '.join(cycle)))
+                        cycles.append(cycle)
+                        continue
+                    stack.append((parent,iter(self.__parent_ids(parent))))
+                    in_progress.add(parent)
+                    break
+                else:
+                    # All parents done: roots are the union of theirs
+                    stack.pop()
+                    in_progress.discard(idx)
+                    idx_roots = []
+                    for parent in self.__parent_ids(idx):
+                        for root in roots.get(parent,()):
+                            if root not in idx_roots:
+                                idx_roots.append(root)
+                    if not idx_roots:
+                        idx_roots = [idx]
+                    roots[idx] = idx_roots
+        self.__roots = roots
+        self.__cycles = cycles
+
+    def __parent_ids(self,x):
+        """Internal: return list of parent IDs for an ID or record
+        """
+        if isinstance(x,basestring):
+            try:
+                return self.__parents.get(self.__ids[x],[])
+            except KeyError:
+                return []
+        attributes = x['attributes']
+        if self.__parent_attr in attributes:
+            return attributes[self.__parent_attr].split(',')
+        return []
+
+    def __id(self,x):
+        """Internal: return the ID for an ID or record (or None)
+        """
+        if isinstance(x,basestring):
+            return x
+        attributes = x['attributes']
+        if self.__id_attr in attributes:
+            return attributes[self.__id_attr]
+        return None
+
+    def __len__(self):
+        return len(self.__ids)
+
+    def __contains__(self,idx):
+        return idx in self.__ids
+
+    @property
+    def id_attr(self):
+        """Return the name of the ID attribute
+        """
+        return self.__id_attr
+
+    @property
+    def parent_attr(self):
+        """Return the name of the parent attribute
+        """
+        return self.__parent_attr
+
+    def ids(self):
+        """Return a list of the indexed IDs
+        """
+        return self.__ids.keys()
+
+    def record(self,idx):
+        """Return the record with an ID
+
+        Raises KeyError if there is no record with the ID.
+
+        Arguments:
+          idx: ID to look up
+        """
+        return self.__records[self.__ids[idx]]
+
+    def parents(self,x):
+        """Return the parent records of an ID or record
+
+        Parents which are not in the data are ignored.
+
+        Arguments:
+          x: ID or record
+        """
+        ids = self.__ids
+        return [self.__records[ids[parent]]
+                for parent in self.__parent_ids(x) if parent in ids]
+
+    def children(self,x):
+        """Return the child records of an ID or record
+
+        Arguments:
+          x: ID or record
+        """
+        records = self.__records
+        return [records[i] for i in self.__children.get(self.__id(x),())]
+
+    def ancestors(self,x):
+        """Return all the ancestor records of an ID or record
+
+        Ancestors are returned nearest first (i.e. parents, then
+        grandparents etc).
+
+        Arguments:
+          x: ID or record
+        """
+        ids = self.__ids
+        seen = set()
+        ancestors = []
+        pending = self.__parent_ids(x)
+        while pending:
+            next_pending = []
+            for parent in pending:
+                if parent in seen or parent not in ids:
+                    continue
+                seen.add(parent)
+                ancestors.append(self.__records[ids[parent]])
+                next_pending.extend(self.__parent_ids(parent))
+            pending = next_pending
+        return ancestors
+
+    def descendants(self,x):
+        """Return all the descendant records of an ID or record
+
+        Descendants are returned in depth-first order (i.e. each
+        child is followed by its own descendants).
+
+        Arguments:
+          x: ID or record
+        """
+        records = self.__records
+        children = self.__children
+        seen = set()
+        descendants = []
+        stack = [iter(children.get(self.__id(x),()))]
+        while stack:
+            for i in stack[-1]:
+                if i in seen:
+                    continue
+                seen.add(i)
+                descendants.append(records[i])
+                idx = self.__id(records[i])
+                if idx in children:
+                    stack.append(iter(children[idx]))
+                break
+            else:
+                stack.pop()
+        return descendants
+
+    def roots(self,x):
+        """Return the root records above an ID or record
+
+        A record with no (known) parents is its own root.
+
+        Arguments:
+          x: ID or record
+        """
+        idx = self.__id(x)
+        if idx in self.__ids:
+            root_ids = self.__roots[idx]
+        else:
+            root_ids = []
+            for parent in self.__parent_ids(x):
+                for root in self.__roots.get(parent,()):
+                    if root not in root_ids:
+                        root_ids.append(root)
+            if not root_ids:
+                if isinstance(x,basestring):
+                    return []
+                return [x]
+        return [self.record(root) for root in root_ids]
+
+    def root(self,x):
+        """Return the first root record above an ID or record
+
+        Returns None if the ID isn't in the data.
+
+        Arguments:
+          x: ID or record
+        """
+        roots = self.roots(x)
+        if roots:
+            return roots[0]
+        return None
+
+    def cycles(self):
+        """Return list of the cycles found in the hierarchy
+
+        Each cycle is a list of IDs, where each ID names the next
+        one as a parent (and the last names the first).
+        """
+        return [list(cycle) for cycle in self.__cycles]
+
+    def duplicate_ids(self):
+        """Return list of IDs which occur on more than one record
+        """
+        return list(self.__duplicates)
+
+    def unidentified(self):
+        """Return list of the records without an ID
+        """
+        return [self.__records[i] for i in self.__unidentified]
+
+    def multiple_parents(self):
+        """Return list of the records which have more than one parent
+        """
+        return [self.__records[i] for i in sorted(self.__parents)
+                if len(self.__parents[i]) > 1]
+
+    def snapshot(self):
+        """Return the index as a dictionary of basic types
+
+        The snapshot can be stored using 'marshal' and passed
+        back to GFFHierarchy together with the same records.
+        """
+        return { 'ids': self.__ids,
+                 'parents': self.__parents,
+                 'children': self.__children,
+                 'roots': self.__roots,
+                 'cycles': self.__cycles,
+                 'duplicates': self.__duplicates,
+                 'unidentified': self.__unidentified }
@@ -0,0 +1,430 @@
+#!/bin/env python
+#
+#     GFFIndex.py: byte-offset indexes for random access to GFF files
+#
+########################################################################
+#
+# GFFIndex.py
+#
+#########################################################################
+
+"""GFFIndex
+
+Classes and functions for building and using a persistent index of a
+GFF (or GTF) file, which allows individual records to be fetched
+without reading the whole file.
+
+The index records the byte offset of the start of every line in the
+file, plus the offsets of the records for each value of an ID
+attribute (by default 'ID'; if a record has the attribute more than
+once then the last value is used, as for GFFAttributes). It is stored
+using the 'marshal' module in a 'sidecar' file next to the GFF file
+(e.g. 'my.gff.gfi'), along with the size and modification time of the
+GFF file so that out-of-date indexes can be detected and rebuilt.
+
+Offsets are stored as signed longs, so on platforms where a long is
+32 bits only files smaller than 2Gb can be indexed.
+
+Functions
+---------
+
+ * build_index: index a GFF file and write the sidecar file
+ * load_index: load an existing index (if it is up-to-date)
+ * get_index: load an index, building it first if necessary
+
+Classes
+-------
+
+ * GFFIndex: random access to lines and IDs via the index
+
+Usage examples
+--------------
+
+To fetch individual records from a GFF file:
+
+>>> index = get_index('my.gff')
+>>> record = index.record(1234)
+>>> for record in index.records_for_id('DDB0216437'):
+>>>    print record['feature']
+>>> index.close()
+
+To iterate over a GFF file starting from a specific line:
+
+>>> iterator = index.iterator(1234)
+
+Only uncompressed files can be indexed.
+"""
+
+#######################################################################
+# Import modules that this module depends on
+#######################################################################
+
+import os
+import re
+import array
+import marshal
+import GFFFile
+import GFFCache
+import CompressedFile
+
+#######################################################################
+# Constants/globals
+#######################################################################
+
+# Extension for index sidecar files
+INDEX_EXTENSION = '.gfi'
+
+# Version of the index file format
+INDEX_VERSION = 3
+
+# Type code for arrays of offsets (signed long, since the array module
+# has no 'Q' type code in Python 2)
+OFFSET_TYPECODE = 'l'
+
+# Largest offset which can be stored (depends on the size of a long
+# on the platform)
+MAX_OFFSET = 2**(8*array.array(OFFSET_TYPECODE).itemsize-1) - 1
+
+#######################################################################
+# Classes
+#######################################################################
+
+class GFFIndex:
+    """Class providing random access to a GFF file via an index
+
+    Typically a GFFIndex would be obtained using the 'build_index',
+    'load_index' or 'get_index' functions, rather than being created
+    directly.
+
+    Line numbers start from 1 and include pragma and comment lines
+    (i.e. they match the values returned by the 'lineno' method of
+    the records from GFFIterator).
+    """
+    def __init__(self,gff_file,offsets,ids,size,mtime,id_attribute='ID',
+                 format='gff'):
+        """Create a new GFFIndex
+
+        Arguments:
+          gff_file: name of the indexed GFF file
+          offsets: array of the byte offsets of the start of each
+            line in the file
+          ids: dictionary mapping ID values to lists of line numbers
+          size: size of the GFF file when the index was built
+          mtime: modification time of the GFF file when the index
+            was built (integer nanoseconds, see GFFCache.mtime_ns)
+          id_attribute: name of the attribute used for the IDs
+          format: either 'gff' (default) or 'gtf'
+        """
+        self.__gff_file = gff_file
+        self.__offsets = offsets
+        self.__ids = ids
+        self.__size = size
+        self.__mtime = mtime
+        self.__id_attribute = id_attribute
+        self.__format = format
+        self.__fp = None
+
+    def __len__(self):
+        return len(self.__offsets)
+
+    def __contains__(self,gff_id):
+        return gff_id in self.__ids
+
+    @property
+    def gff_file(self):
+        """Return the name of the indexed GFF file
+        """
+        return self.__gff_file
+
+    @property
+    def id_attribute(self):
+        """Return the name of the indexed ID attribute
+        """
+        return self.__id_attribute
+
+    def ids(self):
+        """Return a list of the indexed ID values
+        """
+        return self.__ids.keys()
+
+    def is_valid(self):
+        """Check whether the index matches the GFF file
+
+        Returns True if the size and modification time of the GFF
+        file match those recorded when the index was built, False
+        otherwise.
+        """
+        try:
+            st = os.stat(self.__gff_file)
+        except OSError:
+            return False
+        return (st.st_size == self.__size and
+                GFFCache.mtime_ns(st) == self.__mtime)
+
+    def offset(self,lineno):
+        """Return the byte offset of a line in the GFF file
+
+        Arguments:
+          lineno: line number (starting from 1)
+        """
+        if lineno < 1 or lineno > len(self.__offsets):
+            raise IndexError, "Line %s not in index" % lineno
+        return self.__offsets[lineno-1]
+
+    def lines_for_id(self,gff_id):
+        """Return the line numbers of the records with an ID
+
+        Returns an empty list if the ID isn't in the index.
+
+        Arguments:
+          gff_id: value of the ID attribute to look up
+        """
+        return list(self.__ids.get(gff_id,[]))
+
+    def record(self,lineno,gffdataline=None):
+        """Return the record on a specific line of the GFF file
+
+        Arguments:
+          lineno: line number (starting from 1)
+          gffdataline: (optional) GFFDataLine-like class used
+            to create the record (defaults to GFFDataLine for GFF
+            indexes and GTFDataLine for GTF indexes)
+        """
+        if gffdataline is None:
+            gffdataline = self.__default_dataline()
+        if self.__fp is None:
+            self.__fp = open(self.__gff_file,'rb')
+        self.__fp.seek(self.offset(lineno))
+        line = self.__fp.readline().rstrip('\r\n')
+        return gffdataline(line=line,lineno=lineno,
+                           gff_line_type=line_type(line))
+
+    def records_for_id(self,gff_id,gffdataline=None):
+        """Return the records with a specific ID
+
+        Returns an empty list if the ID isn't in the index.
+
+        Arguments:
+          gff_id: value of the ID attribute to look up
+          gffdataline: (optional) GFFDataLine-like class used
+            to create the records
+        """
+        return [self.record(lineno,gffdataline=gffdataline)
+                for lineno in self.lines_for_id(gff_id)]
+
+    def iterator(self,lineno=1,**args):
+        """Return an iterator starting from a specific line
+
+        Additional keyword arguments are passed to the iterator.
+
+        Arguments:
+          lineno: line number to start from (default is 1)
+        """
+        if self.__format == 'gtf':
+            import GTFFile
+            iterator = GTFFile.GTFIterator(self.__gff_file,**args)
+        else:
+            iterator = GFFFile.GFFIterator(self.__gff_file,**args)
+        iterator.seek(self.offset(lineno),lineno=lineno)
+        return iterator
+
+    def write(self,index_file=None):
+        """Write the index to a sidecar file
+
+        Arguments:
+          index_file: (optional) name of the file to write to
+            (defaults to the GFF file name plus '.gfi')
+        """
+        if index_file is None:
+            index_file = self.__gff_file + INDEX_EXTENSION
+        data = { 'version': INDEX_VERSION,
+                 'size': self.__size,
+                 'mtime': self.__mtime,
+                 'id_attribute': self.__id_attribute,
+                 'format': self.__format,
+                 'typecode': OFFSET_TYPECODE,
+                 'itemsize': self.__offsets.itemsize,
+                 'offsets': self.__offsets.tostring(),
+                 'ids': self.__ids }
+        fp = open(index_file,'wb')
+        marshal.dump(data,fp,2)
+        fp.close()
+
+    def close(self):
+        """Close the GFF file used for fetching records
+        """
+        if self.__fp is not None:
+            self.__fp.close()
+            self.__fp = None
+
+    def __default_dataline(self):
+        """Internal: return the default class for records
+        """
+        if self.__format == 'gtf':
+            import GTFFile
+            return GTFFile.GTFDataLine
+        return GFFFile.GFFDataLine
+
+#######################################################################
+# Functions
+#######################################################################
+
+def line_type(line):
+    """Return the type of a line from a GFF file
+
+    Arguments:
+      line: line of data from a GFF file
+
+    Returns:
+      One of PRAGMA, COMMENT or ANNOTATION (as defined in the
+      GFFFile module).
+    """
+    if line[:1] != '#':
+        return GFFFile.ANNOTATION
+    elif line[1:2] == '#':
+        return GFFFile.PRAGMA
+    return GFFFile.COMMENT
+
+def build_index(gff_file,index_file=None,id_attribute='ID',format=None,
+                buffer_size=GFFFile.DEFAULT_BUFFER_SIZE):
+    """Index a GFF file and write the index to a sidecar file
+
+    Arguments:
+      gff_file: name of the (uncompressed) GFF file to index
+      index_file: (optional) name of the index file to write
+        (defaults to the GFF file name plus '.gfi'); if this is
+        False then the index isn't written
+      id_attribute: name of the attribute to index (default is
+        'ID')
+      format: (optional) either 'gff' or 'gtf' (default is to
+        guess from the file extension)
+      buffer_size: size in bytes of the blocks of data to read
+        from the file
+
+    Returns:
+      GFFIndex object.
+    """
+    if CompressedFile.detect_compression(gff_file) is not None:
+        raise IOError, "Unable to index compressed file %s" % gff_file
+    st = os.stat(gff_file)
+    if st.st_size > MAX_OFFSET:
+        raise IOError, "Unable to index %s: file is too large for " \
+            "offsets on this platform" % gff_file
+    if format is None:
+        if gff_file.endswith('.gtf'):
+            format = 'gtf'
+        else:
+            format = 'gff'
+    if format == 'gtf':
+        id_pattern = re.compile(r'(?:^|;)\s*%s\s+"?([^";]*)"?' %
+                                re.escape(id_attribute))
+    else:
+        id_pattern = re.compile(r'(?:^|;)\s*%s\s*=([^;]*)' %
+                                re.escape(id_attribute))
+    offsets = array.array(OFFSET_TYPECODE)
+    ids = {}
+    offset = 0
+    lineno = 0
+    partial = ''
+    fp = open(gff_file,'rb')
+    while True:
+        block = fp.read(buffer_size)
+        if not block:
+            if partial:
+                lines = [partial]
+                partial = ''
+            else:
+                break
+        else:
+            lines = (partial + block).split('\n')
+            partial = lines.pop()
+        for line in lines:
+            lineno += 1
+            offsets.append(offset)
+            offset += len(line) + 1
+            if line[:1] == '#' or id_attribute not in line:
+                continue
+            # Extract ID from the attributes
+            fields = line.rstrip('\r').split('\t',8)
+            if len(fields) < 9:
+                continue
+            # Use the last value (as GFFAttributes does)
+            matches = id_pattern.findall(fields[8])
+            if matches:
+                gff_id = matches[-1].strip()
+                gff_id = GFFFile.percent_decode(gff_id)
+                try:
+                    ids[gff_id].append(lineno)
+                except KeyError:
+                    ids[gff_id] = [lineno]
+    fp.close()
+    index = GFFIndex(gff_file,offsets,ids,st.st_size,GFFCache.mtime_ns(st),
+                     id_attribute=id_attribute,format=format)
+    if index_file is not False:
+        index.write(index_file)
+    return index
+
+def load_index(gff_file,index_file=None):
+    """Load the index for a GFF file from its sidecar file
+
+    Arguments:
+      gff_file: name of the indexed GFF file
+      index_file: (optional) name of the index file (defaults
+        to the GFF file name plus '.gfi')
+
+    Returns:
+      GFFIndex object, or None if the index file doesn't exist,
+      can't be read or is out of date with respect to the GFF
+      file.
+    """
+    if index_file is None:
+        index_file = gff_file + INDEX_EXTENSION
+    try:
+        fp = open(index_file,'rb')
+        try:
+            data = marshal.load(fp)
+        finally:
+            fp.close()
+    except (IOError,EOFError,ValueError,TypeError):
+        return None
+    try:
+        if data['version'] != INDEX_VERSION:
+            return None
+        offsets = array.array(data['typecode'])
+        if offsets.itemsize != data['itemsize']:
+            return None
+        offsets.fromstring(data['offsets'])
+        index = GFFIndex(gff_file,offsets,data['ids'],
+                         data['size'],data['mtime'],
+                         id_attribute=data['id_attribute'],
+                         format=data['format'])
+    except (KeyError,TypeError,ValueError):
+        return None
+    if not index.is_valid():
+        return None
+    return index
+
+def get_index(gff_file,index_file=None,id_attribute='ID',format=None):
+    """Return the index for a GFF file, building it if necessary
+
+    The existing index is used if it is up to date and was built
+    for the same ID attribute; otherwise the GFF file is indexed
+    and the sidecar file is (re)written.
+
+    Arguments:
+      gff_file: name of the (uncompressed) GFF file
+      index_file: (optional) name of the index file (defaults
+        to the GFF file name plus '.gfi')
+      id_attribute: name of the attribute to index (default is
+        'ID')
+      format: (optional) either 'gff' or 'gtf' (default is to
+        guess from the file extension)
+
+    Returns:
+      GFFIndex object.
+    """
+    index = load_index(gff_file,index_file=index_file)
+    if index is not None and index.id_attribute == id_attribute:
+        return index
+    return build_index(gff_file,index_file=index_file,
+                       id_attribute=id_attribute,format=format)
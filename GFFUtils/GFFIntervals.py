@@ -0,0 +1,323 @@
+#!/bin/env python
+#
+#     GFFIntervals.py: genomic interval index for GFF data
+#
+########################################################################
+#
+# GFFIntervals.py
+#
+#########################################################################
+
+"""GFFIntervals
+
+Classes for finding the GFF (or GTF) records which overlap a genomic
+region, or which are nearest to it, without scanning every record.
+
+Classes
+-------
+
+ * GFFIntervalIndex: per-seqname index of record coordinates
+
+The index holds the records for each seqname sorted by start
+position, together with a 'max end' value for each record which is
+the largest end position in the subtree below it in an implicit
+binary tree laid over the sorted list (the same layout as the
+'cgranges' library by Heng Li). This allows overlap queries to
+skip whole subtrees which end before the query region, so each
+query takes O(log n + k) time for k matching records. A second
+ordering by end position is used to find the nearest records
+upstream of a region.
+
+Coordinates are the 1-based, inclusive positions used in GFF files.
+
+Usage examples
+--------------
+
+Normally the index is obtained from a GFFFile, which builds it the
+first time that it is needed:
+
+>>> gff = GFFFile('my.gff')
+>>> for record in gff.overlaps('chr5',1000000,1200000,feature='gene'):
+>>>    print record['attributes']['ID']
+>>> record = gff.nearest('chr5',1500000,strand='+')
+
+The index can also be built from any list of records:
+
+>>> index = GFFIntervalIndex(records)
+>>> index.overlaps('chr5',1000000,1200000)
+
+The index reflects the records and coordinates at the time it was
+built.
+"""
+
+#######################################################################
+# Import modules that this module depends on
+#######################################################################
+
+from bisect import bisect_left,bisect_right
+
+#######################################################################
+# Constants/globals
+#######################################################################
+
+# Subtrees with this many levels (or fewer) are scanned linearly
+_LINEAR_SCAN_LEVEL = 3
+
+#######################################################################
+# Classes
+#######################################################################
+
+class GFFIntervalIndex:
+    """Index of GFF records by seqname and coordinates
+
+    Records are returned in order of their start positions (and
+    then in their original order for records with the same start).
+    """
+    def __init__(self,records=()):
+        """Create a new GFFIntervalIndex
+
+        Arguments:
+          records: iterable of GFFDataLine-like objects
+        """
+        grouped = {}
+        for i,record in enumerate(records):
+            try:
+                grouped[record['seqname']].append((int(record['start']),
+                                                   int(record['end']),
+                                                   i,record))
+            except KeyError:
+                grouped[record['seqname']] = [(int(record['start']),
+                                               int(record['end']),
+                                               i,record)]
+        self.__seqnames = {}
+        for seqname in grouped:
+            self.__seqnames[seqname] = _SeqnameIntervals(grouped[seqname])
+
+    def __len__(self):
+        return sum([len(intervals) for intervals in self.__seqnames.values()])
+
+    def seqnames(self):
+        """Return a list of the indexed seqnames
+        """
+        return self.__seqnames.keys()
+
+    def overlaps(self,seqname,start,end,strand=None,feature=None):
+        """Return the records which overlap a region
+
+        Arguments:
+          seqname: name of the sequence (e.g. 'chr5')
+          start: start position of the region (inclusive)
+          end: end position of the region (inclusive)
+          strand: (optional) only return records on this
+            strand
+          feature: (optional) only return records of this
+            feature type
+        """
+        try:
+            intervals = self.__seqnames[seqname]
+        except KeyError:
+            return []
+        return [record for record in intervals.overlaps(start,end)
+                if _matches(record,strand,feature)]
+
+    def within(self,seqname,start,end,strand=None,feature=None,margin=0):
+        """Return the records which lie inside a region
+
+        Arguments:
+          seqname: name of the sequence (e.g. 'chr5')
+          start: start position of the region (inclusive)
+          end: end position of the region (inclusive)
+          strand: (optional) only return records on this
+            strand
+          feature: (optional) only return records of this
+            feature type
+          margin: (optional) number of additional bases either
+            side of the region to include
+        """
+        start -= margin
+        end += margin
+        return [record for record in self.overlaps(seqname,start,end,
+                                                   strand=strand,
+                                                   feature=feature)
+                if int(record['start']) >= start and
+                int(record['end']) <= end]
+
+    def nearest(self,seqname,start,end=None,strand=None,feature=None):
+        """Return the record nearest to a position or region
+
+        Records which overlap the region are returned in
+        preference to all others (the first by start position if
+        there are several). Otherwise the record with the smallest
+        gap to the region is returned, with the upstream record
+        preferred if two are equally distant.
+
+        Returns None if there are no matching records on the
+        sequence.
+
+        Arguments:
+          seqname: name of the sequence (e.g. 'chr5')
+          start: position, or start position of the region
+          end: (optional) end position of the region (defaults
+            to the same as 'start')
+          strand: (optional) only consider records on this
+            strand
+          feature: (optional) only consider records of this
+            feature type
+        """
+        if end is None:
+            end = start
+        overlapping = self.overlaps(seqname,start,end,
+                                    strand=strand,feature=feature)
+        if overlapping:
+            return overlapping[0]
+        try:
+            intervals = self.__seqnames[seqname]
+        except KeyError:
+            return None
+        upstream = None
+        for record in intervals.ending_before(start):
+            if _matches(record,strand,feature):
+                upstream = record
+                break
+        downstream = None
+        for record in intervals.starting_after(end):
+            if _matches(record,strand,feature):
+                downstream = record
+                break
+        if upstream is None:
+            return downstream
+        elif downstream is None:
+            return upstream
+        if int(downstream['start']) - end < start - int(upstream['end']):
+            return downstream
+        return upstream
+
+class _SeqnameIntervals:
+    """Internal: interval index for records on a single seqname
+    """
+    def __init__(self,intervals):
+        """Create a new _SeqnameIntervals
+
+        Arguments:
+          intervals: list of (start,end,i,record) tuples, where
+            'i' is the position of the record in the input
+        """
+        intervals.sort(key=lambda x: (x[0],x[2]))
+        self.starts = [x[0] for x in intervals]
+        self.ends = [x[1] for x in intervals]
+        self.records = [x[3] for x in intervals]
+        self.max_ends = list(self.ends)
+        self.root_level = self.__index()
+        # Ordering by end position (for upstream searches)
+        by_end = sorted([(x[1],x[2],x[3]) for x in intervals])
+        self.sorted_ends = [x[0] for x in by_end]
+        self.records_by_end = [x[2] for x in by_end]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __index(self):
+        """Internal: compute max end for each node of the implicit tree
+
+        Returns the level of the root node (or -1 if there are
+        no intervals).
+        """
+        n = len(self.starts)
+        if n == 0:
+            return -1
+        ends = self.ends
+        max_ends = self.max_ends
+        last_i = 0
+        last = 0
+        for i in xrange(0,n,2):
+            last_i = i
+            last = max_ends[i] = ends[i]
+        k = 1
+        while (1 << k) <= n:
+            x = 1 << (k-1)
+            i0 = (x << 1) - 1
+            step = x << 2
+            for i in xrange(i0,n,step):
+                e = ends[i]
+                el = max_ends[i-x]
+                er = max_ends[i+x] if i+x < n else last
+                if el > e:
+                    e = el
+                if er > e:
+                    e = er
+                max_ends[i] = e
+            if (last_i >> k) & 1:
+                last_i -= x
+            else:
+                last_i += x
+            if last_i < n and max_ends[last_i] > last:
+                last = max_ends[last_i]
+            k += 1
+        return k-1
+
+    def overlaps(self,start,end):
+        """Return the records overlapping a region, by start position
+        """
+        n = len(self.starts)
+        if n == 0:
+            return []
+        starts = self.starts
+        ends = self.ends
+        max_ends = self.max_ends
+        records = self.records
+        results = []
+        # Stack of (level,node,left_done) for the tree traversal
+        stack = [(self.root_level,(1 << self.root_level)-1,False)]
+        while stack:
+            k,x,left_done = stack.pop()
+            if k <= _LINEAR_SCAN_LEVEL:
+                # Small subtree: scan linearly
+                i0 = x >> k << k
+                i1 = min(i0 + (1 << (k+1)) - 1,n)
+                i = i0
+                while i < i1 and starts[i] <= end:
+                    if ends[i] >= start:
+                        results.append(records[i])
+                    i += 1
+            elif not left_done:
+                # Revisit this node after its left child
+                stack.append((k,x,True))
+                y = x - (1 << (k-1))
+                if y >= n or max_ends[y] >= start:
+                    stack.append((k-1,y,False))
+            elif x < n and starts[x] <= end:
+                if ends[x] >= start:
+                    results.append(records[x])
+                stack.append((k-1,x + (1 << (k-1)),False))
+        return results
+
+    def ending_before(self,position):
+        """Yield records ending before a position, nearest first
+        """
+        i = bisect_left(self.sorted_ends,position)
+        records = self.records_by_end
+        while i > 0:
+            i -= 1
+            yield records[i]
+
+    def starting_after(self,position):
+        """Yield records starting after a position, nearest first
+        """
+        i = bisect_right(self.starts,position)
+        records = self.records
+        while i < len(records):
+            yield records[i]
+            i += 1
+
+#######################################################################
+# Functions
+#######################################################################
+
+def _matches(record,strand=None,feature=None):
+    """Internal: check if a record has the specified strand and feature
+    """
+    if strand is not None and record['strand'] != strand:
+        return False
+    if feature is not None and record['feature'] != feature:
+        return False
+    return True
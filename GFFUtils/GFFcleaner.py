@@ -27,13 +27,14 @@ __version__ = get_version()
 
 import os,sys
 import logging
+from bisect import bisect_left
 import optparse
 
 try:
     from TabFile import TabFile
 except ImportError:
     from bcftbx.TabFile import TabFile
-from GFFFile import GFFFile,GFFAttributes,GFFID,OrderedDictionary
+from GFFFile import GFFFile,GFFDataLine,GFFAttributes,GFFAttributeIndex,GFFID,OrderedDictionary
 
 #######################################################################
 # Classes
@@ -103,6 +104,7 @@ def GFFUpdateAttributes(gff_data,update_keys={},exclude_keys=[],no_empty_values=
         values with blanks (otherwise replacing with blank values is okay)
       exclude_nokeys: if True then any 'nokeys' attributes will be removed
     """
+    exclude_keys = set(exclude_keys)
     for data in gff_data:
         # Process the attributes data
         attributes = data['attributes']
@@ -149,32 +151,23 @@ def GFFGetDuplicateSGDs(gff_data):
     Note that duplicates are determined purely by SGD name; no
     account is taken of chromosome or strand.
 
+    The duplicates are found by building an index of the SGD
+    values (see GFFAttributeIndex) each time this is called, so
+    that it reflects any changes to the attributes.
+
     Arguments:
-      gff_data: a GFFFile object containing the GFF file data
+      gff_data: a GFFFile object (or a list of GFFDataLines)
+        containing the GFF file data
 
     Returns:
       OrderedDictionary with SGDs as keys for lists of the
       duplicate TabDataLines corresponding to the SGD
     """
-    # Use ordered dictionary to sort info on duplicates
-    duplicates = OrderedDictionary()
-    # Process data line-by-line
-    for data in gff_data:
-        attributes = data['attributes']
-        if 'SGD' in attributes:
-            # Store data
-            sgd = attributes['SGD']
-            if sgd != '':
-                # Check for duplicates
-                if sgd in duplicates:
-                    duplicates[sgd].append(data)
-                else:
-                    duplicates[sgd] = [data]
-    # Filter out true duplicates i.e. SGDs with at least two
-    # GFF data lines
-    for sgd in duplicates.keys():
-            if len(duplicates[sgd]) < 2:
-                del(duplicates[sgd])
+    # True duplicates are SGDs with at least two GFF data lines
+    duplicates = GFFAttributeIndex('SGD',gff_data).duplicates()
+    # Ignore blank SGDs
+    if '' in duplicates:
+        del(duplicates[''])
     # Finished
     return duplicates
 
@@ -223,13 +216,19 @@ def GFFResolveDuplicateSGDs(gff_data,mapping_data,duplicates,overlap_margin):
                'unresolved_sgds_no_overlaps': [],
                'unresolved_sgds_multiple_matches': [],
                'discard': [] }
+    # Group genes in mapping data by name
+    mapping_genes_by_name = {}
+    for gene in mapping_data:
+        try:
+            mapping_genes_by_name[gene['name']].append(gene)
+        except KeyError:
+            mapping_genes_by_name[gene['name']] = [gene]
     # Make list of matching genes for each duplicate from mapping data
-    sgds = duplicates.keys()
     for sgd in duplicates.keys():
         # Look up genes with the same SGD name
         logging.debug("* * * * * * * * * * * * * * * * * * * * * * *")
         logging.debug("SGD = %s" % sgd)
-        mapping_genes = mapping_data.lookup('name',sgd)
+        mapping_genes = mapping_genes_by_name.get(sgd,[])
         if len(mapping_genes) == 0:
             logging.debug("No genes in mapping file with matching SGD to resolve:")
             for duplicate in duplicates[sgd]:
@@ -247,7 +246,9 @@ def GFFResolveDuplicateSGDs(gff_data,mapping_data,duplicates,overlap_margin):
         # At least one mapping gene available
         matches = []
         rejects = []
-        # Match duplicates to mapping genes
+        # Identities of the rejected data lines
+        rejected = set()
+        # Match duplicates to mapping genes (keyed by gene identity)
         genes_to_duplicates = {}
         for duplicate in duplicates[sgd]:
             assigned = False
@@ -255,29 +256,33 @@ def GFFResolveDuplicateSGDs(gff_data,mapping_data,duplicates,overlap_margin):
                 # Filter on chromosome and strand
                 if gene['chr'] == duplicate['seqname'] and \
                         gene['strand'] == duplicate['strand']:
-                    if gene not in genes_to_duplicates.keys():
-                        genes_to_duplicates[gene] = []
-                    genes_to_duplicates[gene].append(duplicate)
+                    try:
+                        genes_to_duplicates[id(gene)].append(duplicate)
+                    except KeyError:
+                        genes_to_duplicates[id(gene)] = [duplicate]
                     assigned = True
             # No match for this duplicate, add to provisional rejects
             if not assigned:
-                if duplicate in rejects:
+                if id(duplicate) in rejected:
                     logging.warning("Duplicate added multiple times to rejects list")
                 rejects.append(duplicate)
+                rejected.add(id(duplicate))
         # Check if there are any matches
-        if len(genes_to_duplicates.keys()) == 0:
+        if len(genes_to_duplicates) == 0:
             logging.debug("No mapping genes matched on chromosome and strand")
             result['unresolved_sgds_no_mapping_genes_after_filter'].append(sgd)
             continue
         # Cluster duplicates for each gene and filter by overlap
-        for gene in genes_to_duplicates.keys():
+        for gene in mapping_genes:
+            if id(gene) not in genes_to_duplicates:
+                continue
             # Determine overlap region
             region = (gene['start'] - overlap_margin,
                       gene['end'] + overlap_margin)
             # Group duplicates into subsets
-            genes_to_duplicates[gene] = GroupGeneSubsets(genes_to_duplicates[gene])
+            subsets = GroupGeneSubsets(genes_to_duplicates[id(gene)])
             # Check for overlaps for each subset
-            for duplicate in genes_to_duplicates[gene]:
+            for duplicate in subsets:
                 if duplicate[0]['start'] > region[0] and \
                         duplicate[-1]['end'] < region[1]:
                     # Found a match
@@ -285,9 +290,10 @@ def GFFResolveDuplicateSGDs(gff_data,mapping_data,duplicates,overlap_margin):
                 else:
                     # Not a match, unpack and add to provisional rejects
                     for d in duplicate:
-                        if d in rejects:
+                        if id(d) in rejected:
                             logging.warning("Duplicate added multiple times to rejects list")
                         rejects.append(d)
+                        rejected.add(id(d))
         # End of filtering process - see what we're left with
         if len(matches) == 1:
             # Resolved
@@ -392,17 +398,48 @@ def GFFInsertMissingGenes(gff_data,mapping_data):
     position based on chromosome and start position.
     
     Arguments:
-      gff_data: a GFFFile object containing the GFF file data
+      gff_data: a GFFFile object (or a list of GFFDataLines)
+        containing the GFF file data
       mapping_data: a TabFile object containing candidate genes to insert
         into the GFF data if not present
     """
-    # Make a list of all SGDs in current GFF file
-    sgds = []
+    # Make a set of all SGDs in current GFF file
+    sgds = set()
     for data in gff_data:
         attributes = data['attributes']
         if 'SGD' in attributes:
-            sgd = attributes['SGD']
-            if not sgd in sgds: sgds.append(sgd)
+            sgds.add(attributes['SGD'])
+    # Each missing gene is inserted immediately after the last
+    # record (existing or new) on the same chromosome which starts
+    # before it. That record is always one where all the later
+    # records on the chromosome start at the same position or
+    # after it, so for each chromosome keep a list of these
+    # records (which is also in order of start position)
+    chroms = {}
+    for j in xrange(len(gff_data)-1,-1,-1):
+        data = gff_data[j]
+        start = data['start']
+        try:
+            starts,records = chroms[data['seqname']]
+        except KeyError:
+            starts,records = chroms[data['seqname']] = ([],[])
+        if not starts or start <= starts[-1]:
+            starts.append(start)
+            records.append(j)
+    for starts,records in chroms.values():
+        starts.reverse()
+        records.reverse()
+    # New records are noted as following the record (existing or
+    # new) that they are inserted after (with -1 for the start of
+    # the data); 'last' and 'before_last' track the last record in
+    # the data and the position preceding it
+    following = {}
+    if len(gff_data) > 0:
+        last = len(gff_data) - 1
+        before_last = last - 1
+    else:
+        last = None
+        before_last = -1
     # Look for SGDs that aren't in the current GFF file
     for gene in mapping_data:
         sgd = gene['name']
@@ -416,17 +453,8 @@ def GFFInsertMissingGenes(gff_data,mapping_data):
         if not sgd in sgds:
             # SGD is not in the input GFF
             chrom = gene['chr']
-            # Find the insertion point (i.e. within the correct chromosome and
-            # start position)
-            i = -1
-            for j in range(len(gff_data)):
-                # Match chromosome
-                if gff_data[j]['seqname'] == chrom:
-                    if gff_data[j]['start'] < start:
-                        i = j + 1
-            logging.debug("Inserting '%s' at position %d" % (sgd,i))
-            # Insert missing gene into GFF data
-            missing = gff_data.insert(i)
+            # Make the record for the missing gene
+            missing = GFFDataLine()
             missing['seqname'] = gene['chr']
             missing['source'] = 'GFFcleaner'
             missing['feature'] = 'CDS'
@@ -440,9 +468,79 @@ def GFFInsertMissingGenes(gff_data,mapping_data):
             attributes['SGD'] = sgd
             attributes['Gene'] = sgd
             attributes['Parent'] = sgd
+            # Find the insertion point
+            try:
+                starts,records = chroms[chrom]
+            except KeyError:
+                starts,records = chroms[chrom] = ([],[])
+            k = bisect_left(starts,start)
+            if k > 0:
+                # Insert after the last record which starts before
+                # the missing gene
+                position = records[k-1]
+                starts.insert(k,start)
+                records.insert(k,missing)
+            else:
+                # No match: insert before the last record, and drop
+                # earlier records on the chromosome which start after
+                # the missing gene
+                position = before_last
+                nkeep = bisect_left(starts,start+1)
+                if records and _key(records[-1]) == _key(last):
+                    nkeep = min(nkeep,len(records)-1)
+                    starts[nkeep:-1] = [start]
+                    records[nkeep:-1] = [missing]
+                else:
+                    starts[nkeep:] = [start]
+                    records[nkeep:] = [missing]
+            logging.debug("Inserting '%s' at %s:%d" % (sgd,chrom,start))
+            key = _key(position)
+            try:
+                following[key].append(missing)
+            except KeyError:
+                following[key] = [missing]
+            # Update the last record and the one preceding it
+            if last is None:
+                last = missing
+            elif key == _key(last):
+                before_last = last
+                last = missing
+            elif key == _key(before_last):
+                before_last = missing
+    # Insert all the missing genes into GFF data: the new records
+    # follow the record they were inserted after, most recently
+    # inserted first
+    insertions = []
+    for i in xrange(-1,len(gff_data)):
+        stack = list(following.get(i,()))
+        while stack:
+            data = stack.pop()
+            insertions.append((i+1,data))
+            stack.extend(following.get(_key(data),()))
+    if hasattr(gff_data,'insert_many'):
+        gff_data.insert_many(insertions)
+    else:
+        records = []
+        k = 0
+        for i,data in insertions:
+            records.extend(gff_data[k:i])
+            records.append(data)
+            k = i
+        records.extend(gff_data[k:])
+        gff_data[:] = records
     # Finished inserting missing genes
     return gff_data
 
+def _key(position):
+    """Internal: return key for a position in GFFInsertMissingGenes
+
+    Positions are either indexes of existing records, or new
+    records (which are keyed by identity).
+    """
+    if isinstance(position,(int,long)):
+        return position
+    return ('new',id(position))
+
 def GFFAddExonIDs(gff_data):
     """Construct and insert a ID attribute for exons
 
@@ -838,37 +936,36 @@ def main():
 
         # Remove discarded duplicates from the data
         print "Removing discarded duplicates and writing to %s" % delfile
-        fd = open(delfile,'w')
+        deleted = gff_data.delete_many(discard)
+        deleted_ids = set([id(data) for data in deleted])
         for discard_data in discard:
-            try:
-                ip = gff_data.indexByLineNumber(discard_data.lineno())
-                del(gff_data[ip])
-                fd.write("%s\n" % discard_data)
-            except IndexError:
+            if id(discard_data) not in deleted_ids:
                 logging.warning("Failed to delete line %d: not found" % discard_data.lineno())
+        fd = open(delfile,'w')
+        for discard_data in deleted:
+            fd.write("%s\n" % discard_data)
         fd.close()
 
         # Remove unresolved duplicates if requested
         if discard_unresolved:
             print "Removing unresolved duplicates and writing to %s" % unresfile
-            # Get list of unresolved SGDs
-            all_unresolved = result['unresolved_sgds']
-            # Get list of unresolved duplicates
+            # Get set of unresolved SGDs
+            all_unresolved = set(result['unresolved_sgds'])
+            # Get list of unresolved duplicates (in file order)
+            sgd_index = GFFAttributeIndex('SGD',gff_data)
             unresolved = []
-            for data in gff_data:
-                attributes = data['attributes']
-                if 'SGD' in attributes:
-                    if attributes['SGD'] in all_unresolved:
-                        unresolved.append(data)
+            for sgd in all_unresolved:
+                unresolved.extend(sgd_index.find(sgd))
+            unresolved.sort(key=lambda data: data.lineno())
             # Discard them
-            fu = open(unresfile,'w')
+            deleted = gff_data.delete_many(unresolved)
+            deleted_ids = set([id(data) for data in deleted])
             for discard in unresolved:
-                try:
-                    ip = gff_data.indexByLineNumber(discard.lineno())
-                    del(gff_data[ip])
-                    fu.write("%s\n" % discard)
-                except IndexError:
+                if id(discard) not in deleted_ids:
                     logging.warning("Failed to delete line %d: not found" % discard.lineno())
+            fu = open(unresfile,'w')
+            for discard in deleted:
+                fu.write("%s\n" % discard)
             fu.close()
 
     # Look for "missing" genes in mapping file
@@ -30,6 +30,8 @@ There are a number of GTF-specific classes:
  * GTFIterator: line-by-line iteration through a GTF
  * GTFFile: read data from GTF into memory so it can be easily interrogated
  * GTFDataLine: get data from a single line from a GTF file
+ * CompactGTFDataLine: memory-efficient alternative to GTFDataLine
+ * MappedGTFDataLine: read-only record referencing a memory-mapped file
 
 These classes are built on top of the GFF handling classes.
 
@@ -81,6 +83,18 @@ To iterate over all lines and print just the 'name' part of the
 """
 
 import GFFFile
+import re
+
+#######################################################################
+# Constants/globals
+#######################################################################
+
+# Regular expression matching a single 'key value;' item in GTF
+# attribute data: the value can be double-quoted (in which case it
+# can contain semicolons) or bare (e.g. numbers)
+GTF_ATTRIBUTE_ITEM = re.compile(r'([^\s;]+)'
+                                r'(?:[ \t]+(?:"([^"]*)"|([^;]*?)))?'
+                                r'[ \t]*(?:;|$)')
 
 #######################################################################
 # Classes
@@ -94,10 +108,43 @@ class GTFDataLine(GFFFile.GFFDataLine):
     """
 
     def __init__(self,line=None,column_names=GFFFile.GFF_COLUMNS,lineno=None,delimiter='\t',
-                 gff_line_type=None):
+                 gff_line_type=None,intern_table=None,projection=None):
         GFFFile.GFFDataLine.__init__(self,line=line,column_names=column_names,
-                                     lineno=lineno,delimiter=delimiter,gff_line_type=gff_line_type)
-        self['attributes'] = GTFAttributes(str(self['attributes']))
+                                     lineno=lineno,delimiter=delimiter,gff_line_type=gff_line_type,
+                                     intern_table=intern_table,projection=projection)
+
+    def _parse_attributes(self,attribute_data,intern=None,keys=None):
+        """Internal: convert raw attribute string to GTFAttributes object
+        """
+        return GTFAttributes(attribute_data,intern=intern,keys=keys)
+
+class CompactGTFDataLine(GFFFile.CompactGFFDataLine):
+    """Memory-efficient data line for GTF files
+
+    Subclass of CompactGFFDataLine which stores the attribute data
+    as a GTFAttributes object.
+
+    """
+    __slots__ = ()
+
+    def _parse_attributes(self,attribute_data,intern=None,keys=None):
+        """Internal: convert raw attribute string to GTFAttributes object
+        """
+        return GTFAttributes(attribute_data,intern=intern,keys=keys)
+
+class MappedGTFDataLine(GFFFile.MappedGFFDataLine):
+    """Read-only mapped data line for GTF files
+
+    Subclass of MappedGFFDataLine which returns the attribute data
+    as a GTFAttributes object.
+
+    """
+    __slots__ = ()
+
+    def _parse_attributes(self,attribute_data,keys=None):
+        """Internal: convert raw attribute string to GTFAttributes object
+        """
+        return GTFAttributes(attribute_data,keys=keys)
 
 class GTFAttributes:
     """Class for handling GTF 'attribute' data
@@ -105,12 +152,73 @@ class GTFAttributes:
     The GTF 'attribute' data consists of semi-colon separated
     data items, each of which is a 'key value' pair.
 
+    The data are tokenised in a single pass: values can either be
+    enclosed in double quotes (in which case they can also contain
+    semi-colons) or be bare (e.g. numbers), and are always stored
+    as strings with the enclosing quotes removed. Any percent
+    encoding in the values is decoded.
+
+    Optionally a function can be supplied via the 'intern' argument,
+    which is applied to each key (and to the values of the attributes
+    listed in GFFFile.INTERNED_ATTRIBUTES) e.g. the 'intern' method of
+    a GFFInternTable, to allow repeated strings to be shared.
+
+    If a list of names is supplied via the 'keys' argument then only
+    those attributes are decoded and stored.
+
     """
-    def __init__(self,attribute_data=None):
+    def __init__(self,attribute_data=None,intern=None,keys=None):
         self.__attributes = GFFFile.OrderedDictionary()
-        for attr in GFFFile.GFFAttributes(attribute_data=attribute_data).nokeys():
-            key = attr.split(' ')[0]
-            self.__attributes[key] = ' '.join(attr.split(' ')[1:]).strip('"')
+        if not attribute_data:
+            return
+        if keys is not None and \
+           ';' not in ''.join(attribute_data.split('"')[1::2]):
+            # Locate the requested items directly (only safe when
+            # no quoted value contains a semicolon)
+            items = []
+            for key in keys:
+                pos = self.__find_item(attribute_data,key)
+                if pos >= 0:
+                    items.append((pos,GTF_ATTRIBUTE_ITEM.match(attribute_data,pos)))
+            items.sort()
+            items = [item for pos,item in items]
+        else:
+            items = GTF_ATTRIBUTE_ITEM.finditer(attribute_data)
+        for item in items:
+            key,value,bare_value = item.groups()
+            if keys is not None and key not in keys:
+                # Skip attributes which weren't requested
+                continue
+            if value is None:
+                if bare_value is None:
+                    value = ''
+                else:
+                    value = bare_value.strip('"')
+            value = GFFFile.percent_decode(value)
+            if intern is not None:
+                key = intern(key)
+                if key in GFFFile.INTERNED_ATTRIBUTES:
+                    value = intern(value)
+            self.__attributes[key] = value
+    def __find_item(self,attribute_data,key):
+        """Internal: return offset of the last item with the given key
+
+        Returns -1 if there is no item for the key.
+        """
+        end = len(attribute_data)
+        while True:
+            pos = attribute_data.rfind(key,0,end)
+            if pos < 0:
+                return -1
+            # Check that the key is a complete item name
+            i = pos - 1
+            while i >= 0 and attribute_data[i] in ' \t':
+                i -= 1
+            if i < 0 or attribute_data[i] == ';':
+                j = pos + len(key)
+                if j == len(attribute_data) or attribute_data[j] in ' \t;':
+                    return pos
+            end = pos + len(key) - 1
     def __getitem__(self,name):
         try:
             return self.__attributes[name]
@@ -120,6 +228,12 @@ class GTFAttributes:
         return self[name] is not None
     def __iter__(self):
         return iter(self.__attributes.keys())
+    def modified(self):
+        """Check whether the attributes have changed since they were read
+
+        GTFAttributes are read-only, so this always returns False.
+        """
+        return False
 
 class GTFFile(GFFFile.GFFFile):
     """Class for handling GTF files in-memory
@@ -137,10 +251,16 @@ class GTFFile(GFFFile.GFFFile):
 
     """
     def __init__(self,gtf_file,fp=None,**args):
-        args['gffdataline'] = GTFDataLine
+        args.setdefault('gffdataline',GTFDataLine)
         GFFFile.GFFFile.__init__(self,gtf_file,fp=fp,format='gtf',**args)
 
 class GTFIterator(GFFFile.GFFIterator):
     def __init__(self,gtf_file=None,fp=None,**args):
-        args['gffdataline'] = GTFDataLine
+        if args.get('mapped'):
+            args.setdefault('gffdataline',MappedGTFDataLine)
+        elif args.get('columns') is not None or \
+             args.get('attributes') is not None:
+            args.setdefault('gffdataline',CompactGTFDataLine)
+        else:
+            args.setdefault('gffdataline',GTFDataLine)
         GFFFile.GFFIterator.__init__(self,gff_file=gtf_file,fp=fp,**args)
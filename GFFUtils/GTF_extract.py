@@ -30,6 +30,7 @@ import sys
 import optparse
 import GFFFile
 import GTFFile
+import GFFColumns
 
 # Main program
 #
@@ -78,6 +79,23 @@ def main():
             else:
                 field_list.append(field)
 
+    # Only extract the columns and attributes that are needed
+    if field_list is None:
+        iterator_args = {}
+    else:
+        columns = [field for field in field_list
+                   if field in GFFFile.GFF_COLUMNS]
+        if feature_type is not None:
+            columns.append('feature')
+        attributes = [field for field in field_list
+                      if field not in GFFFile.GFF_COLUMNS]
+        iterator_args = dict(columns=columns,
+                             attributes=attributes if attributes else None)
+
+    # Select feature type before lines are parsed
+    if feature_type is not None:
+        iterator_args['features'] = feature_type
+
     # Input file type
     if opts.is_gff:
         file_iterator =  GFFFile.GFFIterator
@@ -93,8 +111,9 @@ def main():
     # Null character (used when values are empty)
     null = '.'
 
-    # Iterate through the file line-by-line
-    for line in file_iterator(args[0]):
+    # Iterate through the file line-by-line (scanning the
+    # memory-mapped file so only the requested columns are copied)
+    for line in file_iterator(args[0],mapped=True,**iterator_args):
         this_gene = None
         start = 0
         stop = 0
@@ -111,8 +130,11 @@ def main():
                     out_line = []
                     for field in field_list:
                         try:
-                            # Assume standard field
-                            out_line.append(str(line[field]))
+                            # Assume standard field (converted as by
+                            # the full record classes, so that e.g.
+                            # a score of '1.000' is output as '1.0')
+                            out_line.append(
+                                str(GFFColumns.convert_value(line[field])))
                         except KeyError:
                             # Not standard, try as an attribute name
                             try:
@@ -28,9 +28,9 @@ def main():
 		print('[ERROR]: {} dont exist'.format(args.input) )
 		raise Exception
 
-	for line in GTFFile.GTFIterator(args.input):
-		attributes = line['attributes']
+	for line in GTFFile.GTFIterator(args.input, mapped=True):
 		if line.type == GFFFile.ANNOTATION:
+			attributes = line['attributes']
 			print('{}\t{}'.format(attributes['transcript_id'], attributes['gene_name'] ) )
 
 if __name__ == "__main__":
@@ -24,12 +24,12 @@ def main():
     opts,args = p.parse_args()
     if len(args) != 1:
         p.error("Expected single argument (GTF file)")
-    for line in GTFFile.GTFIterator(args[0]):
+    for line in GTFFile.GTFIterator(args[0],features='gene'):
         this_gene = None
         start = 0
         stop = 0
-        attributes = line['attributes']
         if line.type == GFFFile.ANNOTATION:
+            attributes = line['attributes']
             if line['feature'] == 'gene':
                 # Encountered gene feature
                 if this_gene != attributes['gene_name']:
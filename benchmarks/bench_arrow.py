@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+#
+#     bench_arrow.py: compare loading a GTF from Parquet/Arrow with parsing
+#
+########################################################################
+
+"""bench_arrow
+
+Compare the time taken to load a GTF file into a GTFFile by parsing
+the text, with the time taken to load the same data from a Parquet
+file and from an Arrow IPC file (see the GFFArrow module).
+
+For the Parquet and IPC files the time taken to read the columns
+(into a GFFColumns instance) and the time taken to create the
+records from the columns are reported separately, along with the
+time that it would take to create the records by reassembling and
+reparsing the text of each line instead.
+
+The input file is replicated REPEATS times into a temporary file to
+give a more realistically sized input.
+
+Usage:
+
+    python bench_arrow.py [FILE.gtf] [REPEATS]
+
+(defaults to examples/data/mm10.gtf replicated 1000 times)
+
+Requires NumPy and pyarrow.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import pyarrow.parquet
+from GFFUtils import GFFArrow
+from GFFUtils.GFFFile import ANNOTATION
+from GFFUtils.GTFFile import GTFFile,GTFDataLine
+
+def timed(f,*args,**kws):
+    """Return (time in seconds,return value) for f(*args,**kws)
+    """
+    t0 = time.time()
+    value = f(*args,**kws)
+    return (time.time() - t0,value)
+
+def reparse(cols):
+    """Create records by reassembling and reparsing each line
+    """
+    return [GTFDataLine(line=line,lineno=lineno,gff_line_type=ANNOTATION)
+            for line,lineno in zip(cols.to_lines(),cols.lineno.tolist())]
+
+def read_ipc_columns(filen):
+    """Read the columns from an Arrow IPC file into a GFFColumns
+    """
+    source = pyarrow.memory_map(filen,'r')
+    try:
+        return GFFArrow.from_arrow(pyarrow.ipc.open_file(source).read_all())
+    finally:
+        source.close()
+
+def read_parquet_columns(filen):
+    """Read the columns from a Parquet file into a GFFColumns
+    """
+    return GFFArrow.from_arrow(
+        pyarrow.parquet.read_table(filen,
+                                   columns=list(GFFArrow.ARROW_COLUMNS)))
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        filen = sys.argv[1]
+    else:
+        filen = os.path.join(os.path.dirname(__file__),'..','examples',
+                             'data','mm10.gtf')
+    if len(sys.argv) > 2:
+        repeats = int(sys.argv[2])
+    else:
+        repeats = 1000
+    # Make the test files
+    data = open(filen,'rU').read()
+    wd = tempfile.mkdtemp()
+    test_file = os.path.join(wd,'test'+os.path.splitext(filen)[1])
+    fp = open(test_file,'w')
+    for i in xrange(repeats):
+        fp.write(data)
+    fp.close()
+    size = os.path.getsize(test_file)/1024.0/1024.0
+    print "%s x %d (%.1f Mb)" % (filen,repeats,size)
+    try:
+        t_parse,gtf = timed(GTFFile,test_file)
+        parquet_file = os.path.join(wd,'test.parquet')
+        ipc_file = os.path.join(wd,'test.arrow')
+        gtf.to_parquet(parquet_file)
+        gtf.to_arrow_ipc(ipc_file)
+        print "%-10s\t%10s\t%10s\t%12s\t%10s\t%10s" % ('source','read (s)',
+                                                      'records (s)',
+                                                      'reparse (s)',
+                                                      'total (s)',
+                                                      'speed-up')
+        print "%-10s\t%10s\t%10s\t%12s\t%10.2f\t%10.1f" % ('text','-','-','-',
+                                                          t_parse,1.0)
+        for name,read_columns in (('parquet',read_parquet_columns),
+                                  ('ipc',read_ipc_columns)):
+            t_read,cols = timed(read_columns,
+                                parquet_file if name == 'parquet'
+                                else ipc_file)
+            t_records,records = timed(cols.to_records,
+                                      gffdataline=GTFDataLine)
+            t_reparse,reparsed = timed(reparse,cols)
+            assert len(records) == len(reparsed) == len(gtf)
+            print "%-10s\t%10.2f\t%10.2f\t%12.2f\t%10.2f\t%10.1f" % \
+                (name,t_read,t_records,t_reparse,t_read+t_records,
+                 t_parse/(t_read+t_records))
+    finally:
+        shutil.rmtree(wd)
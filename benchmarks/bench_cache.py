@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+#
+#     bench_cache.py: compare loading a GTF from the cache with parsing
+#
+########################################################################
+
+"""bench_cache
+
+Compare the time taken to load a GTF file into a GTFFile by parsing
+it, with the time taken to load it from a snapshot in a GFFCache
+(the 'cache_dir' argument of GTFFile), for the default and compact
+record classes.
+
+The time for the first load with the cache (which parses the file
+and then writes the snapshot) is also reported. A cache hit should
+be faster than parsing for both record classes.
+
+The input file is replicated REPEATS times into a temporary file to
+give a more realistically sized input.
+
+Usage:
+
+    python bench_cache.py [FILE.gtf] [REPEATS]
+
+(defaults to examples/data/mm10.gtf replicated 1000 times)
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+from GFFUtils.GTFFile import GTFFile,GTFDataLine,CompactGTFDataLine
+
+def timed_load(filen,**args):
+    """Return (time in seconds,number of records) to load a GTFFile
+    """
+    t0 = time.time()
+    gtf = GTFFile(filen,**args)
+    return (time.time() - t0,len(gtf))
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        filen = sys.argv[1]
+    else:
+        filen = os.path.join(os.path.dirname(__file__),'..','examples',
+                             'data','mm10.gtf')
+    if len(sys.argv) > 2:
+        repeats = int(sys.argv[2])
+    else:
+        repeats = 1000
+    # Make the test file
+    data = open(filen,'rU').read()
+    wd = tempfile.mkdtemp()
+    test_file = os.path.join(wd,'test'+os.path.splitext(filen)[1])
+    fp = open(test_file,'w')
+    for i in xrange(repeats):
+        fp.write(data)
+    fp.close()
+    size = os.path.getsize(test_file)/1024.0/1024.0
+    print "%s x %d (%.1f Mb)" % (filen,repeats,size)
+    try:
+        print "%-12s\t%10s\t%10s\t%10s\t%8s" % ('reader','parse (s)',
+                                               'store (s)','hit (s)',
+                                               'speed-up')
+        for reader,gffdataline in (('default',GTFDataLine),
+                                   ('compact',CompactGTFDataLine)):
+            cache_dir = os.path.join(wd,'cache_%s' % reader)
+            t_parse,n = timed_load(test_file,gffdataline=gffdataline)
+            t_store,n_store = timed_load(test_file,gffdataline=gffdataline,
+                                         cache_dir=cache_dir)
+            t_hit,n_hit = timed_load(test_file,gffdataline=gffdataline,
+                                     cache_dir=cache_dir)
+            assert n == n_store == n_hit
+            print "%-12s\t%10.2f\t%10.2f\t%10.2f\t%8.1f" % \
+                (reader,t_parse,t_store,t_hit,t_parse/t_hit)
+    finally:
+        shutil.rmtree(wd)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+#
+#     bench_gffcleaner.py: benchmark scaling of the GFFcleaner operations
+#
+########################################################################
+
+"""bench_gffcleaner
+
+Time the GFFcleaner duplicate resolution and missing gene insertion
+operations on synthetic GFF data of increasing size, to check that
+the time per record stays roughly constant (i.e. the operations
+scale linearly with the number of records).
+
+The synthetic data has one CDS record per gene spread over 16
+chromosomes, with 1% of the SGD names duplicated. The mapping file
+has a gene for most of the duplicated SGDs (so that they can be
+resolved) plus 1% additional genes which are missing from the GFF
+data. The operations timed are:
+
+ * duplicates: GFFGetDuplicateSGDs
+ * resolve: GFFResolveDuplicateSGDs
+ * unresolved: collect the records for the unresolved SGDs (as
+   for the --discard-unresolved option)
+ * insert: GFFInsertMissingGenes
+
+Usage:
+
+    python bench_gffcleaner.py [NRECORDS [NRECORDS ...]]
+
+(defaults to 10000 100000 1000000)
+"""
+
+import sys
+import time
+import cStringIO
+from GFFUtils.GFFFile import GFFFile,GFFAttributeIndex
+from GFFUtils.GFFcleaner import GFFGetDuplicateSGDs
+from GFFUtils.GFFcleaner import GFFResolveDuplicateSGDs
+from GFFUtils.GFFcleaner import GFFInsertMissingGenes
+from bcftbx.TabFile import TabFile
+
+NCHROMS = 16
+OVERLAP_MARGIN = 100
+
+def make_data(nrecords):
+    """Return (gff,mapping) text for synthetic data
+    """
+    gff = []
+    mapping = []
+    block = nrecords//NCHROMS + 1
+    for i in xrange(nrecords):
+        chrom = "chr%02d" % (i//block + 1)
+        start = (i % block)*1000 + 1
+        end = start + 500
+        if i % 100 == 1:
+            # Duplicate the SGD name of the previous record
+            name = "YG%07d" % (i-1)
+            if i % 200 == 1:
+                # Add mapping gene to resolve the duplicate
+                mapping.append("%s\t%s\t%d\t%d\t+" % (name,chrom,
+                                                      start-1000,end-1000))
+        else:
+            name = "YG%07d" % i
+        gff.append("%s\tTest\tCDS\t%d\t%d\t0\t+\t0\tID=CDS:%s:1;SGD=%s" %
+                   (chrom,start,end,name,name))
+        if i % 100 == 50:
+            # Add a missing gene
+            mapping.append("YM%07d\t%s\t%d\t%d\t+" % (i,chrom,start+600,
+                                                      start+700))
+    return ('\n'.join(gff)+'\n','\n'.join(mapping)+'\n')
+
+def timed(f,*args):
+    """Return (time in seconds,return value) for f(*args)
+    """
+    t0 = time.time()
+    value = f(*args)
+    return (time.time() - t0,value)
+
+def get_unresolved(gff_data,result):
+    """Return the records for the unresolved SGDs in file order
+    """
+    all_unresolved = set(result['unresolved_sgds'])
+    sgd_index = GFFAttributeIndex('SGD',gff_data)
+    unresolved = []
+    for sgd in all_unresolved:
+        unresolved.extend(sgd_index.find(sgd))
+    unresolved.sort(key=lambda data: data.lineno())
+    return unresolved
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sizes = [int(x) for x in sys.argv[1:]]
+    else:
+        sizes = [10000,100000,1000000]
+    ops = ('duplicates','resolve','unresolved','insert')
+    print "%10s\t%s\t%12s" % ('records',
+                              '\t'.join(["%12s" % ("%s (s)" % op)
+                                         for op in ops]),
+                              'us/record')
+    for nrecords in sizes:
+        gff_text,mapping_text = make_data(nrecords)
+        gff_data = GFFFile('bench.gff',cStringIO.StringIO(gff_text))
+        mapping = TabFile('mapping.txt',cStringIO.StringIO(mapping_text),
+                          column_names=('name','chr','start','end','strand'))
+        times = []
+        t,duplicates = timed(GFFGetDuplicateSGDs,gff_data)
+        times.append(t)
+        t,result = timed(GFFResolveDuplicateSGDs,gff_data,mapping,
+                         duplicates,OVERLAP_MARGIN)
+        times.append(t)
+        t,unresolved = timed(get_unresolved,gff_data,result)
+        times.append(t)
+        n = len(gff_data)
+        t,gff_data = timed(GFFInsertMissingGenes,gff_data,mapping)
+        times.append(t)
+        assert len(gff_data) - n == (nrecords+49)//100
+        print "%10d\t%s\t%12.2f" % (nrecords,
+                                    '\t'.join(["%12.4f" % t for t in times]),
+                                    sum(times)/nrecords*1e6)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+#
+#     bench_iterator.py: measure GFFIterator throughput
+#
+########################################################################
+
+"""bench_iterator
+
+Measure the throughput of GFFIterator for a range of block sizes,
+compared with the original approach of reading one line at a time
+using readline().
+
+The input file is replicated REPEATS times into a temporary file to
+give a more realistically sized input.
+
+Usage:
+
+    python bench_iterator.py [FILE.gff|FILE.gtf] [REPEATS]
+
+(defaults to examples/data/mm10.gtf replicated 2000 times)
+"""
+
+import os
+import sys
+import time
+import tempfile
+from GFFUtils.GFFFile import GFFIterator,CompactGFFDataLine,PRAGMA,COMMENT,ANNOTATION
+
+def readline_iterator(filen,gffdataline):
+    """Original readline-based iteration (for comparison)
+    """
+    fp = open(filen,'rU')
+    lineno = 0
+    while True:
+        line = fp.readline()
+        lineno += 1
+        if line == '':
+            break
+        if line.startswith("##"):
+            type_ = PRAGMA
+        elif line.startswith("#"):
+            type_ = COMMENT
+        else:
+            type_ = ANNOTATION
+        yield gffdataline(line=line,lineno=lineno,gff_line_type=type_)
+    fp.close()
+
+def timed(iterator):
+    """Return number of records and time taken to exhaust iterator
+    """
+    t0 = time.time()
+    nrecords = 0
+    for record in iterator:
+        nrecords += 1
+    return (nrecords,time.time() - t0)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        filen = sys.argv[1]
+    else:
+        filen = os.path.join(os.path.dirname(__file__),'..','examples',
+                             'data','mm10.gtf')
+    if len(sys.argv) > 2:
+        repeats = int(sys.argv[2])
+    else:
+        repeats = 2000
+    # Make the test file
+    data = open(filen,'rU').read()
+    fd,test_file = tempfile.mkstemp(suffix=os.path.splitext(filen)[1])
+    fp = os.fdopen(fd,'w')
+    for i in xrange(repeats):
+        fp.write(data)
+    fp.close()
+    size = os.path.getsize(test_file)/1024.0/1024.0
+    print "%s x %d (%.1f Mb)" % (filen,repeats,size)
+    try:
+        print "%-12s\t%10s\t%10s\t%12s" % ('reader','records','time (s)','Mb/s')
+        nrecords,t = timed(readline_iterator(test_file,CompactGFFDataLine))
+        print "%-12s\t%10d\t%10.2f\t%12.1f" % ('readline',nrecords,t,size/t)
+        for buffer_size in (64*1024,1024*1024,4*1024*1024,16*1024*1024):
+            nrecords,t = timed(GFFIterator(test_file,
+                                           gffdataline=CompactGFFDataLine,
+                                           buffer_size=buffer_size))
+            print "%-12s\t%10d\t%10.2f\t%12.1f" % ("%dk" % (buffer_size/1024),
+                                                   nrecords,t,size/t)
+    finally:
+        os.remove(test_file)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+#
+#     bench_ordered_dictionary.py: benchmark OrderedDictionary operations
+#
+########################################################################
+
+"""bench_ordered_dictionary
+
+Compare the hash-backed GFFFile.OrderedDictionary against the original
+list-backed implementation, using the access pattern of an htseq-count
+file with 60,000 features:
+
+ * build: add each feature ID and its count (as HTSeqCountFile does)
+ * lookup: fetch the count for every feature ID
+ * contains: membership test for every feature ID
+ * delete: remove every other key (as GFFGetDuplicateSGDs does when
+   filtering out non-duplicates)
+ * keys: fetch the ordered list of keys 100 times
+
+Usage:
+
+    python bench_ordered_dictionary.py [NKEYS]
+"""
+
+import sys
+import time
+from GFFUtils.GFFFile import OrderedDictionary
+
+class ListOrderedDictionary:
+    """Original list-backed OrderedDictionary (for comparison)
+    """
+    def __init__(self):
+        self.__keys = []
+        self.__dict = {}
+    def __getitem__(self,key):
+        if key not in self.__keys:
+            raise KeyError
+        return self.__dict[key]
+    def __setitem__(self,key,value):
+        if key not in self.__keys:
+            self.__keys.append(key)
+        self.__dict[key] = value
+    def __delitem__(self,key):
+        try:
+            i = self.__keys.index(key)
+            del(self.__keys[i])
+            del(self.__dict[key])
+        except ValueError:
+            raise KeyError
+    def __len__(self):
+        return len(self.__keys)
+    def __contains__(self,key):
+        return key in self.__keys
+    def __iter__(self):
+        return iter(self.__keys)
+    def keys(self):
+        return list(self.__keys)
+
+def timed(f,*args):
+    """Return the time in seconds taken to run f(*args)
+    """
+    t0 = time.time()
+    f(*args)
+    return time.time() - t0
+
+def build(d,keys):
+    for i,key in enumerate(keys):
+        d[key] = str(i)
+
+def lookup(d,keys):
+    for key in keys:
+        d[key]
+
+def contains(d,keys):
+    for key in keys:
+        key in d
+
+def delete(d,keys):
+    for key in keys[::2]:
+        del(d[key])
+
+def get_keys(d,keys):
+    for i in xrange(100):
+        d.keys()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        nkeys = int(sys.argv[1])
+    else:
+        nkeys = 60000
+    keys = ["DDB_G%07d" % i for i in xrange(nkeys)]
+    print "%d keys" % nkeys
+    print "%-10s\t%12s\t%12s\t%8s" % ('operation','list (s)','hash (s)','speed-up')
+    dicts = (ListOrderedDictionary(),OrderedDictionary())
+    for name,op in (('build',build),
+                    ('lookup',lookup),
+                    ('contains',contains),
+                    ('delete',delete),
+                    ('keys',get_keys)):
+        t_list,t_hash = [timed(op,d,keys) for d in dicts]
+        print "%-10s\t%12.4f\t%12.4f\t%7.1fx" % (name,t_list,t_hash,
+                                                 t_list/max(t_hash,1e-6))
+    assert dicts[0].keys() == dicts[1].keys()
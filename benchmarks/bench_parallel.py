@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+#
+#     bench_parallel.py: compare serial and parallel parsing of a GTF
+#
+########################################################################
+
+"""bench_parallel
+
+Compare the time taken to iterate over all the records of a GTF file
+using a single process, and using a pool of worker processes (the
+'processes' argument of GFFIterator), for the default and compact
+record classes.
+
+The time spent in the main process turning the workers' results back
+into records is also reported, since this part isn't parallelised
+and so limits the speed-up which can be obtained.
+
+The input file is replicated REPEATS times into a temporary file to
+give a more realistically sized input.
+
+Usage:
+
+    python bench_parallel.py [FILE.gtf] [REPEATS] [PROCESSES]
+
+(defaults to examples/data/mm10.gtf replicated 2000 times, and the
+number of CPUs)
+"""
+
+import os
+import sys
+import time
+import marshal
+import tempfile
+import multiprocessing
+from GFFUtils.GFFFile import split_file,_parse_shard,ANNOTATION
+from GFFUtils.GTFFile import GTFIterator,GTFDataLine,CompactGTFDataLine
+
+def timed_iteration(filen,**args):
+    """Return time taken to iterate over all the records
+    """
+    t0 = time.time()
+    for record in GTFIterator(filen,**args):
+        pass
+    return time.time() - t0
+
+def timed_merge(filen,gffdataline,processes):
+    """Return time taken to convert worker results into records
+
+    The shards are parsed up front (in this process) and only the
+    conversion of the results into records is timed.
+    """
+    results = [_parse_shard((filen,start,end,gffdataline,None,None))
+               for start,end in split_file(filen,processes)]
+    t0 = time.time()
+    for nlines,data in results:
+        for type_,lineno,item in marshal.loads(data):
+            if type_ != ANNOTATION:
+                gffdataline(line=item,lineno=lineno,gff_line_type=type_)
+            else:
+                gffdataline._from_fields(item,lineno=lineno,
+                                         gff_line_type=type_)
+    return time.time() - t0
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        filen = sys.argv[1]
+    else:
+        filen = os.path.join(os.path.dirname(__file__),'..','examples',
+                             'data','mm10.gtf')
+    if len(sys.argv) > 2:
+        repeats = int(sys.argv[2])
+    else:
+        repeats = 2000
+    if len(sys.argv) > 3:
+        processes = int(sys.argv[3])
+    else:
+        processes = multiprocessing.cpu_count()
+    # Make the test file
+    data = open(filen,'rU').read()
+    fd,test_file = tempfile.mkstemp(suffix=os.path.splitext(filen)[1])
+    fp = os.fdopen(fd,'w')
+    for i in xrange(repeats):
+        fp.write(data)
+    fp.close()
+    size = os.path.getsize(test_file)/1024.0/1024.0
+    print "%s x %d (%.1f Mb), %d processes" % (filen,repeats,size,processes)
+    try:
+        print "%-12s\t%10s\t%12s\t%10s\t%8s" % ('reader','serial (s)',
+                                               'parallel (s)','merge (s)',
+                                               'speed-up')
+        for reader,gffdataline in (('default',GTFDataLine),
+                                   ('compact',CompactGTFDataLine)):
+            t_serial = timed_iteration(test_file,gffdataline=gffdataline)
+            t_parallel = timed_iteration(test_file,gffdataline=gffdataline,
+                                         processes=processes)
+            t_merge = timed_merge(test_file,gffdataline,processes)
+            print "%-12s\t%10.2f\t%12.2f\t%10.2f\t%8.1f" % \
+                (reader,t_serial,t_parallel,t_merge,t_serial/t_parallel)
+    finally:
+        os.remove(test_file)
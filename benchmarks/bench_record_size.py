@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+#
+#     bench_record_size.py: measure memory used per GFF/GTF record
+#
+########################################################################
+
+"""bench_record_size
+
+Report the average number of bytes used per annotation record when
+a GFF or GTF file is loaded using each of the data line classes
+(the standard GFFDataLine/GTFDataLine and the CompactGFFDataLine/
+CompactGTFDataLine alternatives).
+
+Sizes are measured by recursively summing sys.getsizeof for every
+object reachable from each record (objects shared between records,
+such as interned strings, are only counted once). Sizes are measured
+both with the attributes left unparsed and after they have been
+accessed.
+
+Usage:
+
+    python bench_record_size.py [FILE.gff|FILE.gtf]
+
+(defaults to examples/data/mm10_gencode_vM5.gtf)
+"""
+
+import os
+import sys
+from GFFUtils.GFFFile import GFFIterator,GFFDataLine,CompactGFFDataLine,ANNOTATION
+from GFFUtils.GTFFile import GTFDataLine,CompactGTFDataLine
+
+def deep_sizeof(obj,seen):
+    """Return total size of obj and objects reachable from it
+    """
+    if id(obj) in seen or isinstance(obj,type):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj,dict):
+        for key,value in obj.iteritems():
+            size += deep_sizeof(key,seen) + deep_sizeof(value,seen)
+    elif isinstance(obj,(list,tuple,set,frozenset)):
+        for item in obj:
+            size += deep_sizeof(item,seen)
+    if hasattr(obj,'__dict__'):
+        size += deep_sizeof(obj.__dict__,seen)
+    for cls in type(obj).__mro__:
+        for name in getattr(cls,'__slots__',()):
+            if hasattr(obj,name):
+                size += deep_sizeof(getattr(obj,name),seen)
+    return size
+
+def bytes_per_record(filen,gffdataline,parse_attributes=False):
+    """Return mean size in bytes of annotation records from filen
+    """
+    records = [line for line in GFFIterator(filen,gffdataline=gffdataline)
+               if line.type == ANNOTATION]
+    if parse_attributes:
+        for record in records:
+            record['attributes']
+    seen = set()
+    total = sum([deep_sizeof(record,seen) for record in records])
+    return float(total)/len(records)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        filen = sys.argv[1]
+    else:
+        filen = os.path.join(os.path.dirname(__file__),'..','examples',
+                             'data','mm10_gencode_vM5.gtf')
+    if filen.endswith('.gtf'):
+        classes = (GTFDataLine,CompactGTFDataLine)
+    else:
+        classes = (GFFDataLine,CompactGFFDataLine)
+    print "%s" % filen
+    print "%-20s\t%12s\t%12s" % ('class','unparsed','parsed')
+    for gffdataline in classes:
+        print "%-20s\t%12.1f\t%12.1f" % (gffdataline.__name__,
+                                         bytes_per_record(filen,gffdataline),
+                                         bytes_per_record(filen,gffdataline,
+                                                          parse_attributes=True))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+#
+#     bench_scanner.py: compare GFFIterator with the mapped scanner
+#
+########################################################################
+
+"""bench_scanner
+
+Compare the time taken to extract a few columns from each record
+using the default GFFIterator and the memory-mapped scanner mode
+(mapped=True), mimicking 'GTF_extract --fields=chrom,start,end'
+and 'enst2symbol'.
+
+The input file is replicated REPEATS times into a temporary file to
+give a more realistically sized input.
+
+Usage:
+
+    python bench_scanner.py [FILE.gtf] [REPEATS]
+
+(defaults to examples/data/mm10.gtf replicated 2000 times)
+"""
+
+import os
+import sys
+import time
+import tempfile
+from GFFUtils.GFFFile import ANNOTATION,CompactGFFDataLine
+from GFFUtils.GTFFile import GTFIterator,CompactGTFDataLine
+
+def extract_columns(iterator):
+    """Extract seqname, start and end from each annotation record
+    """
+    for record in iterator:
+        if record.type == ANNOTATION:
+            (record['seqname'],record['start'],record['end'])
+
+def extract_attributes(iterator):
+    """Extract transcript_id and gene_name from each annotation record
+    """
+    for record in iterator:
+        if record.type == ANNOTATION:
+            attributes = record['attributes']
+            (attributes['transcript_id'],attributes['gene_name'])
+
+def timed(func,iterator):
+    """Return time taken to run func over iterator
+    """
+    t0 = time.time()
+    func(iterator)
+    return time.time() - t0
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        filen = sys.argv[1]
+    else:
+        filen = os.path.join(os.path.dirname(__file__),'..','examples',
+                             'data','mm10.gtf')
+    if len(sys.argv) > 2:
+        repeats = int(sys.argv[2])
+    else:
+        repeats = 2000
+    # Make the test file
+    data = open(filen,'rU').read()
+    fd,test_file = tempfile.mkstemp(suffix=os.path.splitext(filen)[1])
+    fp = os.fdopen(fd,'w')
+    for i in xrange(repeats):
+        fp.write(data)
+    fp.close()
+    size = os.path.getsize(test_file)/1024.0/1024.0
+    print "%s x %d (%.1f Mb)" % (filen,repeats,size)
+    try:
+        print "%-12s\t%-12s\t%10s\t%12s" % ('task','reader','time (s)','Mb/s')
+        for name,func in (('columns',extract_columns),
+                          ('attributes',extract_attributes)):
+            for reader,args in (('default',{}),
+                                ('compact',dict(gffdataline=CompactGTFDataLine)),
+                                ('mapped',dict(mapped=True))):
+                t = timed(func,GTFIterator(test_file,**args))
+                print "%-12s\t%-12s\t%10.2f\t%12.1f" % (name,reader,t,size/t)
+    finally:
+        os.remove(test_file)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+import unittest
+import tempfile
+import shutil
+import os
+import gzip
+import struct
+import zlib
+from GFFUtils.CompressedFile import *
+from GFFUtils.GFFFile import GFFIterator,GFFFile,ANNOTATION
+
+# Example GFF data
+gff_data = """##gff-version 3
+# generated: Wed Feb 21 12:01:58 2012
+DDB0123458	Sequencing Center	chromosome	1	4923596	.	+	.	ID=DDB0232428;Name=1
+DDB0232428	.	gene	1890	3287	.	+	.	ID=DDB_G0267178;Name=DDB_G0267178_RTE
+DDB0232428	Sequencing Center	mRNA	1890	3287	.	+	.	ID=DDB0216437;Parent=DDB_G0267178
+DDB0232428	Sequencing Center	exon	1890	3287	.	+	.	Parent=DDB0216437
+DDB0232428	Sequencing Center	CDS	1890	3287	.	+	.	Parent=DDB0216437
+"""
+
+def make_bgzf(data,block_size=64):
+    """Return data compressed as BGZF using small blocks
+    """
+    blocks = []
+    for i in range(0,len(data),block_size) + [len(data)]:
+        chunk = data[i:i+block_size]
+        c = zlib.compressobj(6,zlib.DEFLATED,-15)
+        cdata = c.compress(chunk) + c.flush()
+        blocks.append("\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00" +
+                      struct.pack('<H',len(cdata)+25) + cdata +
+                      struct.pack('<iI',zlib.crc32(chunk),len(chunk)))
+    return ''.join(blocks)
+
+class TestCompressedFile(unittest.TestCase):
+    """Tests for reading compressed files
+    """
+
+    def setUp(self):
+        # Create working directory and test files
+        self.wd = tempfile.mkdtemp()
+        self.plain = os.path.join(self.wd,'test.gff')
+        open(self.plain,'w').write(gff_data)
+        self.gzipped = os.path.join(self.wd,'test.gff.gz')
+        fp = gzip.open(self.gzipped,'wb')
+        fp.write(gff_data)
+        fp.close()
+        self.bgzipped = os.path.join(self.wd,'test.gff.bgz')
+        open(self.bgzipped,'wb').write(make_bgzf(gff_data))
+
+    def tearDown(self):
+        shutil.rmtree(self.wd)
+
+    def test_detect_compression(self):
+        """Compression type is detected from magic bytes
+        """
+        self.assertEqual(detect_compression(self.plain),None)
+        self.assertEqual(detect_compression(self.gzipped),GZIP)
+        self.assertEqual(detect_compression(self.bgzipped),BGZF)
+
+    def test_open_file(self):
+        """Data can be read from plain and compressed files
+        """
+        for filen in (self.plain,self.gzipped,self.bgzipped):
+            fp = open_file(filen)
+            self.assertEqual(fp.read(),gff_data)
+            fp.close()
+
+    def test_bgzf_reader(self):
+        """BGZFReader returns data in the correct order
+        """
+        for threads in (1,4):
+            fp = BGZFReader(self.bgzipped,threads=threads)
+            data = []
+            while True:
+                chunk = fp.read(10)
+                if not chunk:
+                    break
+                data.append(chunk)
+            fp.close()
+            self.assertEqual(''.join(data),gff_data)
+
+    def test_gff_iterator_compressed_input(self):
+        """GFFIterator reads compressed files transparently
+        """
+        expected = [(line.lineno(),line.type,str(line))
+                    for line in GFFIterator(self.plain)]
+        for filen in (self.gzipped,self.bgzipped):
+            lines = [(line.lineno(),line.type,str(line))
+                     for line in GFFIterator(filen)]
+            self.assertEqual(lines,expected)
+
+    def test_gff_file_compressed_input(self):
+        """GFFFile reads compressed files transparently
+        """
+        gff = GFFFile(self.bgzipped)
+        self.assertEqual(gff.version,'3')
+        self.assertEqual(len(gff),5)
+        self.assertEqual(gff[2]['attributes']['ID'],'DDB0216437')
+
+    def test_bgzf_writer(self):
+        """BGZFWriter output can be read back by BGZFReader and gzip
+        """
+        data = ''.join([gff_data]*2000)
+        self.assertTrue(len(data) > 2*BGZF_BLOCK_SIZE)
+        for threads in (1,4):
+            bgzf = os.path.join(self.wd,'out.gff.gz')
+            fp = BGZFWriter(bgzf,threads=threads)
+            for i in xrange(0,len(data),1000):
+                fp.write(data[i:i+1000])
+            fp.close()
+            self.assertEqual(detect_compression(bgzf),BGZF)
+            self.assertTrue(open(bgzf,'rb').read().endswith(BGZF_EOF))
+            fp = BGZFReader(bgzf,threads=threads)
+            self.assertEqual(fp.read(),data)
+            fp.close()
+            self.assertEqual(gzip.open(bgzf,'rb').read(),data)
+
+    def test_open_output_file(self):
+        """Data can be written to plain and compressed files
+        """
+        outfile = os.path.join(self.wd,'out.gff')
+        for compression in (None,GZIP,BGZF):
+            fp = open_output_file(outfile,compression=compression)
+            fp.write(gff_data)
+            fp.close()
+            self.assertEqual(detect_compression(outfile),compression)
+            fp = open_file(outfile)
+            self.assertEqual(fp.read(),gff_data)
+            fp.close()
+        self.assertRaises(ValueError,open_output_file,outfile,ZSTD)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+import unittest
+import cStringIO
+import logging
+from GFFUtils.GFF3_Annotation_Extractor import GFFAnnotationLookup
+from GFFUtils.GFFFile import GFFFile
+
+# Example GFF data
+gff_data = """##gff-version 3
+chr1\tTest\tgene\t1000\t5000\t.\t+\t.\tID=G1;Name=gene1
+chr1\tTest\tmRNA\t1000\t5000\t.\t+\t.\tID=T1;Parent=G1
+chr1\tTest\tmRNA\t1000\t4000\t.\t+\t.\tID=T2;Parent=G1
+chr1\tTest\texon\t1000\t1500\t.\t+\t.\tParent=T1,T2
+chr1\tTest\tCDS\t1000\t1500\t.\t+\t0\tID=C1;Parent=T1,T2
+chr1\tTest\tgene\t8000\t9000\t.\t-\t.\tID=G2;Name=gene2
+chr1\tTest\tgene\t8000\t9500\t.\t-\t.\tID=G2;Name=gene2b
+"""
+
+class ListHandler(logging.Handler):
+    # Logging handler which stores the messages
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+    def emit(self,record):
+        self.messages.append(record.getMessage())
+
+class TestGFFAnnotationLookup(unittest.TestCase):
+    """Unit tests for the GFFAnnotationLookup class
+    """
+
+    def setUp(self):
+        self.handler = ListHandler()
+        logging.getLogger().addHandler(self.handler)
+        self.lookup = GFFAnnotationLookup(
+            GFFFile('test.gff',cStringIO.StringIO(gff_data)))
+
+    def tearDown(self):
+        logging.getLogger().removeHandler(self.handler)
+
+    def test_duplicate_ids_use_last_record(self):
+        """The last record with a duplicated ID is used
+        """
+        self.assertEqual(self.lookup.getDataFromID('G2').lineno(),8)
+        self.assertEqual(
+            self.lookup.getDataFromID('G2')['attributes']['Name'],'gene2b')
+        self.assertTrue("Identifier 'ID' is not unique: "
+                        "feature 'G2' already found" in self.handler.messages)
+
+    def test_multiple_parents_warning(self):
+        """Multiple parents are only reported for records with an ID
+        """
+        warnings = [m for m in self.handler.messages
+                    if m.startswith("Multiple parents")]
+        self.assertEqual(warnings,["Multiple parents found on line 6: T1,T2"])
+        self.assertEqual(self.lookup.getParentID('C1'),'T1,T2')
+        self.assertEqual(self.lookup.getAncestorGene('C1').lineno(),2)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+import unittest
+import cStringIO
+import tempfile
+import shutil
+import os
+from GFFUtils.GFFArrow import *
+from GFFUtils.GFFFile import GFFFile
+from GFFUtils.GTFFile import GTFFile
+
+# Example GFF data
+gff_data = """##gff-version 3
+chr2\tTest\tgene\t5000\t6000\t.\t-\t.\tID=G3
+chr1\tTest\tgene\t1890\t3287\t0.5\t+\t.\tID=G1
+chr1\tTest\texon\t1890\t2000\tAnc_1\t+\t0\tParent=G1
+chr1\tOther\tgene\t100\t900\t0\t-\t.\tID=G2
+chr1\tTest\texon\t2500\t3287\t.\t+\t2\tParent=G1
+"""
+
+# Example GTF data
+gtf_data = """chr1\tTest\texon\t100\t200\t.\t+\t.\tgene_id "G1"; transcript_id "T1";
+chr1\tTest\texon\t300\t400\t.\t+\t.\tgene_id "G1"; transcript_id "T1";
+chr2\tTest\texon\t500\t600\t.\t-\t.\tgene_id "G2";
+"""
+
+@unittest.skipIf(pyarrow is None,"pyarrow not available")
+class TestGFFArrow(unittest.TestCase):
+    """Unit tests for the Arrow/Parquet conversion functions
+    """
+
+    def setUp(self):
+        self.wd = tempfile.mkdtemp()
+        self.gff = GFFFile('test.gff',cStringIO.StringIO(gff_data))
+
+    def tearDown(self):
+        shutil.rmtree(self.wd)
+
+    def test_to_arrow(self):
+        """GFF data is converted to a typed Arrow table
+        """
+        table = to_arrow(self.gff)
+        self.assertEqual(table.num_rows,5)
+        self.assertEqual(table.schema.names,list(ARROW_COLUMNS))
+        self.assertTrue(isinstance(table.schema.field('seqname').type,
+                                   pyarrow.DictionaryType))
+        self.assertEqual(table.schema.field('start').type,pyarrow.int64())
+        self.assertEqual(table.column('seqname').to_pylist(),
+                         ['chr2','chr1','chr1','chr1','chr1'])
+        self.assertEqual(table.column('score').to_pylist(),
+                         [None,0.5,None,0.0,None])
+        self.assertEqual(table.column('score_text').to_pylist(),
+                         [None,None,'Anc_1',None,None])
+        self.assertEqual(table.column('strand').to_pylist(),
+                         ['-','+','+','-','+'])
+        self.assertEqual(table.column('frame').to_pylist(),
+                         [None,None,0,None,2])
+        self.assertEqual(table.schema.metadata[VERSION_METADATA_KEY],'3')
+
+    def test_promote_attributes(self):
+        """Selected attributes can be stored in their own columns
+        """
+        gtf = GTFFile('test.gtf',cStringIO.StringIO(gtf_data))
+        table = to_arrow(gtf,attributes=('gene_id','transcript_id'))
+        self.assertEqual(table.column('attr_gene_id').to_pylist(),
+                         ['G1','G1','G2'])
+        self.assertEqual(table.column('attr_transcript_id').to_pylist(),
+                         ['T1','T1',None])
+
+    def test_parquet_round_trip(self):
+        """GFF data can be written to and read from Parquet
+        """
+        filen = os.path.join(self.wd,'test.parquet')
+        self.gff.to_parquet(filen,attributes=('ID',))
+        gff = GFFFile.from_parquet(filen)
+        self.assertTrue(isinstance(gff,GFFFile))
+        self.assertEqual(gff.version,'3')
+        self.assertEqual([str(r) for r in gff],[str(r) for r in self.gff])
+        self.assertEqual(gff[2]['score'],'Anc_1')
+        self.assertEqual(gff[1]['attributes']['ID'],'G1')
+
+    def test_ipc_round_trip(self):
+        """GTF data can be written to and read from Arrow IPC files
+        """
+        filen = os.path.join(self.wd,'test.arrow')
+        gtf = GTFFile('test.gtf',cStringIO.StringIO(gtf_data))
+        gtf.to_arrow_ipc(filen)
+        gtf2 = GTFFile.from_arrow_ipc(filen)
+        self.assertTrue(isinstance(gtf2,GTFFile))
+        self.assertEqual(gtf2.format,'gtf')
+        self.assertEqual([str(r) for r in gtf2],[str(r) for r in gtf])
+        self.assertEqual(gtf2[2]['attributes']['gene_id'],'G2')
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+import unittest
+import tempfile
+import shutil
+import os
+import time
+from GFFUtils.GFFCache import *
+from GFFUtils.GFFFile import GFFFile,GFFDataLine,CompactGFFDataLine
+from GFFUtils.GTFFile import GTFFile
+
+# Example GFF data
+gff_data = """##gff-version 3
+chr1\tTest\tgene\t1890\t3287\t.\t+\t.\tID=G1
+chr1\tTest\texon\t1890\t2000\t.\t+\t0\tParent=G1
+chr2\tTest\tgene\t5000\t6000\t.\t-\t.\tID=G2
+"""
+
+# Example GTF data
+gtf_data = """chr1\tTest\tgene\t100\t400\t.\t+\t.\tgene_id "G1";
+chr1\tTest\texon\t100\t200\t.\t+\t.\tgene_id "G1"; transcript_id "T1";
+"""
+
+class TestGFFCache(unittest.TestCase):
+    """Unit tests for the GFFCache class
+    """
+
+    def setUp(self):
+        self.wd = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.wd,'cache')
+        self.gff_file = os.path.join(self.wd,'test.gff')
+        open(self.gff_file,'w').write(gff_data)
+
+    def tearDown(self):
+        shutil.rmtree(self.wd)
+
+    def test_store_and_load(self):
+        """Data can be stored in and loaded from the cache
+        """
+        cache = GFFCache(self.cache_dir)
+        self.assertTrue(os.path.isdir(self.cache_dir))
+        key = cache.key(self.gff_file)
+        self.assertFalse(key in cache)
+        self.assertEqual(cache.load(key),None)
+        cache.store(key,{ 'records': [(1,'a'),(2,'b')] })
+        self.assertTrue(key in cache)
+        self.assertEqual(cache.load(key),{ 'records': [(1,'a'),(2,'b')] })
+
+    def test_key(self):
+        """Keys depend on the file and the options
+        """
+        cache = GFFCache(self.cache_dir)
+        key = cache.key(self.gff_file)
+        self.assertEqual(cache.key(self.gff_file),key)
+        self.assertNotEqual(cache.key(self.gff_file,options=('gtf',)),key)
+        self.assertNotEqual(cache.key(self.gff_file,hash_contents=True),key)
+        # Changing the file changes the key
+        open(self.gff_file,'a').write("chr3\tTest\tgene\t1\t2\t.\t+\t.\tID=G3\n")
+        self.assertNotEqual(cache.key(self.gff_file),key)
+
+    def test_key_uses_integer_mtime(self):
+        """Keys are unchanged when the modification time is reset
+        """
+        cache = GFFCache(self.cache_dir)
+        os.utime(self.gff_file,(1400000000,1400000000))
+        key = cache.key(self.gff_file)
+        self.assertEqual(mtime_ns(os.stat(self.gff_file)),1400000000*10**9)
+        os.utime(self.gff_file,(1400000001,1400000001))
+        self.assertNotEqual(cache.key(self.gff_file),key)
+        os.utime(self.gff_file,(1400000000,1400000000))
+        self.assertEqual(cache.key(self.gff_file),key)
+
+    def test_evict_least_recently_used(self):
+        """Least recently used entries are removed when cache is full
+        """
+        cache = GFFCache(self.cache_dir,max_size=2500)
+        data = 'x'*1000
+        cache.store('a',data)
+        cache.store('b',data)
+        # Make 'a' the oldest entry, then use it again
+        os.utime(cache.path('a'),(time.time()-100,time.time()-100))
+        os.utime(cache.path('b'),(time.time()-50,time.time()-50))
+        self.assertEqual(cache.load('a'),data)
+        cache.store('c',data)
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        self.assertTrue('c' in cache)
+        self.assertTrue(cache.size() <= 2500)
+        cache.clear()
+        self.assertEqual(cache.entries(),[])
+
+    def test_gff_file_uses_cache(self):
+        """GFFFile loads snapshot from the cache
+        """
+        mtime = 1400000000
+        os.utime(self.gff_file,(mtime,mtime))
+        gff = GFFFile(self.gff_file,cache_dir=self.cache_dir)
+        self.assertEqual(len(GFFCache(self.cache_dir).entries()),1)
+        # Change the data in the file without changing the size
+        # or modification time, so only the cache has the original
+        open(self.gff_file,'w').write(gff_data.replace('G2','G9'))
+        os.utime(self.gff_file,(mtime,mtime))
+        gff2 = GFFFile(self.gff_file,cache_dir=self.cache_dir)
+        self.assertEqual(gff2.version,'3')
+        self.assertEqual([str(r) for r in gff2],[str(r) for r in gff])
+        self.assertEqual([r.lineno() for r in gff2],[2,3,4])
+        self.assertEqual(gff2[2]['attributes']['ID'],'G2')
+        # Restored records are converted without reparsing
+        self.assertTrue(isinstance(gff2[0],GFFDataLine))
+        self.assertEqual(gff2[0]['start'],1890)
+        self.assertFalse(gff2[0].modified())
+        gff2[2]['attributes']['ID'] = 'G3'
+        self.assertEqual(str(gff2[2]),"chr2\tTest\tgene\t5000\t6000\t.\t-\t.\tID=G3")
+        # Hashing the contents detects the change
+        gff3 = GFFFile(self.gff_file,cache_dir=self.cache_dir,cache_hash=True)
+        self.assertEqual(gff3[2]['attributes']['ID'],'G9')
+
+    def test_compact_records_and_filters(self):
+        """Snapshots depend on record class and filters
+        """
+        gff = GFFFile(self.gff_file,cache_dir=self.cache_dir,
+                      gffdataline=CompactGFFDataLine,features='gene')
+        gff2 = GFFFile(self.gff_file,cache_dir=self.cache_dir,
+                       gffdataline=CompactGFFDataLine,features='gene')
+        self.assertEqual(len(GFFCache(self.cache_dir).entries()),1)
+        self.assertTrue(isinstance(gff2[0],CompactGFFDataLine))
+        self.assertEqual([str(r) for r in gff2],[str(r) for r in gff])
+        gff3 = GFFFile(self.gff_file,cache_dir=self.cache_dir)
+        self.assertEqual(len(gff3),3)
+        self.assertEqual(len(GFFCache(self.cache_dir).entries()),2)
+
+    def test_gtf_file_uses_cache(self):
+        """GTFFile loads snapshot from the cache
+        """
+        gtf_file = os.path.join(self.wd,'test.gtf')
+        open(gtf_file,'w').write(gtf_data)
+        gtf = GTFFile(gtf_file,cache_dir=self.cache_dir)
+        gtf2 = GTFFile(gtf_file,cache_dir=self.cache_dir)
+        self.assertEqual([str(r) for r in gtf2],[str(r) for r in gtf])
+        self.assertEqual(gtf2[1]['attributes']['transcript_id'],'T1')
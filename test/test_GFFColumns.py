@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+import unittest
+import cStringIO
+from GFFUtils.GFFColumns import *
+from GFFUtils.GFFFile import GFFFile,GFFDataLine,CompactGFFDataLine
+
+# Example GFF data
+gff_data = """##gff-version 3
+chr2\tTest\tgene\t5000\t6000\t.\t-\t.\tID=G3
+chr1\tTest\tgene\t1890\t3287\t0.5\t+\t.\tID=G1
+chr1\tTest\texon\t1890\t2000\tAnc_1\t+\t0\tParent=G1
+chr1\tOther\tgene\t100\t900\t0\t-\t.\tID=G2
+chr1\tTest\texon\t2500\t3287\t.\t+\t2\tParent=G1
+"""
+
+@unittest.skipIf(numpy is None,"NumPy not available")
+class TestGFFColumns(unittest.TestCase):
+    """Unit tests for the GFFColumns class
+    """
+
+    def setUp(self):
+        self.gff = GFFFile('test.gff',cStringIO.StringIO(gff_data))
+        self.cols = GFFColumns.from_gff(self.gff)
+
+    def test_columns(self):
+        """Columns are stored as typed arrays
+        """
+        cols = self.cols
+        self.assertEqual(len(cols),5)
+        self.assertEqual(cols.seqname.values(),['chr2','chr1','chr1','chr1','chr1'])
+        self.assertEqual(cols.seqname.categories,['chr2','chr1'])
+        self.assertEqual(cols.start.tolist(),[5000,1890,1890,100,2500])
+        self.assertEqual(cols.end.dtype,numpy.int64)
+        self.assertTrue(numpy.isnan(cols.score[0]))
+        self.assertEqual(cols.score[1],0.5)
+        self.assertEqual(cols.strand.tolist(),[-1,1,1,-1,1])
+        self.assertEqual(cols.frame.tolist(),[-1,-1,0,-1,2])
+        self.assertEqual(cols.lineno.tolist(),[2,3,4,5,6])
+        self.assertEqual(cols.lengths().tolist(),[1001,1398,111,801,788])
+        self.assertEqual(cols.version,'3')
+
+    def test_masks_and_filter(self):
+        """Records can be selected using masks
+        """
+        cols = self.cols
+        self.assertEqual(cols.mask_feature('gene').tolist(),
+                         [True,True,False,True,False])
+        self.assertEqual(cols.mask_seqname('chr1','chrX').tolist(),
+                         [False,True,True,True,True])
+        self.assertEqual(cols.mask_strand('-').tolist(),
+                         [True,False,False,True,False])
+        self.assertEqual(cols.mask_overlaps(2001,2600).tolist(),
+                         [False,True,False,False,True])
+        self.assertEqual(cols.mask_within(1000,3000).tolist(),
+                         [False,False,True,False,False])
+        genes = cols.filter(cols.mask_feature('gene') & cols.mask_seqname('chr1'))
+        self.assertEqual(len(genes),2)
+        self.assertEqual(list(genes.attributes),['ID=G1','ID=G2'])
+
+    def test_sort(self):
+        """Records can be sorted
+        """
+        cols = self.cols.sort()
+        self.assertEqual(cols.seqname.values(),['chr1','chr1','chr1','chr1','chr2'])
+        self.assertEqual(cols.start.tolist(),[100,1890,1890,2500,5000])
+        self.assertEqual(cols.end.tolist(),[900,2000,3287,3287,6000])
+        cols = self.cols.sort('start')
+        self.assertEqual(cols.start.tolist(),[100,1890,1890,2500,5000])
+
+    def test_to_records(self):
+        """Records can be converted back to GFFDataLines
+        """
+        records = self.cols.to_records()
+        self.assertEqual([str(r) for r in records],
+                         [str(r) for r in self.gff])
+        self.assertTrue(isinstance(records[0],GFFDataLine))
+        self.assertEqual([r.lineno() for r in records],[2,3,4,5,6])
+        # Non-numeric scores survive filtering
+        exons = self.cols.filter(self.cols.mask_feature('exon'))
+        self.assertEqual(exons.to_lines()[0],
+                         "chr1\tTest\texon\t1890\t2000\tAnc_1\t+\t0\tParent=G1")
+
+    def test_records_without_line_numbers(self):
+        """Records without line numbers don't pick up other text scores
+        """
+        records = list(self.gff)[:3]
+        records.append(GFFDataLine(
+            "chr1\tTest\texon\t4000\t4100\t7\t+\t.\tParent=G1"))
+        records.extend(list(self.gff)[3:])
+        cols = GFFColumns.from_records(records)
+        self.assertEqual(cols.lineno.tolist(),[2,3,4,0,5,6])
+        self.assertEqual([line.split('\t')[5] for line in cols.to_lines()],
+                         ['.','0.5','Anc_1','7','0','.'])
+        self.assertEqual([r.lineno() for r in cols.to_records()],
+                         [2,3,4,None,5,6])
+        self.assertEqual(cols.to_records()[3]['score'],7)
+        # Non-numeric scores follow their rows when sorting
+        cols = cols.sort('start')
+        self.assertEqual([line.split('\t')[5] for line in cols.to_lines()],
+                         ['0','0.5','Anc_1','.','7','.'])
+
+    def test_to_records_from_fields(self):
+        """Records are created directly from the column values
+        """
+        records = self.cols.to_records()
+        for record,line in zip(records,self.gff):
+            for key in ('seqname','start','end','score','strand','frame'):
+                self.assertEqual(record[key],line[key])
+        self.assertEqual(records[1]['score'],0.5)
+        self.assertEqual(records[3]['score'],0)
+        self.assertEqual(records[2]['frame'],0)
+        self.assertFalse(records[0].modified())
+        records = self.cols.to_records(gffdataline=CompactGFFDataLine)
+        self.assertEqual([str(r) for r in records],
+                         [str(r) for r in self.gff])
+        self.assertTrue(isinstance(records[0],CompactGFFDataLine))
+        self.assertEqual(records[1]['score'],'0.5')
+        self.assertEqual(records[1]['attributes']['ID'],'G1')
+
+    def test_to_gff(self):
+        """Records can be converted back to a GFFFile
+        """
+        gff = self.cols.to_gff()
+        self.assertEqual(len(gff),5)
+        self.assertEqual(gff.version,'3')
+        self.assertEqual(gff[1]['attributes']['ID'],'G1')
@@ -1,5 +1,7 @@
 #!/usr/bin/env python
 
+import os
+import tempfile
 import unittest
 import cStringIO
 from GFFUtils.GFFFile import *
@@ -43,6 +45,369 @@ DDB0232428	Sequencing Center	CDS	1890	3287	.	+	.	Parent=DDB0216437
         self.assertEqual(ncomment,1)
         self.assertEqual(nannotation,6)
 
+    def test_gff_iterator_small_buffer(self):
+        """Test iteration when lines span multiple blocks
+        """
+        expected = [(line.lineno(),line.type,str(line))
+                    for line in GFFIterator(fp=cStringIO.StringIO(self.fp.getvalue()))]
+        for buffer_size in (1,7,64):
+            lines = [(line.lineno(),line.type,str(line))
+                     for line in GFFIterator(fp=cStringIO.StringIO(self.fp.getvalue()),
+                                             buffer_size=buffer_size)]
+            self.assertEqual(lines,expected)
+
+    def test_gff_iterator_no_trailing_newline(self):
+        """Test iteration when last line has no trailing newline
+        """
+        fp = cStringIO.StringIO("##gff-version 3\n# comment\nDDB0232428\tSequencing Center\texon\t1890\t3287\t.\t+\t.\tParent=DDB0216437")
+        lines = [line for line in GFFIterator(fp=fp,buffer_size=16)]
+        self.assertEqual(len(lines),3)
+        self.assertEqual([line.type for line in lines],[PRAGMA,COMMENT,ANNOTATION])
+        self.assertEqual([line.lineno() for line in lines],[1,2,3])
+        self.assertEqual(lines[2]['attributes']['Parent'],'DDB0216437')
+
+    def test_gff_iterator_mapped(self):
+        """Test iteration in mapped mode gives the same data
+        """
+        expected = [(line.lineno(),line.type,str(line))
+                    for line in GFFIterator(fp=cStringIO.StringIO(self.fp.getvalue()))]
+        # Memory-mapped file
+        fd,gff_file = tempfile.mkstemp(suffix='.gff')
+        try:
+            fp = os.fdopen(fd,'w')
+            fp.write(self.fp.getvalue())
+            fp.close()
+            lines = [line for line in GFFIterator(gff_file,mapped=True)]
+            self.assertTrue(isinstance(lines[0],MappedGFFDataLine))
+            self.assertEqual([(line.lineno(),line.type,str(line)) for line in lines],
+                             expected)
+            self.assertEqual(lines[4]['feature'],'gene')
+            self.assertEqual(lines[4]['start'],1890)
+            self.assertEqual(lines[5]['attributes']['Parent'],'DDB_G0267178')
+        finally:
+            os.remove(gff_file)
+        # File-like object read in small blocks
+        for buffer_size in (1,7,64):
+            lines = [(line.lineno(),line.type,str(line))
+                     for line in GFFIterator(fp=cStringIO.StringIO(self.fp.getvalue()),
+                                             buffer_size=buffer_size,mapped=True)]
+            self.assertEqual(lines,expected)
+
+    def test_gff_iterator_projection(self):
+        """Test iteration extracting selected columns and attributes
+        """
+        for mapped in (False,True):
+            lines = [line for line in GFFIterator(fp=cStringIO.StringIO(self.fp.getvalue()),
+                                                  columns=('seqname','end'),
+                                                  attributes=('Parent',),
+                                                  mapped=mapped)]
+            self.assertEqual(len(lines),8)
+            self.assertEqual(lines[5]['seqname'],'DDB0232428')
+            self.assertEqual(lines[5]['end'],3287)
+            self.assertEqual(lines[5]['attributes']['Parent'],'DDB_G0267178')
+            self.assertEqual(lines[5]['attributes'].keys(),['Parent'])
+
+    def test_gff_iterator_line_filter(self):
+        """Test iteration selecting annotation lines
+        """
+        for mapped in (False,True):
+            lines = [line for line in GFFIterator(fp=cStringIO.StringIO(self.fp.getvalue()),
+                                                  gffdataline=None if mapped else CompactGFFDataLine,
+                                                  features=('exon','CDS'),
+                                                  mapped=mapped)]
+            self.assertEqual([line.lineno() for line in lines],[1,2,7,8])
+            self.assertEqual([line.type for line in lines],
+                             [PRAGMA,COMMENT,ANNOTATION,ANNOTATION])
+            self.assertEqual(lines[3]['feature'],'CDS')
+
+    def test_gff_iterator_parallel(self):
+        """Test iteration using multiple processes
+        """
+        fd,gff_file = tempfile.mkstemp(suffix='.gff')
+        fp = os.fdopen(fd,'w')
+        fp.write(self.fp.getvalue()*20)
+        fp.close()
+        try:
+            for gffdataline in (CompactGFFDataLine,GFFDataLine):
+                for args in ({},
+                             dict(features=('exon','CDS')),
+                             dict(columns=('seqname','end'),attributes=('ID',))):
+                    expected = [(line.lineno(),line.type,str(line))
+                                for line in GFFIterator(gff_file,gffdataline=gffdataline,
+                                                        **args)]
+                    lines = [(line.lineno(),line.type,str(line))
+                             for line in GFFIterator(gff_file,gffdataline=gffdataline,
+                                                     processes=3,**args)]
+                    self.assertEqual(lines,expected)
+            # Classes without '_from_fields' are parsed serially
+            class PlainGFFDataLine(GFFDataLine):
+                _from_fields = None
+            expected = [(line.lineno(),line.type,str(line))
+                        for line in GFFIterator(gff_file)]
+            lines = [(line.lineno(),line.type,str(line))
+                     for line in GFFIterator(gff_file,
+                                             gffdataline=PlainGFFDataLine,
+                                             processes=3)]
+            self.assertEqual(lines,expected)
+        finally:
+            os.remove(gff_file)
+
+    def test_gff_iterator_read_ahead(self):
+        """Test iteration reading blocks in a background thread
+        """
+        expected = [(line.lineno(),line.type,str(line))
+                    for line in GFFIterator(fp=cStringIO.StringIO(self.fp.getvalue()))]
+        for read_ahead in (1,4):
+            for buffer_size in (7,64,DEFAULT_BUFFER_SIZE):
+                lines = [(line.lineno(),line.type,str(line))
+                         for line in GFFIterator(fp=cStringIO.StringIO(self.fp.getvalue()),
+                                                 buffer_size=buffer_size,
+                                                 read_ahead=read_ahead)]
+                self.assertEqual(lines,expected)
+        # Seek part way through
+        iterator = GFFIterator(fp=cStringIO.StringIO(self.fp.getvalue()),
+                               buffer_size=7,read_ahead=2)
+        iterator.next()
+        offset = self.fp.getvalue().index('DDB0232428\t.\tgene')
+        iterator.seek(offset,lineno=5)
+        self.assertEqual([(line.lineno(),line.type,str(line)) for line in iterator],
+                         expected[4:])
+
+class TestSplitFile(unittest.TestCase):
+    """Unit tests for the split_file function
+    """
+
+    def test_split_file(self):
+        """Byte ranges cover the file and start on line boundaries
+        """
+        data = ''.join(["line %d\n" % i for i in range(100)]) + "last"
+        fd,filen = tempfile.mkstemp()
+        fp = os.fdopen(fd,'w')
+        fp.write(data)
+        fp.close()
+        try:
+            for nshards in (1,3,16,1000):
+                shards = split_file(filen,nshards)
+                self.assertTrue(len(shards) <= nshards)
+                self.assertEqual(''.join([data[start:end] for start,end in shards]),
+                                 data)
+                for start,end in shards:
+                    self.assertTrue(start == 0 or data[start-1] == '\n')
+            shards = split_file(filen,4,start=data.index('line 50'))
+            self.assertEqual(shards[0][0],data.index('line 50'))
+            self.assertEqual(shards[-1][1],len(data))
+        finally:
+            os.remove(filen)
+
+class TestGFFDataLine(unittest.TestCase):
+    """Unit tests for the GFFDataLine class
+    """
+
+    def setUp(self):
+        # Example GFF data line
+        self.gff_line = "DDB0232428\tSequencing Center\tmRNA\t1890\t3287\t.\t+\t.\tID=DDB0216437;Parent=DDB_G0267178;Note=JC1V2/Sanger"
+
+    def test_attributes_are_converted_on_access(self):
+        """Attributes are returned as GFFAttributes object
+        """
+        line = GFFDataLine(self.gff_line)
+        attributes = line['attributes']
+        self.assertTrue(isinstance(attributes,GFFAttributes))
+        self.assertEqual(attributes['ID'],'DDB0216437')
+        self.assertEqual(attributes['Parent'],'DDB_G0267178')
+        self.assertTrue(line['attributes'] is attributes)
+
+    def test_attributes_are_converted_on_positional_access(self):
+        """Attributes are converted when accessed by column index
+        """
+        line = GFFDataLine(self.gff_line)
+        attributes = line[8]
+        self.assertTrue(isinstance(attributes,GFFAttributes))
+        self.assertEqual(attributes['ID'],'DDB0216437')
+        self.assertTrue(line['attributes'] is attributes)
+        self.assertTrue(line[-1] is attributes)
+        self.assertEqual(line[2],'mRNA')
+        self.assertEqual(line[3],1890)
+
+    def test_untouched_attributes_are_written_verbatim(self):
+        """Unaccessed attributes are output using the original string
+        """
+        line = GFFDataLine(self.gff_line)
+        self.assertEqual(line['feature'],'mRNA')
+        self.assertEqual(line['start'],1890)
+        self.assertEqual(str(line),self.gff_line)
+
+    def test_modified_attributes_are_written(self):
+        """Modified attributes are output with the changes
+        """
+        line = GFFDataLine(self.gff_line)
+        line['attributes']['ID'] = 'XYZ'
+        self.assertEqual(str(line),"DDB0232428\tSequencing Center\tmRNA\t1890\t3287\t.\t+\t.\tID=XYZ;Parent=DDB_G0267178;Note=JC1V2%2FSanger")
+
+    def test_unmodified_line_is_written_verbatim(self):
+        """Unmodified lines are output using the original text
+        """
+        gff_line = "DDB0232428\tSequencing Center\tmRNA\t1890\t3287\t0.50\t+\t.\tID = DDB0216437;Note=JC1V2/Sanger"
+        line = GFFDataLine(gff_line)
+        self.assertEqual(line['attributes']['ID'],'DDB0216437')
+        self.assertFalse(line.modified())
+        self.assertEqual(str(line),gff_line)
+
+    def test_fields_round_trip(self):
+        """Stored fields only include the text when it's needed
+        """
+        fields = GFFDataLine(self.gff_line)._fields()
+        self.assertEqual(fields[3],1890)
+        self.assertEqual(fields[-1],True)
+        line = GFFDataLine._from_fields(fields,lineno=2)
+        self.assertEqual(line['attributes']['ID'],'DDB0216437')
+        self.assertFalse(line.modified())
+        self.assertEqual(str(line),self.gff_line)
+        self.assertEqual(line.lineno(),2)
+        # Original text is kept if it can't be recovered
+        gff_line = self.gff_line.replace('\t.\t+','\t1.000\t+')
+        fields = GFFDataLine(gff_line)._fields()
+        self.assertEqual(fields[-1],gff_line)
+        self.assertEqual(str(GFFDataLine._from_fields(fields)),gff_line)
+        # Modified lines are reassembled
+        line = GFFDataLine(self.gff_line)
+        line['start'] = 1900
+        fields = line._fields()
+        self.assertEqual(fields[-1],None)
+        self.assertEqual(str(GFFDataLine._from_fields(fields)),str(line))
+
+    def test_modified_columns_are_written(self):
+        """Lines with modified columns are output with the changes
+        """
+        line = GFFDataLine(self.gff_line)
+        line['seqname'] = 'chr'+line['seqname']
+        self.assertTrue(line.modified())
+        self.assertEqual(str(line),"chrDDB0232428\tSequencing Center\tmRNA\t1890\t3287\t.\t+\t.\tID=DDB0216437;Parent=DDB_G0267178;Note=JC1V2/Sanger")
+
+class TestMappedGFFDataLine(unittest.TestCase):
+    """Unit tests for the MappedGFFDataLine class
+    """
+
+    def setUp(self):
+        self.buffer = "##gff-version 3\nDDB0232428\tSequencing Center\tmRNA\t1890\t3287\t.\t+\t.\tID=DDB0216437;Parent=DDB_G0267178\n"
+        self.start = self.buffer.index('DDB0232428')
+        self.end = len(self.buffer) - 1
+
+    def test_mapped_data_line(self):
+        """MappedGFFDataLine extracts columns from the buffer
+        """
+        line = MappedGFFDataLine(self.buffer,self.start,self.end,lineno=2,
+                                 gff_line_type=ANNOTATION)
+        self.assertEqual(line['seqname'],'DDB0232428')
+        self.assertEqual(line['source'],'Sequencing Center')
+        self.assertEqual(line['feature'],'mRNA')
+        self.assertEqual(line['start'],1890)
+        self.assertEqual(line[4],3287)
+        self.assertEqual(line['strand'],'+')
+        self.assertEqual(line['attributes']['ID'],'DDB0216437')
+        self.assertEqual(len(line),9)
+        self.assertEqual(line.lineno(),2)
+        self.assertEqual(line.type,ANNOTATION)
+        self.assertRaises(KeyError,line.__getitem__,'not_a_column')
+        self.assertEqual(str(line),self.buffer[self.start:self.end])
+
+    def test_mapped_data_line_missing_columns(self):
+        """MappedGFFDataLine returns None for missing columns
+        """
+        line = MappedGFFDataLine("chr1\tsource\t",0)
+        self.assertEqual(line['seqname'],'chr1')
+        self.assertEqual(line['feature'],'')
+        self.assertEqual(line['start'],None)
+        self.assertEqual(len(line),3)
+        self.assertEqual(str(line),"chr1\tsource\t")
+
+    def test_mapped_data_line_modified_attributes(self):
+        """MappedGFFDataLine outputs modified attributes
+        """
+        line = MappedGFFDataLine(self.buffer,self.start,self.end)
+        self.assertEqual(line['attributes']['ID'],'DDB0216437')
+        self.assertEqual(str(line),self.buffer[self.start:self.end])
+        line['attributes']['ID'] = 'XYZ'
+        self.assertEqual(str(line),"DDB0232428\tSequencing Center\tmRNA\t1890\t3287\t.\t+\t.\tID=XYZ;Parent=DDB_G0267178")
+
+class TestCompactGFFDataLine(unittest.TestCase):
+    """Unit tests for the CompactGFFDataLine class
+    """
+
+    def setUp(self):
+        # Example GFF data line
+        self.gff_line = "DDB0232428\tSequencing Center\tmRNA\t1890\t3287\t.\t+\t.\tID=DDB0216437;Parent=DDB_G0267178"
+
+    def test_compact_data_line(self):
+        """Columns can be accessed by name and position
+        """
+        line = CompactGFFDataLine(self.gff_line,lineno=4,gff_line_type=ANNOTATION)
+        self.assertEqual(line['seqname'],'DDB0232428')
+        self.assertEqual(line['source'],'Sequencing Center')
+        self.assertEqual(line['feature'],'mRNA')
+        self.assertEqual(line['start'],1890)
+        self.assertEqual(line['end'],3287)
+        self.assertEqual(line['score'],'.')
+        self.assertEqual(line['strand'],'+')
+        self.assertEqual(line['frame'],'.')
+        self.assertEqual(line[2],'mRNA')
+        self.assertEqual(line['attributes']['Parent'],'DDB_G0267178')
+        self.assertEqual(line.lineno(),4)
+        self.assertEqual(line.type,ANNOTATION)
+        self.assertRaises(KeyError,line.__getitem__,'not_a_column')
+        self.assertFalse(hasattr(line,'__dict__'))
+
+    def test_compact_data_line_set_values(self):
+        """Columns can be updated
+        """
+        line = CompactGFFDataLine(self.gff_line)
+        line['seqname'] = 'chr1'
+        line['attributes']['ID'] = 'XYZ'
+        self.assertEqual(str(line),"chr1\tSequencing Center\tmRNA\t1890\t3287\t.\t+\t.\tID=XYZ;Parent=DDB_G0267178")
+
+    def test_compact_data_line_repr(self):
+        """str() returns the original line
+        """
+        self.assertEqual(str(CompactGFFDataLine(self.gff_line)),self.gff_line)
+        self.assertEqual(str(CompactGFFDataLine("##gff-version 3\n")),
+                         "##gff-version 3")
+
+    def test_compact_data_line_in_gff_file(self):
+        """CompactGFFDataLine can be used when reading a GFF file
+        """
+        fp = cStringIO.StringIO(
+"""##gff-version 3
+DDB0232428\tSequencing Center\tmRNA\t1890\t3287\t.\t+\t.\tID=DDB0216437;Parent=DDB_G0267178
+DDB0232428\tSequencing Center\texon\t1890\t3287\t.\t+\t.\tParent=DDB0216437
+""")
+        gff = GFFFile("test.gff",fp,gffdataline=CompactGFFDataLine)
+        self.assertEqual(gff.version,'3')
+        self.assertEqual(len(gff),2)
+        self.assertTrue(isinstance(gff[0],CompactGFFDataLine))
+        self.assertEqual(gff[1]['feature'],'exon')
+        self.assertEqual(gff[1].lineno(),3)
+        self.assertEqual(gff[1]['attributes']['Parent'],'DDB0216437')
+
+    def test_compact_data_line_projection(self):
+        """CompactGFFDataLine only extracts projected columns
+        """
+        projection = GFFProjection(columns=('feature','start'),
+                                   attributes=('Parent',))
+        self.assertEqual(projection.columns,('feature','start','attributes'))
+        line = CompactGFFDataLine(self.gff_line,projection=projection)
+        self.assertEqual(line['feature'],'mRNA')
+        self.assertEqual(line['start'],1890)
+        self.assertEqual(line['seqname'],'')
+        self.assertEqual(line['end'],'')
+        self.assertEqual(line['attributes']['Parent'],'DDB_G0267178')
+        self.assertEqual(line['attributes'].keys(),['Parent'])
+        # Only the leading columns
+        line = CompactGFFDataLine(self.gff_line,
+                                  projection=GFFProjection(columns=('source',)))
+        self.assertEqual(line['source'],'Sequencing Center')
+        self.assertEqual(line['feature'],'')
+        self.assertRaises(KeyError,GFFProjection,columns=('chrom',))
+
 class TestGFFFile(unittest.TestCase):
     """Basic unit tests for the GFFFile class
     """
@@ -75,6 +440,258 @@ DDB0232428	Sequencing Center	CDS	1890	3287	.	+	.	Parent=DDB0216437
             self.assertEqual(feature[i],gff[i]['feature'],
                              "Incorrect feature '%s' on data line %d" % (gff[i]['feature'],i))
 
+    def test_read_in_gff_with_interned_strings(self):
+        """Test that strings can be shared between data lines
+        """
+        gff = GFFFile("test.gff",self.fp,intern_strings=True)
+        self.assertEqual(len(gff),6)
+        self.assertEqual(gff[3]['feature'],'mRNA')
+        self.assertEqual(gff[4]['attributes']['Parent'],'DDB0216437')
+        # Repeated values should be the same object
+        self.assertTrue(gff[1]['seqname'] is gff[2]['seqname'])
+        self.assertTrue(gff[1]['source'] is gff[3]['source'])
+        self.assertTrue(gff[4]['attributes']['Parent'] is
+                        gff[5]['attributes']['Parent'])
+        self.assertTrue(gff.intern_table.shared > 0)
+        # Output is unchanged
+        self.assertEqual(str(gff[2]),"DDB0232428\t.\tgene\t1890\t3287\t.\t+\t.\tID=DDB_G0267178;Name=DDB_G0267178_RTE;description=ORF2 protein fragment of DIRS1 retrotransposon%3B refer to Genbank M11339 for full-length element")
+
+    def test_no_intern_table_by_default(self):
+        """Test that strings are not interned by default
+        """
+        gff = GFFFile("test.gff",self.fp)
+        self.assertEqual(gff.intern_table,None)
+
+    def test_insert_many(self):
+        """Test that several lines can be inserted in one pass
+        """
+        gff = GFFFile("test.gff",self.fp)
+        lines = [GFFDataLine("DDB0232428\tTest\tCDS\t%d\t%d\t.\t+\t.\tID=NEW%d" %
+                             (i*100,i*100+50,i)) for i in range(4)]
+        inserted = gff.insert_many([(6,lines[0]),
+                                    (0,lines[1]),
+                                    (3,lines[2]),
+                                    (3,lines[3])])
+        self.assertEqual(inserted,[lines[1],lines[2],lines[3],lines[0]])
+        self.assertEqual(len(gff),10)
+        self.assertEqual([data['feature'] for data in gff],
+                         ['CDS','chromosome','contig','gene','CDS','CDS',
+                          'mRNA','exon','CDS','CDS'])
+        self.assertEqual([gff[i]['attributes']['ID'] for i in (0,4,5,9)],
+                         ['NEW1','NEW2','NEW3','NEW0'])
+        self.assertRaises(IndexError,gff.insert_many,[(11,lines[0])])
+
+    def test_delete_many(self):
+        """Test that several lines can be deleted in one pass
+        """
+        gff = GFFFile("test.gff",self.fp)
+        lines = [data for data in gff]
+        parent_index = gff.index_attribute('Parent')
+        self.assertEqual(parent_index.count('DDB0216437'),2)
+        deleted = gff.delete_many([lines[5],lines[1].lineno(),lines[4],
+                                   lines[1],99])
+        self.assertEqual(deleted,[lines[5],lines[1],lines[4]])
+        self.assertEqual([data['feature'] for data in gff],
+                         ['chromosome','gene','mRNA'])
+        self.assertEqual(parent_index.count('DDB0216437'),0)
+        self.assertEqual(gff.delete_many([]),[])
+
+class TestGFFWriter(unittest.TestCase):
+    """Unit tests for the GFFWriter class
+    """
+
+    def setUp(self):
+        # Example GFF data
+        self.gff_data = """##gff-version 3
+# generated: Wed Feb 21 12:01:58 2012
+DDB0123458	Sequencing Center	chromosome	1	4923596	.	+	.	ID=DDB0232428;Name=1
+DDB0232428	.	gene	1890	3287	.	+	.	ID=DDB_G0267178;Name=DDB_G0267178_RTE
+##sequence-region DDB0232428 1 4923596
+DDB0232428	Sequencing Center	mRNA	1890	3287	.	+	.	ID=DDB0216437;Parent=DDB_G0267178
+"""
+        self.wd = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for f in os.listdir(self.wd):
+            os.remove(os.path.join(self.wd,f))
+        os.rmdir(self.wd)
+
+    def test_write_records_from_iterator(self):
+        """Records are written with pragmas and comments passed through
+        """
+        for batch_size in (1,2,1000):
+            fp = cStringIO.StringIO()
+            writer = GFFWriter(fp=fp,batch_size=batch_size)
+            writer.write_records(GFFIterator(fp=cStringIO.StringIO(self.gff_data)))
+            writer.close()
+            self.assertEqual(len(writer),5)
+            self.assertEqual(fp.getvalue(),self.gff_data)
+
+    def test_write_header(self):
+        """Header is only written for GFF output
+        """
+        records = [line for line in GFFIterator(fp=cStringIO.StringIO(self.gff_data))
+                   if line.type == ANNOTATION]
+        fp = cStringIO.StringIO()
+        writer = GFFWriter(fp=fp)
+        writer.write_records(records)
+        writer.close()
+        self.assertEqual(fp.getvalue().split('\n')[0],'##gff-version 3')
+        self.assertEqual(len(fp.getvalue().split('\n')),5)
+        fp = cStringIO.StringIO()
+        writer = GFFWriter(fp=fp,format='gtf')
+        writer.write_records(records)
+        writer.close()
+        self.assertEqual(fp.getvalue(),''.join(["%s\n" % r for r in records]))
+
+    def test_write_compressed(self):
+        """Output can be gzip or BGZF compressed
+        """
+        outfile = os.path.join(self.wd,'out.gff.gz')
+        for compression in ('gzip','bgzf'):
+            writer = GFFWriter(outfile,compression=compression)
+            writer.write_records(GFFIterator(fp=cStringIO.StringIO(self.gff_data)))
+            writer.close()
+            lines = [str(line) for line in GFFIterator(outfile)]
+            self.assertEqual(lines,self.gff_data.split('\n')[:-1])
+
+class TestGFFLineFilter(unittest.TestCase):
+    """Tests for the GFFLineFilter class
+    """
+
+    def setUp(self):
+        self.line = "DDB0232428\tSequencing Center\tmRNA\t1890\t3287\t.\t+\t.\tID=DDB0216437;Parent=DDB_G0267178"
+
+    def test_match_feature(self):
+        """Lines are selected by feature type
+        """
+        self.assertTrue(GFFLineFilter(features='mRNA').match(self.line))
+        self.assertTrue(GFFLineFilter(features=('gene','mRNA')).match(self.line))
+        self.assertFalse(GFFLineFilter(features='gene').match(self.line))
+        # Feature type appearing in another column doesn't match
+        self.assertFalse(GFFLineFilter(features='Sequencing Center').match(self.line))
+
+    def test_match_seqname_and_strand(self):
+        """Lines are selected by sequence name and strand
+        """
+        self.assertTrue(GFFLineFilter(seqnames=('chr1','DDB0232428')).match(self.line))
+        self.assertFalse(GFFLineFilter(seqnames='DDB023242').match(self.line))
+        self.assertTrue(GFFLineFilter(strand='+').match(self.line))
+        self.assertFalse(GFFLineFilter(strand='-').match(self.line))
+        self.assertFalse(GFFLineFilter(strand='+').match("chr1\tsource\tgene"))
+
+    def test_match_contains(self):
+        """Lines are selected by literal substrings
+        """
+        self.assertTrue(GFFLineFilter(contains='Parent=DDB_G0267178').match(self.line))
+        self.assertFalse(GFFLineFilter(contains=('ID=DDB0216437','Name=')).match(self.line))
+
+    def test_match_region_of_buffer(self):
+        """Lines can be matched within a larger buffer
+        """
+        buf = "chr1\tsrc\tgene\t1\t2\t.\t-\t.\tID=a\n" + self.line + "\n"
+        start = buf.index('DDB0232428')
+        end = len(buf) - 1
+        line_filter = GFFLineFilter(features='mRNA',strand='+')
+        self.assertTrue(line_filter.match(buf,start,end))
+        self.assertFalse(line_filter.match(buf,0,start-1))
+
+class TestGFFInternTable(unittest.TestCase):
+    """Tests for the GFFInternTable class
+    """
+
+    def test_intern_strings(self):
+        """Equal strings are replaced by a single shared copy
+        """
+        table = GFFInternTable()
+        s1 = ''.join(['ch','r1'])
+        s2 = ''.join(['chr','1'])
+        self.assertFalse(s1 is s2)
+        self.assertTrue(table.intern(s1) is s1)
+        self.assertTrue(table.intern(s2) is s1)
+        self.assertEqual(table.intern('chr2'),'chr2')
+        self.assertEqual(len(table),2)
+        self.assertTrue('chr1' in table)
+        self.assertEqual(table.lookups,3)
+        self.assertEqual(table.shared,1)
+        self.assertTrue(table.bytes_saved > 0)
+
+    def test_non_strings_are_unchanged(self):
+        """Non-string values are passed through unchanged
+        """
+        table = GFFInternTable()
+        self.assertEqual(table.intern(None),None)
+        self.assertEqual(table.intern(123),123)
+        self.assertEqual(len(table),0)
+
+    def test_attributes_use_intern_function(self):
+        """GFFAttributes can share keys and values via a table
+        """
+        table = GFFInternTable()
+        attr1 = GFFAttributes("ID=%s;Parent=%s" % ('a'*4,'b'*4),
+                              intern=table.intern)
+        attr2 = GFFAttributes("ID=%s;Parent=%s" % ('c'*4,'b'*4),
+                              intern=table.intern)
+        self.assertTrue(attr1['Parent'] is attr2['Parent'])
+        self.assertEqual(str(attr2),"ID=cccc;Parent=bbbb")
+        # Keys are interned, but not values of unique attributes
+        self.assertTrue('ID' in table)
+        self.assertFalse('cccc' in table)
+
+class TestGFFAttributeIndex(unittest.TestCase):
+    """Unit tests for the GFFAttributeIndex class
+    """
+
+    def setUp(self):
+        self.fp = cStringIO.StringIO(
+"""chr1\tTest\tCDS\t100\t200\t0\t-\t0\tID=A1;SGD=YEL0W01
+chr1\tTest\tCDS\t300\t400\t0\t-\t0\tID=A2;SGD=YEL0W02
+chr1\tTest\tCDS\t500\t600\t0\t-\t0\tID=A3;SGD=YEL0W02
+chr1\tTest\tCDS\t700\t800\t0\t-\t0\tID=A4
+chr2\tTest\tCDS\t100\t200\t0\t+\t0\tID=A5;SGD=YEL0W02
+""")
+
+    def test_find_and_count(self):
+        """Records can be found by attribute value
+        """
+        gff = GFFFile("test.gff",self.fp)
+        index = gff.index_attribute('SGD')
+        self.assertTrue(gff.index_attribute('SGD') is index)
+        self.assertEqual(index.key,'SGD')
+        self.assertEqual(len(index),2)
+        self.assertEqual(index.values(),['YEL0W01','YEL0W02'])
+        self.assertEqual([r['attributes']['ID'] for r in index.find('YEL0W02')],
+                         ['A2','A3','A5'])
+        self.assertEqual(gff.find('SGD','YEL0W01')[0]['attributes']['ID'],'A1')
+        self.assertEqual(index.find('YEL0W03'),[])
+        self.assertEqual(index.count('YEL0W02'),3)
+        self.assertEqual(index.counts(),{ 'YEL0W01': 1, 'YEL0W02': 3 })
+        duplicates = index.duplicates()
+        self.assertEqual(duplicates.keys(),['YEL0W02'])
+        self.assertEqual(len(duplicates['YEL0W02']),3)
+
+    def test_index_is_updated(self):
+        """Index is updated when records are added and removed
+        """
+        gff = GFFFile("test.gff",self.fp)
+        index = gff.index_attribute('SGD')
+        # Delete records
+        del(gff[0])
+        self.assertFalse('YEL0W01' in index)
+        del(gff[1:3])
+        self.assertEqual([r['attributes']['ID'] for r in index.find('YEL0W02')],
+                         ['A2','A5'])
+        # Insert a record and then set its attributes
+        line = gff.insert(0,tabdataline=GFFDataLine(
+            "chr1\tTest\tCDS\t50\t60\t0\t+\t0\tID=A6"))
+        line['attributes']['SGD'] = 'YEL0W03'
+        self.assertEqual(index.find('YEL0W03'),[line])
+        # Append a record
+        gff.append(tabdataline=GFFDataLine(
+            "chr2\tTest\tCDS\t300\t400\t0\t+\t0\tID=A7;SGD=YEL0W02"))
+        self.assertEqual(index.count('YEL0W02'),3)
+        self.assertEqual(index.values(),['YEL0W02','YEL0W03'])
+
 class TestGFFAttributes(unittest.TestCase):
     """Unit tests for GFFAttributes class
     """
@@ -187,6 +804,119 @@ class TestGFFAttributes(unittest.TestCase):
         del(nokeys[:])
         self.assertEqual(attr.nokeys(),[])
 
+    def test_selected_keys(self):
+        """Only decode the requested attributes
+        """
+        attr = GFFAttributes("ID=DDB0216437;Parent=DDB_G0267178;Note=a%3Bb;Name=x;Note=c%3Bd",
+                             keys=('Note','ID','missing'))
+        self.assertEqual(attr.keys(),['ID','Note'])
+        self.assertEqual(attr['ID'],'DDB0216437')
+        self.assertEqual(attr['Note'],'c;d')
+        self.assertEqual(attr.nokeys(),[])
+
+    def test_selected_keys_modified(self):
+        """Attributes which weren't decoded are kept when output
+        """
+        attr = GFFAttributes("ID=DDB0216437;Parent=DDB_G0267178;Note=a%3Bb;Name=x;",
+                             keys=('ID','Note'))
+        self.assertEqual(str(attr),"ID=DDB0216437;Parent=DDB_G0267178;Note=a%3Bb;Name=x;")
+        attr['ID'] = 'DDB0216438'
+        self.assertEqual(str(attr),"ID=DDB0216438;Parent=DDB_G0267178;Note=a%3Bb;Name=x;")
+        del(attr['Note'])
+        attr['Name'] = 'y'
+        attr['Alias'] = 'z'
+        self.assertEqual(str(attr),"ID=DDB0216438;Parent=DDB_G0267178;Name=y;Alias=z;")
+
+    def test_escaped_values(self):
+        """Reserved characters are escaped when attributes are output
+        """
+        attr = GFFAttributes("ID=cds%3B1;Name=a b%2Cc%3Dd;Alias=x,y")
+        self.assertEqual(attr['ID'],'cds;1')
+        self.assertEqual(attr['Name'],'a b,c=d')
+        self.assertEqual(attr['Alias'],'x,y')
+        self.assertEqual(str(attr),"ID=cds%3B1;Name=a b%2Cc%3Dd;Alias=x,y")
+        attr['Name'] = 'tab\there & 100%'
+        self.assertEqual(str(attr),
+                         "ID=cds%3B1;Name=tab%09here %26 100%25;Alias=x,y")
+
+    def test_unmodified_attributes_written_verbatim(self):
+        """Unmodified attributes are output using the original string
+        """
+        attributes = "ID = DDB0232440 ;Note=a%2cb;589008-589009"
+        attr = GFFAttributes(attributes)
+        self.assertEqual(attr['ID'],'DDB0232440')
+        self.assertFalse(attr.modified())
+        self.assertEqual(str(attr),attributes)
+
+    def test_modified_attributes(self):
+        """Changes to the attributes are detected
+        """
+        attributes = "ID=DDB0232440;Note=a%2cb;589008-589009"
+        attr = GFFAttributes(attributes)
+        attr['Note'] = 'a,b'
+        self.assertTrue(attr.modified())
+        self.assertEqual(str(attr),"ID=DDB0232440;Note=a,b;589008-589009")
+        attr = GFFAttributes(attributes)
+        del(attr['Note'])
+        self.assertTrue(attr.modified())
+        self.assertEqual(str(attr),"ID=DDB0232440;589008-589009")
+        attr = GFFAttributes(attributes)
+        attr.insert(0,'Name','x')
+        self.assertTrue(attr.modified())
+        self.assertEqual(str(attr),"Name=x;ID=DDB0232440;Note=a,b;589008-589009")
+        attr = GFFAttributes(attributes)
+        attr.nokeys().append('Test')
+        self.assertTrue(attr.modified())
+        self.assertEqual(str(attr),"ID=DDB0232440;Note=a,b;589008-589009;Test")
+        attr = GFFAttributes(attributes)
+        attr.encode(False)
+        self.assertTrue(attr.modified())
+        attr.encode(True)
+        self.assertFalse(attr.modified())
+
+    def test_modified_attributes_are_re_encoded(self):
+        """Modified attributes are percent encoded on output
+        """
+        description = "ID=DDB_G0789012;description=putative pseudogene%3B similar to a family of genes%2C including %3Ca href%3D%22%2Fgene%2FDDB_G0234567%22%3EDDB_G0234567%3C%2Fa%3E"
+        attr = GFFAttributes(description)
+        attr['ID'] = 'DDB_G0789012'
+        self.assertEqual(str(attr),description)
+
+class TestPercentEncoding(unittest.TestCase):
+    """Unit tests for the percent_decode and percent_encode functions
+    """
+
+    def test_percent_decode(self):
+        """Escaped characters are decoded
+        """
+        self.assertEqual(percent_decode('DDB0216437'),'DDB0216437')
+        self.assertEqual(percent_decode('cds%3B1%3d2'),'cds;1=2')
+        self.assertEqual(percent_decode('100%'),'100%')
+        self.assertEqual(percent_decode('%zz%2'),'%zz%2')
+        self.assertEqual(percent_decode(''),'')
+
+    def test_percent_encode(self):
+        """Reserved characters are encoded
+        """
+        self.assertEqual(percent_encode('DDB0216437'),'DDB0216437')
+        self.assertEqual(percent_encode('a b:c'),'a b:c')
+        self.assertEqual(percent_encode('cds;1=2,3'),'cds%3B1%3D2%2C3')
+        self.assertEqual(percent_encode('2,3',safe=MULTIVALUED_SAFE_CHARS),
+                         '2,3')
+        self.assertEqual(percent_encode(''),'')
+
+    def test_percent_encode_unicode(self):
+        """Unicode values are encoded as by urllib.quote
+        """
+        self.assertEqual(percent_encode(u'DDB0216437'),'DDB0216437')
+        self.assertEqual(percent_encode(u'cds;1'),'cds%3B1')
+
+    def test_round_trip(self):
+        """Encoding then decoding returns the original value
+        """
+        value = ''.join([chr(i) for i in range(256)])
+        self.assertEqual(percent_decode(percent_encode(value)),value)
+
 class TestGFFID(unittest.TestCase):
     """Unit tests for GFFID class
     """
@@ -251,6 +981,43 @@ class TestOrderedDictionary(unittest.TestCase):
         d['monty'] = 'python'
         self.assertEqual(d.keys(),['hello','stanley','monty'])
 
+    def test_delete(self):
+        """Delete items
+        """
+        d = OrderedDictionary()
+        d['hello'] = 'goodbye'
+        d['stanley'] = 'fletcher'
+        d['monty'] = 'python'
+        del(d['stanley'])
+        self.assertEqual(d.keys(),['hello','monty'])
+        self.assertEqual(len(d),2)
+        self.assertFalse('stanley' in d)
+        self.assertRaises(KeyError,d.__getitem__,'stanley')
+        self.assertRaises(KeyError,d.__delitem__,'stanley')
+        # Re-adding a deleted key puts it at the end
+        d['stanley'] = 'laurel'
+        self.assertEqual(d.keys(),['hello','monty','stanley'])
+        self.assertEqual(list(d),['hello','monty','stanley'])
+        self.assertEqual(d['stanley'],'laurel')
+        # Delete everything
+        for key in d.keys():
+            del(d[key])
+        self.assertEqual(d.keys(),[])
+        self.assertEqual(len(d),0)
+
+    def test_insert_after_delete(self):
+        """Insert items after some have been deleted
+        """
+        d = OrderedDictionary()
+        for key in ('a','b','c','d'):
+            d[key] = key.upper()
+        del(d['b'])
+        d.insert(1,'e','E')
+        self.assertEqual(d.keys(),['a','e','c','d'])
+        del(d['c'])
+        self.assertEqual(d.keys(),['a','e','d'])
+        self.assertRaises(KeyError,d.insert,0,'a','A')
+
     def test_iteration_over_keys(self):
         """Check iterating over keys
         """
@@ -263,3 +1030,13 @@ class TestOrderedDictionary(unittest.TestCase):
                 pass
         except KeyError:
             self.fail("Iteration over OrderedDictionary failed")
+
+    def test_items(self):
+        """Check items are returned in order
+        """
+        d = OrderedDictionary()
+        d['hello'] = 'goodbye'
+        d['stanley'] = 'fletcher'
+        del(d['hello'])
+        d['monty'] = 'python'
+        self.assertEqual(d.items(),[('stanley','fletcher'),('monty','python')])
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+import unittest
+import cStringIO
+import tempfile
+import shutil
+import os
+from GFFUtils.GFFHierarchy import *
+from GFFUtils.GFFFile import GFFFile
+from GFFUtils.GFFCache import GFFCache
+
+# Example GFF data
+gff_data = """##gff-version 3
+chr1\tTest\tgene\t1000\t5000\t.\t+\t.\tID=G1;Name=gene1
+chr1\tTest\tmRNA\t1000\t5000\t.\t+\t.\tID=T1;Parent=G1
+chr1\tTest\tmRNA\t1000\t4000\t.\t+\t.\tID=T2;Parent=G1
+chr1\tTest\texon\t1000\t1500\t.\t+\t.\tParent=T1,T2
+chr1\tTest\texon\t4000\t5000\t.\t+\t.\tParent=T1
+chr1\tTest\tgene\t8000\t9000\t.\t-\t.\tID=G2;Name=gene2
+chr1\tTest\tmRNA\t8000\t9000\t.\t-\t.\tID=T3;Parent=G2
+chr1\tTest\tCDS\t8000\t8500\t.\t-\t0\tID=C1;Parent=T3
+chr1\tTest\tCDS\t8600\t9000\t.\t-\t0\tID=C1;Parent=T3
+"""
+
+# GFF data with a cycle
+gff_cycle = """chr1\tTest\tgene\t1\t100\t.\t+\t.\tID=A;Parent=C
+chr1\tTest\tgene\t1\t100\t.\t+\t.\tID=B;Parent=A
+chr1\tTest\tgene\t1\t100\t.\t+\t.\tID=C;Parent=B
+chr1\tTest\texon\t1\t100\t.\t+\t.\tID=D;Parent=C
+"""
+
+def describe(records):
+    # Return the feature and line number of a list of records
+    return ["%s:%d" % (r['feature'],r.lineno()) for r in records]
+
+class TestGFFHierarchy(unittest.TestCase):
+    """Unit tests for the GFFHierarchy class
+    """
+
+    def setUp(self):
+        self.gff = GFFFile('test.gff',cStringIO.StringIO(gff_data))
+        self.hierarchy = GFFHierarchy(self.gff)
+
+    def test_lookup_ids(self):
+        """Records can be looked up by ID
+        """
+        self.assertEqual(len(self.hierarchy),6)
+        self.assertTrue('T2' in self.hierarchy)
+        self.assertFalse('X' in self.hierarchy)
+        self.assertEqual(self.hierarchy.record('T2').lineno(),4)
+        self.assertEqual(self.hierarchy.record('C1').lineno(),10)
+        self.assertRaises(KeyError,self.hierarchy.record,'X')
+        self.assertEqual(self.hierarchy.duplicate_ids(),['C1'])
+        self.assertEqual(describe(self.hierarchy.unidentified()),
+                         ['exon:5','exon:6'])
+        self.assertEqual(describe(self.hierarchy.multiple_parents()),
+                         ['exon:5'])
+
+    def test_parents_and_children(self):
+        """Parents and children can be found
+        """
+        exon = self.gff[3]
+        self.assertEqual(describe(self.hierarchy.parents(exon)),
+                         ['mRNA:3','mRNA:4'])
+        self.assertEqual(describe(self.hierarchy.parents('T1')),['gene:2'])
+        self.assertEqual(describe(self.hierarchy.children('T1')),
+                         ['exon:5','exon:6'])
+        self.assertEqual(describe(self.hierarchy.children('T3')),
+                         ['CDS:9','CDS:10'])
+        self.assertEqual(self.hierarchy.children(exon),[])
+
+    def test_ancestors_and_descendants(self):
+        """Ancestors and descendants can be found
+        """
+        exon = self.gff[3]
+        self.assertEqual(describe(self.hierarchy.ancestors(exon)),
+                         ['mRNA:3','mRNA:4','gene:2'])
+        self.assertEqual(describe(self.hierarchy.descendants('G1')),
+                         ['mRNA:3','exon:5','exon:6','mRNA:4'])
+        self.assertEqual(self.hierarchy.ancestors('G1'),[])
+
+    def test_roots(self):
+        """Root genes can be found
+        """
+        self.assertEqual(describe(self.hierarchy.roots(self.gff[3])),
+                         ['gene:2'])
+        self.assertEqual(describe([self.hierarchy.root('C1')]),['gene:7'])
+        self.assertEqual(describe([self.hierarchy.root('G1')]),['gene:2'])
+        self.assertEqual(self.hierarchy.root('X'),None)
+
+    def test_cycles(self):
+        """Cycles are detected
+        """
+        gff = GFFFile('test.gff',cStringIO.StringIO(gff_cycle))
+        hierarchy = GFFHierarchy(gff)
+        self.assertEqual(len(hierarchy.cycles()),1)
+        self.assertEqual(sorted(hierarchy.cycles()[0]),['A','B','C'])
+        self.assertEqual(len(hierarchy.ancestors('D')),3)
+        self.assertEqual(len(hierarchy.roots('D')),1)
+
+    def test_snapshot(self):
+        """Index can be restored from a snapshot
+        """
+        hierarchy = GFFHierarchy(self.gff,snapshot=self.hierarchy.snapshot())
+        self.assertEqual(describe(hierarchy.descendants('G1')),
+                         ['mRNA:3','exon:5','exon:6','mRNA:4'])
+        self.assertEqual(describe([hierarchy.root('C1')]),['gene:7'])
+
+class TestGFFFileHierarchy(unittest.TestCase):
+    """Unit tests for the hierarchy index on GFFFile
+    """
+
+    def setUp(self):
+        self.wd = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.wd)
+
+    def test_hierarchy_is_built_once(self):
+        """GFFFile builds the hierarchy index once
+        """
+        gff = GFFFile('test.gff',cStringIO.StringIO(gff_data))
+        hierarchy = gff.hierarchy()
+        self.assertTrue(gff.hierarchy() is hierarchy)
+        self.assertEqual(describe([hierarchy.root('T3')]),['gene:7'])
+        del(gff[0])
+        self.assertFalse(gff.hierarchy() is hierarchy)
+        self.assertEqual(describe([gff.hierarchy().root('T1')]),['mRNA:3'])
+
+    def test_hierarchy_is_cached(self):
+        """Hierarchy index is stored in the parse cache
+        """
+        gff_file = os.path.join(self.wd,'test.gff')
+        cache_dir = os.path.join(self.wd,'cache')
+        open(gff_file,'w').write(gff_data)
+        gff = GFFFile(gff_file,cache_dir=cache_dir)
+        gff.hierarchy()
+        self.assertEqual(len(GFFCache(cache_dir).entries()),2)
+        gff2 = GFFFile(gff_file,cache_dir=cache_dir)
+        hierarchy = gff2.hierarchy()
+        self.assertEqual(len(GFFCache(cache_dir).entries()),2)
+        self.assertEqual(describe(hierarchy.ancestors(gff2[3])),
+                         ['mRNA:3','mRNA:4','gene:2'])
+        self.assertTrue(hierarchy.record('T1') is gff2[1])
+
+    def test_hierarchy_not_cached_after_edits(self):
+        """Hierarchy index isn't cached once records are modified
+        """
+        gff_file = os.path.join(self.wd,'test.gff')
+        cache_dir = os.path.join(self.wd,'cache')
+        open(gff_file,'w').write(gff_data)
+        gff = GFFFile(gff_file,cache_dir=cache_dir)
+        gff[4]['attributes']['Parent'] = 'T2'
+        self.assertEqual(describe(gff.hierarchy().children('T2')),
+                         ['exon:5','exon:6'])
+        self.assertEqual(len(GFFCache(cache_dir).entries()),1)
+        # Fresh load isn't affected by the edits
+        gff2 = GFFFile(gff_file,cache_dir=cache_dir)
+        self.assertEqual(describe(gff2.hierarchy().children('T1')),
+                         ['exon:5','exon:6'])
+        self.assertEqual(len(GFFCache(cache_dir).entries()),2)
+        # Cached index isn't used for edited records
+        gff3 = GFFFile(gff_file,cache_dir=cache_dir)
+        gff3[4]['attributes']['Parent'] = 'T2'
+        self.assertEqual(describe(gff3.hierarchy().children('T1')),
+                         ['exon:5'])
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+import unittest
+import tempfile
+import shutil
+import os
+import gzip
+from GFFUtils.GFFIndex import *
+from GFFUtils.GFFFile import GFFIterator,CompactGFFDataLine,PRAGMA,COMMENT,ANNOTATION
+
+# Example GFF data
+gff_data = """##gff-version 3
+# generated: Wed Feb 21 12:01:58 2012
+DDB0123458	Sequencing Center	chromosome	1	4923596	.	+	.	ID=DDB0232428;Name=1
+DDB0232428	.	gene	1890	3287	.	+	.	ID=DDB_G0267178;Name=DDB_G0267178_RTE
+DDB0232428	Sequencing Center	mRNA	1890	3287	.	+	.	ID=DDB0216437;Parent=DDB_G0267178
+DDB0232428	Sequencing Center	exon	1890	3287	.	+	.	Parent=DDB0216437
+DDB0232428	Sequencing Center	CDS	1890	2000	.	+	.	ID=cds%3B1;Parent=DDB0216437
+DDB0232428	Sequencing Center	CDS	2100	3287	.	+	.	ID=cds%3B1;Parent=DDB0216437
+"""
+
+# Example GTF data
+gtf_data = """chr1	HAVANA	gene	11869	14412	.	+	.	gene_id "ENSG00000223972.4"; transcript_id "ENSG00000223972.4"; gene_name "DDX11L1";
+chr1	HAVANA	transcript	11869	14409	.	+	.	gene_id "ENSG00000223972.4"; transcript_id "ENST00000456328.2"; gene_name "DDX11L1";
+chr1	HAVANA	exon	11869	12227	.	+	.	gene_id "ENSG00000223972.4"; transcript_id "ENST00000456328.2"; gene_name "DDX11L1";
+"""
+
+class TestGFFIndex(unittest.TestCase):
+    """Tests for building and using GFF indexes
+    """
+
+    def setUp(self):
+        # Create working directory and test files
+        self.wd = tempfile.mkdtemp()
+        self.gff = os.path.join(self.wd,'test.gff')
+        open(self.gff,'w').write(gff_data)
+        self.gtf = os.path.join(self.wd,'test.gtf')
+        open(self.gtf,'w').write(gtf_data)
+
+    def tearDown(self):
+        shutil.rmtree(self.wd)
+
+    def test_build_index(self):
+        """Index records line offsets and IDs
+        """
+        index = build_index(self.gff)
+        self.assertTrue(os.path.exists(self.gff+'.gfi'))
+        self.assertEqual(len(index),8)
+        self.assertEqual(index.offset(1),0)
+        self.assertEqual(index.offset(2),len("##gff-version 3\n"))
+        self.assertRaises(IndexError,index.offset,0)
+        self.assertRaises(IndexError,index.offset,9)
+        self.assertEqual(index.lines_for_id('DDB0216437'),[5])
+        self.assertEqual(index.lines_for_id('cds;1'),[7,8])
+        self.assertEqual(index.lines_for_id('missing'),[])
+        self.assertTrue('DDB_G0267178' in index)
+        self.assertTrue(index.is_valid())
+
+    def test_duplicate_id_attributes(self):
+        """Indexed ID matches the ID of the parsed record
+        """
+        open(self.gff,'a').write("DDB0232428\t.\tgene\t1\t2\t.\t+\t.\t"
+                                 "ID=first;Name=x;ID = last\n")
+        index = build_index(self.gff)
+        self.assertEqual(index.lines_for_id('first'),[])
+        self.assertEqual(index.lines_for_id('last'),[9])
+        record = index.record(9)
+        self.assertEqual(record['attributes']['ID'],'last')
+        index.close()
+
+    def test_fetch_records(self):
+        """Single records can be fetched by line number and ID
+        """
+        index = build_index(self.gff)
+        record = index.record(4,gffdataline=CompactGFFDataLine)
+        self.assertEqual(record['feature'],'gene')
+        self.assertEqual(record.lineno(),4)
+        self.assertEqual(record.type,ANNOTATION)
+        self.assertEqual(index.record(1,gffdataline=CompactGFFDataLine).type,PRAGMA)
+        self.assertEqual(index.record(2,gffdataline=CompactGFFDataLine).type,COMMENT)
+        records = index.records_for_id('cds;1',gffdataline=CompactGFFDataLine)
+        self.assertEqual([r['start'] for r in records],[1890,2100])
+        index.close()
+
+    def test_load_index(self):
+        """Saved index can be reloaded and is invalidated by changes
+        """
+        self.assertEqual(load_index(self.gff),None)
+        build_index(self.gff)
+        index = load_index(self.gff)
+        self.assertNotEqual(index,None)
+        self.assertEqual(len(index),8)
+        self.assertEqual(index.lines_for_id('DDB0216437'),[5])
+        # Modify the GFF file
+        open(self.gff,'a').write("DDB0232428\t.\tgene\t1\t2\t.\t+\t.\tID=new\n")
+        self.assertEqual(load_index(self.gff),None)
+        index = get_index(self.gff)
+        self.assertEqual(len(index),9)
+        self.assertEqual(index.lines_for_id('new'),[9])
+
+    def test_index_gtf(self):
+        """GTF files are indexed using a GTF attribute
+        """
+        index = get_index(self.gtf,id_attribute='transcript_id')
+        self.assertEqual(index.lines_for_id('ENST00000456328.2'),[2,3])
+        self.assertEqual(index.lines_for_id('ENSG00000223972.4'),[1])
+
+    def test_iterator_from_line(self):
+        """Iteration can start from a specific line
+        """
+        index = build_index(self.gff)
+        for mapped in (False,True):
+            lines = [(r.lineno(),str(r)) for r in
+                     index.iterator(5,gffdataline=None if mapped else CompactGFFDataLine,
+                                    mapped=mapped)]
+            self.assertEqual(lines,[(n+5,l) for n,l in
+                                    enumerate(gff_data.split('\n')[4:-1])])
+
+    def test_gff_iterator_seek(self):
+        """GFFIterator can seek to a record after reaching the end
+        """
+        index = build_index(self.gff)
+        iterator = GFFIterator(self.gff,gffdataline=CompactGFFDataLine)
+        self.assertEqual(len([r for r in iterator]),8)
+        iterator.seek(index.offset(7),lineno=7)
+        self.assertEqual([r.lineno() for r in iterator],[7,8])
+
+    def test_compressed_file_not_indexed(self):
+        """Compressed files can't be indexed
+        """
+        gzipped = os.path.join(self.wd,'test.gff.gz')
+        fp = gzip.open(gzipped,'wb')
+        fp.write(gff_data)
+        fp.close()
+        self.assertRaises(IOError,build_index,gzipped)
+
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+import unittest
+import cStringIO
+from GFFUtils.GFFIntervals import *
+from GFFUtils.GFFFile import GFFFile
+
+# Example GFF data
+gff_data = """##gff-version 3
+chr1\tTest\tgene\t1000\t5000\t.\t+\t.\tID=G1
+chr1\tTest\texon\t1000\t1500\t.\t+\t.\tParent=G1
+chr1\tTest\texon\t4000\t5000\t.\t+\t.\tParent=G1
+chr1\tTest\tgene\t2000\t2500\t.\t-\t.\tID=G2
+chr1\tTest\tgene\t8000\t9000\t.\t-\t.\tID=G3
+chr2\tTest\tgene\t100\t200\t.\t+\t.\tID=G4
+"""
+
+def ids(records):
+    # Return the IDs (or parents) of a list of records
+    return [r['attributes']['ID'] if 'ID' in r['attributes']
+            else 'E:'+r['attributes']['Parent'] for r in records]
+
+class TestGFFIntervalIndex(unittest.TestCase):
+    """Unit tests for the GFFIntervalIndex class
+    """
+
+    def setUp(self):
+        self.gff = GFFFile('test.gff',cStringIO.StringIO(gff_data))
+        self.index = GFFIntervalIndex(self.gff)
+
+    def test_overlaps(self):
+        """Records overlapping a region are found
+        """
+        self.assertEqual(len(self.index),6)
+        self.assertEqual(ids(self.index.overlaps('chr1',1400,2000)),
+                         ['G1','E:G1','G2'])
+        self.assertEqual(ids(self.index.overlaps('chr1',5000,5000)),
+                         ['G1','E:G1'])
+        self.assertEqual(ids(self.index.overlaps('chr1',5001,7999)),[])
+        self.assertEqual(ids(self.index.overlaps('chr3',1,10000)),[])
+
+    def test_overlaps_with_strand_and_feature(self):
+        """Overlapping records can be filtered by strand and feature
+        """
+        self.assertEqual(ids(self.index.overlaps('chr1',1,10000,strand='-')),
+                         ['G2','G3'])
+        self.assertEqual(ids(self.index.overlaps('chr1',1,10000,
+                                                 feature='exon')),
+                         ['E:G1','E:G1'])
+
+    def test_within(self):
+        """Records inside a region are found
+        """
+        self.assertEqual(ids(self.index.within('chr1',1000,2500)),
+                         ['E:G1','G2'])
+        self.assertEqual(ids(self.index.within('chr1',1100,2400,margin=100)),
+                         ['E:G1','G2'])
+        self.assertEqual(ids(self.index.within('chr1',1100,2400)),[])
+
+    def test_nearest(self):
+        """Nearest records are found
+        """
+        self.assertEqual(ids([self.index.nearest('chr1',2200)]),['G1'])
+        self.assertEqual(ids([self.index.nearest('chr1',6000,feature='gene')]),
+                         ['G1'])
+        self.assertEqual(ids([self.index.nearest('chr1',7000)]),['G3'])
+        self.assertEqual(ids([self.index.nearest('chr1',6000,strand='-')]),
+                         ['G3'])
+        self.assertEqual(ids([self.index.nearest('chr1',100,strand='-')]),
+                         ['G2'])
+        self.assertEqual(self.index.nearest('chr1',100,feature='CDS'),None)
+        self.assertEqual(self.index.nearest('chr3',100),None)
+
+    def test_many_records(self):
+        """Overlaps match a linear scan for many records
+        """
+        records = [{ 'seqname': 'chr1',
+                     'start': (i*7919)%10000,
+                     'end': (i*7919)%10000 + (i*104729)%1500,
+                     'strand': '+',
+                     'feature': 'gene' } for i in range(1000)]
+        index = GFFIntervalIndex(records)
+        for start,end in ((0,10),(500,600),(5000,5000),(9999,20000)):
+            expected = sorted([r for r in records
+                               if r['start'] <= end and r['end'] >= start],
+                              key=lambda r: r['start'])
+            self.assertEqual([id(r) for r in index.overlaps('chr1',start,end)],
+                             [id(r) for r in expected])
+
+class TestGFFFileIntervals(unittest.TestCase):
+    """Unit tests for the interval queries on GFFFile
+    """
+
+    def test_gff_file_overlaps_and_nearest(self):
+        """GFFFile builds an interval index for queries
+        """
+        gff = GFFFile('test.gff',cStringIO.StringIO(gff_data))
+        self.assertEqual(ids(gff.overlaps('chr1',2100,2200)),['G1','G2'])
+        self.assertEqual(ids([gff.nearest('chr1',7000)]),['G3'])
+        self.assertTrue(gff.interval_index() is gff.interval_index())
+
+    def test_index_rebuilt_after_changes(self):
+        """Interval index is rebuilt after records are removed
+        """
+        gff = GFFFile('test.gff',cStringIO.StringIO(gff_data))
+        self.assertEqual(ids(gff.overlaps('chr2',1,1000)),['G4'])
+        del(gff[5])
+        self.assertEqual(ids(gff.overlaps('chr2',1,1000)),[])
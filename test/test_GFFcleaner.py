@@ -108,6 +108,25 @@ chr2\tTest\tCDS\t41402\t41831\t0\t-\t0\tID=YEL0W06;SGD=YEL0W06
         self.assertTrue('YEL0W05' in duplicates.keys())
         self.assertEqual(len(duplicates['YEL0W05']),3)
 
+    def test_get_duplicate_sgds_after_update(self):
+        """Test duplicate SGDs reflect changes to the attributes
+        """
+        gff = GFFFile('test.gff',self.fp)
+        self.assertEqual(GFFGetDuplicateSGDs(gff).keys(),['YEL0W02','YEL0W05'])
+        gff[2]['attributes']['SGD'] = 'YEL0W03'
+        gff[3]['attributes']['SGD'] = 'YEL0W04'
+        duplicates = GFFGetDuplicateSGDs(gff)
+        self.assertEqual(duplicates.keys(),['YEL0W04','YEL0W05'])
+        self.assertEqual(duplicates['YEL0W04'],[gff[3],gff[4]])
+
+    def test_get_duplicate_sgds_from_list(self):
+        """Test identifying duplicate SGDs in a list of lines
+        """
+        gff = GFFFile('test.gff',self.fp)
+        duplicates = GFFGetDuplicateSGDs(list(gff)[:7])
+        self.assertEqual(duplicates.keys(),['YEL0W02','YEL0W05'])
+        self.assertEqual(len(duplicates['YEL0W05']),2)
+
 class TestGFFResolveDuplicateSGDs(unittest.TestCase):
 
     def setUp(self):
@@ -411,6 +430,61 @@ YEL0W06\tchr2\t49195\t49569\t-
         self.assertNotEqual(str(gff[i]['attributes'])[0],';',"Erroneous leading semicolon: %s"
                             % str(gff[i]['attributes']))
 
+    def test_insert_several_missing_genes(self):
+        """Test inserting several missing genes into GFF data
+        """
+        gff = GFFFile('test.gff',self.fp)
+        mapping = TabFile('map.txt',cStringIO.StringIO(
+"""YEL0W03\tchr1\t32611\t34140\t-
+YEL0W07\tchr1\t100\t200\t-
+YEL0W08\tchr3\t500\t600\t-
+YEL0W09\tchr1\t32700\t32800\t-
+YEL0W06\tchr2\t49195\t49569\t-
+"""),column_names=('name','chr','start','end','strand'))
+        # Insert missing genes
+        GFFInsertMissingGenes(gff,mapping)
+        # Check: genes are inserted after the last preceding record on
+        # the same chromosome (including genes already inserted), or
+        # before the last record if there is no preceding record
+        self.assertEqual([data['attributes']['SGD'] for data in gff],
+                         ['YEL0W01','YEL0W02','YEL0W03','YEL0W04','YEL0W04',
+                          'YEL0W05','YEL0W06','YEL0W07','YEL0W09','YEL0W08',
+                          'YEL0W06'])
+        self.assertEqual(gff[2]['source'],'GFFcleaner')
+        self.assertEqual(gff.find('SGD','YEL0W09'),[gff[8]])
+
+    def test_insert_missing_genes_into_list(self):
+        """Test inserting missing genes into a list of lines
+        """
+        gff = list(GFFFile('test.gff',self.fp))
+        mapping = TabFile('map.txt',cStringIO.StringIO(
+"""YEL0W03\tchr1\t32611\t34140\t-
+YEL0W07\tchr1\t100\t200\t-
+YEL0W08\tchr3\t500\t600\t-
+"""),column_names=('name','chr','start','end','strand'))
+        gff = GFFInsertMissingGenes(gff,mapping)
+        self.assertTrue(isinstance(gff,list))
+        self.assertEqual([data['attributes']['SGD'] for data in gff],
+                         ['YEL0W01','YEL0W02','YEL0W03','YEL0W04','YEL0W04',
+                          'YEL0W05','YEL0W06','YEL0W07','YEL0W08','YEL0W06'])
+
+    def test_insert_missing_genes_after_update(self):
+        """Test missing genes reflect changes to the SGD attributes
+        """
+        gff = GFFFile('test.gff',self.fp)
+        self.assertEqual(len(GFFGetDuplicateSGDs(gff)),2)
+        for data in gff:
+            if data['attributes']['SGD'] == 'YEL0W05':
+                data['attributes']['SGD'] = 'YEL0W03'
+        mapping = TabFile('map.txt',cStringIO.StringIO(
+"""YEL0W03\tchr1\t32611\t34140\t-
+YEL0W05\tchr2\t41402\t41831\t-
+"""),column_names=('name','chr','start','end','strand'))
+        GFFInsertMissingGenes(gff,mapping)
+        self.assertEqual([data['attributes']['SGD'] for data in gff],
+                         ['YEL0W01','YEL0W02','YEL0W04','YEL0W04','YEL0W03',
+                          'YEL0W06','YEL0W06','YEL0W05'])
+
 class TestGFFAddExonIDs(unittest.TestCase):
 
     def setUp(self):
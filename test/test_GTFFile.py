@@ -74,6 +74,39 @@ class TestGTFAttributes(unittest.TestCase):
         for attr in line['attributes']:
             self.assertNotEqual(line['attributes'][attr],None)
 
+    def test_gtf_quoted_semicolons(self):
+        attributes = GTFAttributes('gene_id "G1"; note "first; second"; level 2;')
+        self.assertEqual(attributes['gene_id'],'G1')
+        self.assertEqual(attributes['note'],'first; second')
+        self.assertEqual(attributes['level'],'2')
+        self.assertEqual(list(attributes),['gene_id','note','level'])
+
+    def test_gtf_irregular_spacing(self):
+        attributes = GTFAttributes('gene_id "G1";exon_number 1;  exon_id "E1" ;tag "basic"')
+        self.assertEqual(attributes['gene_id'],'G1')
+        self.assertEqual(attributes['exon_number'],'1')
+        self.assertEqual(attributes['exon_id'],'E1')
+        self.assertEqual(attributes['tag'],'basic')
+
+    def test_gtf_empty_attributes(self):
+        attributes = GTFAttributes('')
+        self.assertEqual(list(attributes),[])
+        self.assertFalse('gene_id' in attributes)
+
+    def test_gtf_selected_keys(self):
+        attributes = GTFAttributes(self.gtf_line.split('\t')[8],
+                                   keys=('gene_name','level','missing'))
+        self.assertEqual(list(attributes),['gene_name','level'])
+        self.assertEqual(attributes['gene_name'],'DDX11L1')
+        self.assertEqual(attributes['level'],'2')
+        self.assertEqual(attributes['gene_id'],None)
+
+    def test_gtf_selected_keys_quoted_semicolons(self):
+        attributes = GTFAttributes('gene_id "G1"; note "x; level 3"; level 2;',
+                                   keys=('level',))
+        self.assertEqual(list(attributes),['level'])
+        self.assertEqual(attributes['level'],'2')
+
 class TestGTFIterator(unittest.TestCase):
     """Basic tests for iterating through a GTF file
     """
@@ -116,6 +149,30 @@ chr1	ENSEMBL	transcript	11872	14412	.	+	.	gene_id "ENSG00000223972.4"; transcrip
         self.assertEqual(ncomment,0)
         self.assertEqual(nannotation,6)
 
+    def test_gtf_iterator_mapped(self):
+        """Test iteration over a file-like object in mapped mode
+        """
+        lines = [line for line in GTFIterator(fp=self.fp,mapped=True)]
+        self.assertEqual(len(lines),11)
+        self.assertTrue(isinstance(lines[5],MappedGTFDataLine))
+        self.assertEqual(lines[6]['feature'],'transcript')
+        self.assertEqual(lines[6]['attributes']['transcript_id'],'ENST00000456328.2')
+        self.assertEqual(lines[6]['attributes']['gene_name'],'DDX11L1')
+
+    def test_gtf_iterator_projection(self):
+        """Test iteration extracting selected columns and attributes
+        """
+        for mapped in (False,True):
+            lines = [line for line in GTFIterator(fp=cStringIO.StringIO(self.fp.getvalue()),
+                                                  columns=('feature','start'),
+                                                  attributes=('transcript_id',),
+                                                  mapped=mapped)]
+            self.assertEqual(len(lines),11)
+            self.assertEqual(lines[6]['feature'],'transcript')
+            self.assertEqual(lines[6]['start'],11869)
+            self.assertEqual(lines[6]['attributes']['transcript_id'],'ENST00000456328.2')
+            self.assertEqual(lines[6]['attributes']['gene_name'],None)
+
 class TestGTFFile(unittest.TestCase):
     """Basic unit tests for the GTFFile class
     """